@@ -0,0 +1,76 @@
+"""Bounded worker pool for CrewAI runs with admission control.
+
+`Crew.kickoff()` is blocking and can take tens of seconds, so the API hands it to a
+dedicated, size-limited thread pool instead of running it on the event loop. At most
+``max_workers`` crews run at once and at most ``max_queue`` more may wait; anything
+beyond that is rejected immediately with :class:`AgentPoolSaturated` so the caller
+can answer 503 + ``Retry-After`` instead of piling up work. Work runs in a copy of the
+submitter's ``contextvars`` context, so request-scoped state such as the metrics trace
+follows it onto the worker thread.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class AgentPoolSaturated(RuntimeError):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class AgentWorkerPool:
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _release(self, _: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise AgentPoolSaturated(
+                f"{self.max_workers} agent workers busy and {self.max_queue} requests queued"
+            )
+        with self._lock:
+            self._in_flight += 1
+        try:
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, fn, *args, **kwargs)
+        except BaseException:
+            self._release(Future())
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn` on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = self._in_flight
+            rejected = self._rejected
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.max_workers),
+            "rejected": rejected,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,279 @@
+# answer_cache.py
+"""Semantic cache of agent answers for /chat and /chat/stream.
+
+A question is embedded (through the shared embedding cache) and compared by cosine
+similarity with earlier questions from the same *scope*. An answer is never served
+across scopes, so it can only reach a caller the RLS policies would have shown the
+underlying data to. Questions must also mention the same numbers ("student 12" vs
+"student 13", "JSS2" vs "JSS3") to match.
+
+There are two scopes per question, and ``store`` picks one from the tool calls the
+agent made. Answers built from per-student data (``pg_safe_query``, reports, or
+``rag_search`` hits on student results) are filed under the caller's exact RLS auth
+context (``lighthouse_mcp.db.auth_settings``), so only that user can get them back.
+Answers that used no tools, or only ``rag_search`` over curriculum documents (which
+reads no RLS-protected rows), depend on nothing user-specific and are shared by every
+caller with the same persona, role and school, so one parent's "how do I help with
+JSS3 English?" answers the next parent's. Both scopes also include the structured body
+hints. When the tool calls are unknown (``ToolRecorder.observed_results`` cannot vouch
+for the run) the answer is kept per user.
+
+Every entry records the data version of its school at the time the agent ran. Writes
+to result/student bump that school's version through the ``QUERY_CACHE_CHANNEL``
+notifications (sql/13_answer_cache_notify.sql); curriculum changes, notifications
+without a school and listener reconnects bump the global version. Entries from an
+older version are discarded on lookup. ``ANSWER_CACHE_TTL`` bounds staleness when no
+listener is running; ``ANSWER_CACHE_SIZE=0`` disables the cache.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from backend.lighthouse_mcp.db import DB_RO_URL, Auth, auth_settings
+from backend.lighthouse_mcp.embedding_cache import normalize_text
+from backend.lighthouse_mcp.query_cache import CACHE_CHANNEL, listen
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "2048"))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+# Minimum cosine similarity between questions; higher = fewer, safer hits.
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_LISTEN = os.environ.get("ANSWER_CACHE_LISTEN", "1").lower() not in ("0", "false", "no")
+
+# Body fields that change what a question refers to.
+HINT_KEYS = ("student_id", "session", "term")
+# Tools whose results do not depend on who asks (rag_search runs without RLS); any other
+# tool reads per-student rows.
+SHARED_TOOLS = ("rag_search",)
+
+Scope = Tuple[str, Tuple[Tuple[str, str], ...], Tuple[Tuple[str, str], ...]]
+Version = Tuple[int, int]
+
+_NUMBERS = re.compile(r"\d+")
+
+
+class _Entry(NamedTuple):
+    expires: float
+    version: Version
+    numbers: Tuple[str, ...]
+    vector: np.ndarray
+    answer: str
+
+
+class Probe(NamedTuple):
+    """A looked-up question; pass it to :meth:`AnswerCache.store` with the agent's answer."""
+
+    scope: Scope
+    shared_scope: Scope
+    school_id: Optional[str]
+    version: Version
+    text: str
+    numbers: Tuple[str, ...]
+    vector: np.ndarray
+
+
+def uses_student_data(tool_results: Optional[Iterable[Tuple[str, Any, Any]]]) -> bool:
+    """Whether an answer built from these (tool, args, output) calls must stay per user."""
+    if tool_results is None:
+        return True
+    return any(
+        tool not in SHARED_TOOLS or "student_result" in str(output) for tool, _args, output in tool_results
+    )
+
+
+def _default_embed(text: str) -> np.ndarray:
+    from backend.lighthouse_mcp.embeddings import get_embedding
+
+    return get_embedding(text)
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        embed: Optional[Callable[[str], np.ndarray]] = None,
+    ) -> None:
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self.threshold = threshold
+        self._embed = embed or _default_embed
+        self._entries: "OrderedDict[Tuple[Scope, str], _Entry]" = OrderedDict()
+        self._by_scope: Dict[Scope, Dict[str, None]] = {}
+        self._global_version = 0
+        self._school_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "errors": 0}
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_entries) and self.ttl > 0
+
+    @staticmethod
+    def scope(
+        persona: str, auth: Auth, hints: Optional[Mapping[str, Any]] = None, shared: bool = False
+    ) -> Scope:
+        """The per-user scope, or with `shared` the (persona, role, school) one."""
+        hints = hints or {}
+        pinned = tuple((key, str(hints[key])) for key in HINT_KEYS if hints.get(key) is not None)
+        settings = auth_settings(auth)
+        if shared:
+            settings = [(guc, value) for guc, value in settings if guc != "app.user_id"]
+        return persona, tuple(settings), pinned
+
+    def _version(self, school_id: Optional[str]) -> Version:
+        return self._global_version, self._school_versions.get(school_id, 0) if school_id else 0
+
+    # --- lookups
+    def lookup(
+        self,
+        persona: str,
+        auth: Auth,
+        message: str,
+        hints: Optional[Mapping[str, Any]] = None,
+    ) -> Tuple[Optional[str], Optional[Probe]]:
+        """Return (cached answer or None, probe). The probe is None when caching is off or failed."""
+        if not self.enabled:
+            return None, None
+        text = normalize_text(message).lower()
+        if not text:
+            return None, None
+        try:
+            vector = np.asarray(self._embed(text), dtype=np.float32)
+        except Exception as exc:  # the agent still answers; only the cache is skipped
+            logger.warning("Answer cache lookup skipped: %s", exc)
+            with self._lock:
+                self.counters["errors"] += 1
+            return None, None
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector = vector / norm
+
+        scope = self.scope(persona, auth, hints)
+        shared_scope = self.scope(persona, auth, hints, shared=True)
+        school_id = str(auth["school_id"]) if auth and auth.get("school_id") is not None else None
+        numbers = tuple(sorted(set(_NUMBERS.findall(text))))
+        now = time.monotonic()
+        with self._lock:
+            version = self._version(school_id)
+            probe = Probe(scope, shared_scope, school_id, version, text, numbers, vector)
+            best, best_key, best_similarity = None, None, self.threshold
+            keys = [(scope, text_key) for text_key in self._by_scope.get(scope, ())]
+            if shared_scope != scope:
+                keys += [(shared_scope, text_key) for text_key in self._by_scope.get(shared_scope, ())]
+            for key in keys:
+                entry = self._entries[key]
+                if entry.expires <= now or entry.version != version:
+                    self._remove(key)
+                    self.counters["stale"] += 1
+                    continue
+                if entry.numbers != numbers:
+                    continue
+                similarity = float(np.dot(entry.vector, vector))
+                if similarity >= best_similarity:
+                    best, best_key, best_similarity = entry, key, similarity
+            if best is None:
+                self.counters["misses"] += 1
+                return None, probe
+            self._entries.move_to_end(best_key)
+            self.counters["hits"] += 1
+            return best.answer, probe
+
+    def store(
+        self,
+        probe: Optional[Probe],
+        answer: str,
+        tool_results: Optional[Iterable[Tuple[str, Any, Any]]] = None,
+    ) -> None:
+        """Cache the agent's `answer` unless the scope's data changed while it ran.
+
+        `tool_results` are the (tool, args, output) calls the answer was built from; they
+        decide between the per-user and the shared scope (None = unknown, per user).
+        """
+        if probe is None or not answer or not self.enabled:
+            return
+        entry = _Entry(time.monotonic() + self.ttl, probe.version, probe.numbers, probe.vector, answer)
+        scope = probe.scope if uses_student_data(tool_results) else probe.shared_scope
+        key = (scope, probe.text)
+        with self._lock:
+            if self._version(probe.school_id) != probe.version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_scope.setdefault(scope, {})[probe.text] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def _remove(self, key: Tuple[Scope, str]) -> None:
+        del self._entries[key]
+        scope, text = key
+        texts = self._by_scope[scope]
+        del texts[text]
+        if not texts:
+            del self._by_scope[scope]
+
+    # --- data versions
+    def bump(self, school_id: Optional[str] = None) -> None:
+        """Invalidate the answers of one school (or of every school)."""
+        with self._lock:
+            if school_id is None:
+                self._global_version += 1
+            else:
+                self._school_versions[school_id] = self._school_versions.get(school_id, 0) + 1
+
+    def clear(self) -> None:
+        self.bump()
+
+    def handle_notification(self, payload: str) -> None:
+        try:
+            school_id = json.loads(payload).get("school_id")
+        except (ValueError, AttributeError):
+            school_id = None
+        self.bump(None if school_id is None else str(school_id))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["threshold"] = self.threshold
+        stats["listening"] = bool(self._listener and self._listener.is_alive())
+        return stats
+
+    def start_listener(self, url: str, channel: str = CACHE_CHANNEL) -> None:
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(
+            target=listen,
+            args=(url, channel, self.handle_notification, self.clear, self._stop),
+            name="answer-cache-listen",
+            daemon=True,
+        )
+        self._listener.start()
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    cache = AnswerCache()
+    if ANSWER_CACHE_LISTEN and DB_RO_URL and cache.enabled:
+        cache.start_listener(DB_RO_URL)
+    return cache
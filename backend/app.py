@@ -3,54 +3,168 @@
 # Provides:
 #  - POST /chat          -> returns JSON answer
 #  - POST /chat/stream   -> Server-Sent Events (SSE) streaming of the answer
+#  - POST /reports/bulk  -> NDJSON stream of term reports for a class or school
+#  - GET  /cache/stats   -> answer cache hit rate and counters
+#  - GET  /metrics       -> Prometheus metrics (request/stage/tool/db/embedding latency)
+#
+# /chat/stream relays LLM tokens and tool progress from CrewAI's event bus as they happen.
+# Crew runs execute on a bounded worker pool (AGENT_WORKERS / AGENT_QUEUE_DEPTH); when it is
+# saturated the endpoints answer 503 with a Retry-After header instead of queueing forever.
 #
 # Notes:
 # - This sample assumes your MCP server file is at lighthouse_mcp/lighthouse_mcp_server.py.
 # - For role-based filtering with Postgres RLS, make sure your MCP server reads an `_auth`
 #   dict from tool payloads and calls `SET LOCAL app.user_id/role/school_id` before queries.
-# - In production, consider running the MCP server as a long-lived process and connecting over
-#   SSE/HTTP transport instead of stdio.
+# - Set MCP_SERVER_URL to use a standalone MCP server (lighthouse_mcp_server.py --transport http
+#   --workers N) over a persistent HTTP/SSE session instead of a stdio child process, so tool
+#   execution scales on its own processes.
+# - Structured requests ("latest results for student 12", "first term report 2024/2025") are
+#   answered by intent_router.py with one direct tool call and a templated answer; everything
+#   else (or INTENT_ROUTER=0) goes to the agent.
+# - Agent answers are cached semantically (answer_cache.py): per user when built from
+#   per-student tool results, otherwise per persona, role and school; a near-identical
+#   question in the same scope is answered without a crew run.
+# - With a `chat_id` in the body, earlier turns and the tool results they fetched are kept
+#   (conversation_memory.py) and added to the agent's task for follow-up questions.
+# - Concurrent identical agent questions (same persona, message, auth scope and history) share
+#   one crew run (lighthouse_mcp/singleflight.py); SINGLE_FLIGHT=0 turns this off.
 
-import os, sys, asyncio, jwt
+import os, sys, asyncio, json
 import sysconfig
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 from fastapi import FastAPI, Depends, Header, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
-from crewai import Agent, Task, Crew
-try:  # Prefer built-in adapter when available
-    from crewai_tools import MCPServerAdapter  # type: ignore
-except ImportError:  # pragma: no cover - fallback for versions without MCP adapter
-    from backend.mcp_adapter import MCPServerAdapter
-
-try:
-    from mcp import StdioServerParameters
-except ImportError:  # Local backend/mcp package shadowed the dependency
-    sys.modules.pop("mcp", None)
-    purelib = sysconfig.get_paths()["purelib"]
-    if purelib not in sys.path:
-        sys.path.insert(0, purelib)
-    from mcp import StdioServerParameters  # type: ignore
-
-JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret-change-me")
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-app = FastAPI(title="LightHouse API")
+if TYPE_CHECKING:  # crewai is imported on first use; it dominates cold-start time
+    from crewai import Crew
 
 BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR.parent) not in sys.path:  # allow `backend.` imports when run from backend/
+    sys.path.insert(0, str(BACKEND_DIR.parent))
+
+from backend.agent_pool import AgentPoolSaturated, AgentWorkerPool
+from backend.chat_stream import CrewEventStream, ToolRecorder, follow, install_listeners, replay
+from backend import intent_router
+from backend.lighthouse_mcp import metrics
+from backend.lighthouse_mcp.singleflight import AsyncSingleFlight
+
+JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret-change-me")
+AGENT_WORKERS = int(os.environ.get("AGENT_WORKERS", "4"))
+AGENT_QUEUE_DEPTH = int(os.environ.get("AGENT_QUEUE_DEPTH", "16"))
+AGENT_RETRY_AFTER = os.environ.get("AGENT_RETRY_AFTER", "5")  # seconds, sent as Retry-After
+LLM_MODEL = os.environ.get("OPENAI_MODEL_NAME", "gpt-4o-mini")
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL")  # e.g. http://mcp:8765/mcp
+MCP_CLIENT_TRANSPORT = os.environ.get("MCP_CLIENT_TRANSPORT", "http")  # http | sse
+# Build the MCP adapter and persona agents during startup instead of on the first request.
+APP_WARMUP = os.environ.get("APP_WARMUP", "1").lower() not in ("0", "false", "no")
+INTENT_ROUTER = os.environ.get("INTENT_ROUTER", "1").lower() not in ("0", "false", "no")
+# Rephrase fast-path answers with one short LLM call (still no agent/tool loop).
+INTENT_ROUTER_SUMMARIZE = os.environ.get("INTENT_ROUTER_SUMMARIZE", "0").lower() not in ("0", "false", "no")
+
 MCP_SCRIPT = BACKEND_DIR / "lighthouse_mcp" / "lighthouse_mcp_server.py"
 
-# Spawn MCP server (stdio) and keep it alive for performance
-server_params = StdioServerParameters(
-    command=sys.executable,
-    args=[str(MCP_SCRIPT)],
-    cwd=str(BACKEND_DIR),
-    env={**os.environ},
+def _stdio_server_parameters():
+    try:
+        from mcp import StdioServerParameters
+    except ImportError:  # Local backend/mcp package shadowed the dependency
+        sys.modules.pop("mcp", None)
+        purelib = sysconfig.get_paths()["purelib"]
+        if purelib not in sys.path:
+            sys.path.insert(0, purelib)
+        from mcp import StdioServerParameters  # type: ignore
+    return StdioServerParameters
+
+@lru_cache(maxsize=1)
+def get_adapter():
+    """The MCP tool adapter, created on first use (or by the startup warm-up)."""
+    if MCP_SERVER_URL:
+        from backend.mcp_adapter import RemoteMCPAdapter
+
+        return RemoteMCPAdapter(MCP_SERVER_URL, transport=MCP_CLIENT_TRANSPORT)
+    try:  # Prefer built-in adapter when available
+        from crewai_tools import MCPServerAdapter  # type: ignore
+    except ImportError:  # pragma: no cover - fallback for versions without MCP adapter
+        from backend.mcp_adapter import MCPServerAdapter
+
+    # Spawn MCP server (stdio) and keep it alive for performance
+    server_params = _stdio_server_parameters()(
+        command=sys.executable,
+        args=[str(MCP_SCRIPT)],
+        cwd=str(BACKEND_DIR),
+        env={**os.environ},
+    )
+    return MCPServerAdapter(server_params)
+
+def get_answer_cache():
+    from backend.answer_cache import get_answer_cache
+
+    return get_answer_cache()
+
+def get_conversation_store():
+    from backend.conversation_memory import get_conversation_store
+
+    return get_conversation_store()
+
+def warm_up() -> None:
+    get_adapter()
+    warm_agent_templates()
+    get_answer_cache()
+    get_conversation_store()
+
+@asynccontextmanager
+async def lifespan(_app):
+    if APP_WARMUP:
+        await asyncio.to_thread(warm_up)
+    yield
+    agent_pool.shutdown()
+    if "backend.answer_cache" in sys.modules:
+        get_answer_cache().close()
+    if "backend.conversation_memory" in sys.modules:
+        get_conversation_store().close()
+    if get_adapter.cache_info().currsize:
+        adapter = get_adapter()
+        close = getattr(adapter, "stop", None) or getattr(adapter, "shutdown", None)
+        if close is not None:
+            close()
+    if "backend.lighthouse_mcp.db" in sys.modules:  # in-process tools and the fast path
+        from backend.lighthouse_mcp.db import close_pools
+
+        close_pools()
+
+app = FastAPI(title="LightHouse API", lifespan=lifespan)
+
+# Crew.kickoff() blocks for the whole LLM run, so it never runs on the event loop.
+agent_pool = AgentWorkerPool(AGENT_WORKERS, AGENT_QUEUE_DEPTH)
+crew_flights = AsyncSingleFlight("crew")
+
+REQUEST_SECONDS = metrics.histogram(
+    "lighthouse_request_seconds",
+    "End-to-end chat latency; route is fast, cache, agent, coalesced (joined an identical run) or rejected.",
+    ("endpoint", "persona", "route"),
 )
-adapter = MCPServerAdapter(server_params)
+AGENT_POOL = metrics.gauge("lighthouse_agent_pool", "Agent worker pool state.", ("stat",))
+ANSWER_CACHE = metrics.gauge("lighthouse_answer_cache", "Answer cache counters and hit rate.", ("stat",))
+
+def _collect() -> None:
+    for stat, value in agent_pool.stats().items():
+        AGENT_POOL.set(value, stat=stat)
+    if "backend.answer_cache" in sys.modules:
+        for stat, value in get_answer_cache().stats().items():
+            ANSWER_CACHE.set(float(value), stat=stat)
+
+metrics.on_collect(_collect)
 
 def auth(authorization: str = Header(...)):
+    import jwt
+
     try:
         token = authorization.split(" ")[1]
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        with metrics.span("auth"):
+            payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
         return {
             "user_id": payload["uid"],
             "role": payload["role"],
@@ -59,45 +173,72 @@ def auth(authorization: str = Header(...)):
     except Exception:
         raise HTTPException(401, "Invalid token")
 
-def build_agent(persona: str, tools):
-    if persona == "parent":
-        role = "Parent Coach"
-        goal = "Summarize a child's progress in plain English and suggest at-home support."
-        backstory = (
+PERSONAS = {
+    "parent": {
+        "role": "Parent Coach",
+        "goal": "Summarize a child's progress in plain English and suggest at-home support.",
+        "backstory": (
             "You are a friendly coach who translates school data for parents and offers"
             " practical tips for learning at home."
-        )
-    elif persona == "admin":
-        role = "School Insights"
-        goal = "Provide school-level analytics and risks from available data."
-        backstory = (
+        ),
+    },
+    "admin": {
+        "role": "School Insights",
+        "goal": "Provide school-level analytics and risks from available data.",
+        "backstory": (
             "You monitor trends across the school, highlighting risks and opportunities"
             " using academic and behavioural signals."
-        )
-    else:
-        role = "Teacher Advisor"
-        goal = "Explain a student's performance and suggest next steps using school data and curriculum."
-        backstory = (
+        ),
+    },
+    "teacher": {
+        "role": "Teacher Advisor",
+        "goal": "Explain a student's performance and suggest next steps using school data and curriculum.",
+        "backstory": (
             "You support classroom teachers by analysing curriculum coverage and results"
             " to recommend actionable next steps."
-        )
+        ),
+    },
+}
+AGENT_TOOLS = ("pg_safe_query", "rag_search", "report_compose")
+
+def new_agent(persona: str, stream: bool = False):
+    # A fresh Agent: LLM client, tool bindings and prompt templates. Requests use the cached
+    # agent_template instead; scripts/bench_agent_setup.py times this as the uncached path.
+    from crewai import Agent, LLM
+
+    tools = get_adapter().tools
+    extra = {"llm": LLM(model=LLM_MODEL, stream=True)} if stream else {}
     return Agent(
-        role=role,
-        goal=goal,
-        backstory=backstory,
-        tools=[tools["pg_safe_query"], tools["rag_search"], tools["report_compose"]],
+        **PERSONAS[persona],
+        tools=[tools[name] for name in AGENT_TOOLS],
         allow_delegation=False,
         verbose=False,
+        **extra,
     )
 
-@app.post("/chat")
-def chat(body: dict, ctx=Depends(auth)):
-    persona = body.get("persona", "teacher")
-    message = body["message"]
-    chat_id = body.get("chat_id", "default")
+@lru_cache(maxsize=None)
+def agent_template(persona: str, stream: bool = False):
+    # Built once per process and reused by every request for this persona. Never kicked off
+    # directly; see build_agent.
+    return new_agent(persona, stream)
 
-    tools = adapter.tools
-    agent = build_agent(persona, tools)
+def warm_agent_templates() -> None:
+    for persona in PERSONAS:
+        for stream in (False, True):
+            agent_template(persona, stream)
+
+def build_agent(persona: str, stream: bool = False):
+    persona = persona if persona in PERSONAS else "teacher"
+    with metrics.span("build_agent", persona=persona):
+        template = agent_template(persona, stream)
+        # Crew runs attach an executor and crew back-reference to their agents, so each request
+        # gets a copy; Agent.copy() shares the template's LLM and tool objects.
+        return template.copy()
+
+def build_crew(persona: str, message: str, ctx: dict, stream: bool = False, memory: str = "") -> "Crew":
+    from crewai import Crew, Task
+
+    agent = build_agent(persona, stream=stream)
 
     # IMPORTANT: We instruct the agent to include `_auth` in every tool call.
     # Your MCP tools should pop `_auth` and set Postgres GUCs via SET LOCAL.
@@ -106,42 +247,241 @@ def chat(body: dict, ctx=Depends(auth)):
         f"{ctx}\n"
         "Use pg_safe_query for DB reads and rag_search for curriculum/help. Be concise."
     )
+    if memory:
+        instructions = f"{instructions}\n\n{memory}"
     task = Task(
         description=f"{instructions}\n\nUser says: {message}",
         expected_output="A concise, student-friendly answer that references relevant school data.",
         agent=agent,
     )
-    result = Crew(agents=[agent], tasks=[task]).kickoff()
-    return JSONResponse({"answer": str(result)})
+    return Crew(agents=[agent], tasks=[task])
+
+def _saturated() -> HTTPException:
+    return HTTPException(
+        503,
+        "All agent workers are busy, please retry shortly",
+        headers={"Retry-After": AGENT_RETRY_AFTER},
+    )
+
+def kickoff(crew: "Crew", persona: str, recorder: ToolRecorder | None = None):
+    # Runs on an agent worker; LLM turns and tool calls all happen inside.
+    with metrics.span("crew_kickoff", persona=persona):
+        return recorder.run(crew.kickoff) if recorder is not None else crew.kickoff()
+
+async def run_crew(crew: "Crew", persona: str = "teacher", recorder: ToolRecorder | None = None):
+    try:
+        return await agent_pool.run(kickoff, crew, persona, recorder)
+    except AgentPoolSaturated:
+        metrics.label(route="rejected")
+        raise _saturated()
+
+def crew_key(persona: str, message: str, ctx: dict, history: str) -> tuple:
+    # Everything a crew's answer depends on; ctx is the caller's RLS scope.
+    return persona, json.dumps(ctx, sort_keys=True, default=str), message, history
+
+async def agent_answer(persona: str, message: str, ctx: dict, history: str, probe=None):
+    """One crew run for (possibly) several identical requests: (answer, tool results)."""
+    install_listeners()  # without the event bus, tool calls are unknown
+    recorder = ToolRecorder()
+    crew = build_crew(persona, message, ctx, memory=history)
+    answer = str(await run_crew(crew, persona, recorder))
+    if probe is not None:
+        get_answer_cache().store(probe, answer, recorder.observed_results())
+    return answer, recorder.results
+
+def call_tool(name: str, payload: dict):
+    """Call an MCP tool directly, outside any agent run."""
+    adapter = get_adapter()
+    client = getattr(adapter, "client", None)
+    if client is not None:  # standalone MCP server
+        return client.call_tool(name, {"payload": payload})
+    from backend.lighthouse_mcp import lighthouse_mcp_server as server
+    from backend.mcp_adapter import TOOL_SPECS
+
+    model = getattr(server, TOOL_SPECS[name][1])
+    return getattr(server, name)(model(**payload))
+
+def summarize(persona: str, message: str, answer: str) -> str:
+    from crewai import LLM
+
+    prompt = (
+        f"You are the {PERSONAS[persona]['role']}. Rewrite these school records as a short,"
+        " friendly answer to the question. Do not add facts.\n\n"
+        f"Question: {message}\n\nRecords:\n{answer}"
+    )
+    return str(LLM(model=LLM_MODEL).call([{"role": "user", "content": prompt}]))
+
+async def fast_answer(persona: str, message: str, ctx: dict, body: dict, recorder: ToolRecorder | None = None):
+    """Templated answer for a structured request, or None to run the agent."""
+    if not INTENT_ROUTER:
+        return None
+    intent = intent_router.route(message, ctx, hints=body)
+    if intent is None:
+        return None
+    try:
+        with metrics.span("fast_path", persona=persona):
+            result = await asyncio.to_thread(call_tool, intent.tool, intent.payload)
+    except Exception:  # the agent gets a chance to recover (and to explain the failure)
+        return None
+    answer = intent_router.render(intent, result)
+    if answer is not None and recorder is not None:
+        recorder.results.append((intent.tool, intent.payload, result))
+    if answer is not None and INTENT_ROUTER_SUMMARIZE:
+        try:
+            answer = await agent_pool.run(summarize, persona, message, answer)
+        except Exception:  # saturated pool or LLM error: the templated answer still stands
+            pass
+    return answer
+
+@app.post("/chat")
+async def chat(body: dict, ctx=Depends(auth)):
+    persona = body.get("persona", "teacher")
+    message = body["message"]
+    chat_id = body.get("chat_id")
+    if persona not in PERSONAS:
+        persona = "teacher"
+
+    with metrics.trace("POST /chat", REQUEST_SECONDS, endpoint="/chat", persona=persona, route="fast"):
+        memory = get_conversation_store()
+        with metrics.span("memory", persona=persona):
+            history = await asyncio.to_thread(memory.context, chat_id, ctx)
+        recorder = ToolRecorder()
+        answer = await fast_answer(persona, message, ctx, body, recorder)
+
+        probe = None
+        if answer is None and not history:  # cached answers ignore earlier turns
+            cache = get_answer_cache()
+            with metrics.span("answer_cache", persona=persona):
+                answer, probe = await asyncio.to_thread(cache.lookup, persona, ctx, message, body)
+            metrics.label(route="cache")
+
+        if answer is None:
+            metrics.label(route="agent")
+            (answer, tool_results), shared = await crew_flights.do(
+                crew_key(persona, message, ctx, history),
+                lambda: agent_answer(persona, message, ctx, history, probe),
+            )
+            recorder.results.extend(tool_results)
+            if shared:
+                metrics.label(route="coalesced")
+
+        await asyncio.to_thread(memory.append, chat_id, ctx, message, answer, recorder.results)
+        return JSONResponse({"answer": answer})
 
 @app.post("/chat/stream")
 async def chat_stream(body: dict, ctx=Depends(auth)):
     persona = body.get("persona", "teacher")
     message = body["message"]
-    chat_id = body.get("chat_id", "default")
+    chat_id = body.get("chat_id")
+    if persona not in PERSONAS:
+        persona = "teacher"
 
-    tools = adapter.tools
-    agent = build_agent(persona, tools)
+    # Finished when the answer is complete (by the worker for agent runs), not on return.
+    request_trace = metrics.start_trace(
+        "POST /chat/stream", endpoint="/chat/stream", persona=persona, route="cache"
+    )
+    memory = get_conversation_store()
+    with metrics.span("memory", persona=persona):
+        history = await asyncio.to_thread(memory.context, chat_id, ctx)
+    cache = get_answer_cache()
+    answer, probe = None, None
+    if not history:  # cached answers ignore earlier turns
+        with metrics.span("answer_cache", persona=persona):
+            answer, probe = await asyncio.to_thread(cache.lookup, persona, ctx, message, body)
+    if answer is not None:
+        await asyncio.to_thread(memory.append, chat_id, ctx, message, answer)
+        request_trace.finish(REQUEST_SECONDS)
+        return StreamingResponse(
+            replay(answer),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-    instructions = (
-        "When calling any tool, always include a params key `_auth` with this JSON:\n"
-        f"{ctx}\n"
-        "Use pg_safe_query for DB reads and rag_search for curriculum/help. Be concise."
+    key = crew_key(persona, message, ctx, history)
+    running = crew_flights.running(key)
+    if running is not None:  # an identical question is being answered: wait for it
+        request_trace.labels["route"] = "coalesced"
+
+        async def shared_answer() -> str:
+            try:
+                answer, tool_results = await asyncio.shield(running)
+            finally:
+                request_trace.finish(REQUEST_SECONDS)
+            await asyncio.to_thread(memory.append, chat_id, ctx, message, answer, tool_results)
+            return answer
+
+        return StreamingResponse(
+            follow(shared_answer(), heartbeat=SSE_HEARTBEAT_SECONDS),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    request_trace.labels["route"] = "agent"
+    install_listeners()
+    crew = build_crew(persona, message, ctx, stream=True, memory=history)
+    stream = CrewEventStream()
+    recorder = ToolRecorder()
+    try:
+        future = agent_pool.submit(stream.run, lambda: kickoff(crew, persona, recorder))
+    except AgentPoolSaturated:
+        request_trace.labels["route"] = "rejected"
+        request_trace.finish(REQUEST_SECONDS)
+        raise _saturated()
+
+    def finished(done) -> None:  # runs on the worker thread
+        request_trace.finish(REQUEST_SECONDS)
+        if done.cancelled() or done.exception() is not None:
+            return
+        answer = str(done.result())
+        cache.store(probe, answer, recorder.observed_results())
+        memory.append(chat_id, ctx, message, answer, recorder.results)
+
+    future.add_done_callback(finished)
+
+    async def outcome():
+        return str(await asyncio.wrap_future(future)), recorder.results
+
+    crew_flights.start(key, outcome())
+
+    return StreamingResponse(
+        stream.events(future, heartbeat=SSE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    task = Task(
-        description=f"{instructions}\n\nUser says: {message}",
-        expected_output="A concise, student-friendly answer that references relevant school data.",
-        agent=agent,
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Unauthenticated for scrapers; expose only on the internal network.
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats(ctx=Depends(auth)):
+    return JSONResponse({"answer_cache": get_answer_cache().stats(), "crew_runs": crew_flights.stats()})
+
+@app.post("/reports/bulk")
+async def reports_bulk(body: dict, ctx=Depends(auth)):
+    # One JSON report per line; the (blocking) generator runs in Starlette's threadpool.
+    # iter_reports checks the caller may read the roster before returning (a DB lookup for
+    # a class), so it runs in a thread too.
+    from backend.lighthouse_mcp.reports import iter_reports
+
+    try:
+        reports = await asyncio.to_thread(
+            iter_reports,
+            body["session"],
+            body["term"],
+            class_id=body.get("class_id"),
+            school_id=body.get("school_id"),
+            auth=ctx,
+        )
+    except KeyError as exc:
+        raise HTTPException(400, f"Missing field {exc.args[0]!r}")
+    except PermissionError as exc:
+        raise HTTPException(403, str(exc))
+    except ValueError as exc:
+        raise HTTPException(400, str(exc))
+
+    return StreamingResponse(
+        (json.dumps(report, default=str) + "\n" for report in reports),
+        media_type="application/x-ndjson",
     )
-    result = Crew(agents=[agent], tasks=[task]).kickoff()
-    text = str(result)
-
-    async def event_gen():
-        # Naive chunking into SSE events. Replace with token streaming when your LLM supports it.
-        for i in range(0, len(text), 256):
-            chunk = text[i:i+256]
-            yield f"data: {chunk}\n\n"
-            await asyncio.sleep(0)
-        yield "event: done\ndata: [DONE]\n\n"
-
-    return StreamingResponse(event_gen(), media_type="text/event-stream")
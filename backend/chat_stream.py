@@ -0,0 +1,260 @@
+"""Bridge CrewAI's event bus to Server-Sent Events for /chat/stream.
+
+CrewAI publishes LLM token chunks and tool-usage events on a process-wide event bus.
+We register one listener per event type and route each event to the stream that owns
+the crew run, identified by a context variable set inside the worker thread that calls
+``kickoff()``. Events emitted outside that context (e.g. by CrewAI versions that
+dispatch handlers on their own threads) are dropped, and the stream degrades to sending
+the final answer in one go. Tool results also go to the run's ``ToolRecorder``, if any,
+so the conversation memory can offer them to follow-up questions; because events can be
+dropped, the recorder only vouches for a run whose kickoff and tool starts it saw.
+
+Wire format:
+  - ``data: <text>``                token text (default ``message`` event)
+  - ``event: tool``                 JSON tool progress, e.g. ``{"message": "querying latest_results…"}``
+  - ``event: answer``               final answer, sent when tokens were streamed
+  - ``event: error``                JSON ``{"error": ...}`` if the run failed
+  - ``: heartbeat``                 comment line while the agent is thinking
+  - ``event: done`` / ``[DONE]``    end of stream
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DONE_EVENT = "event: done\ndata: [DONE]\n\n"
+HEARTBEAT = ": heartbeat\n\n"
+
+_current_stream: ContextVar[Optional["CrewEventStream"]] = ContextVar("crew_event_stream", default=None)
+_current_recorder: ContextVar[Optional["ToolRecorder"]] = ContextVar("tool_recorder", default=None)
+_listeners_lock = threading.Lock()
+_listeners_installed: bool | None = None
+
+
+def sse(data: str, event: str | None = None) -> str:
+    """Format one SSE event; multi-line data is split into several `data:` lines."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def describe_tool(tool_name: str, tool_args: Any) -> str:
+    """Human-friendly progress line for a tool call."""
+    args = tool_args
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except ValueError:
+            args = {}
+    if not isinstance(args, dict):
+        args = {}
+    payload = args.get("payload", args)
+    if not isinstance(payload, dict):
+        payload = {}
+    if tool_name == "pg_safe_query" and payload.get("name"):
+        return f"querying {payload['name']}…"
+    if tool_name == "rag_search":
+        return "searching curriculum…"
+    if tool_name == "report_compose":
+        return "composing term report…"
+    return f"running {tool_name}…"
+
+
+def _publish(kind: str, payload: Dict[str, Any]) -> None:
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.publish(kind, payload)
+
+
+def _record_kickoff() -> None:
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.kicked_off = True
+
+
+def _record_tool_started() -> None:
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.started += 1
+
+
+def _record_tool(tool: str, args: Any, output: Any) -> None:
+    recorder = _current_recorder.get()
+    if recorder is not None and output is not None:
+        recorder.results.append((tool, args, output))
+
+
+def install_listeners() -> bool:
+    """Register the event-bus listeners once; returns False if CrewAI has no event bus."""
+    global _listeners_installed
+    with _listeners_lock:
+        if _listeners_installed is not None:
+            return _listeners_installed
+        try:
+            from crewai.events import (  # type: ignore
+                CrewKickoffStartedEvent,
+                LLMStreamChunkEvent,
+                ToolUsageFinishedEvent,
+                ToolUsageStartedEvent,
+                crewai_event_bus,
+            )
+        except ImportError:
+            try:
+                from crewai.utilities.events import (  # type: ignore
+                    CrewKickoffStartedEvent,
+                    LLMStreamChunkEvent,
+                    ToolUsageFinishedEvent,
+                    ToolUsageStartedEvent,
+                    crewai_event_bus,
+                )
+            except ImportError:
+                logger.info("CrewAI event bus unavailable; /chat/stream will send whole answers")
+                _listeners_installed = False
+                return False
+
+        @crewai_event_bus.on(CrewKickoffStartedEvent)
+        def _on_kickoff(source: Any, event: Any) -> None:
+            _record_kickoff()
+
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def _on_chunk(source: Any, event: Any) -> None:
+            chunk = getattr(event, "chunk", "")
+            if chunk:
+                _publish("token", {"text": chunk})
+
+        @crewai_event_bus.on(ToolUsageStartedEvent)
+        def _on_tool_started(source: Any, event: Any) -> None:
+            _record_tool_started()
+            name = getattr(event, "tool_name", "tool")
+            _publish("tool", {
+                "tool": name,
+                "status": "started",
+                "message": describe_tool(name, getattr(event, "tool_args", None)),
+            })
+
+        @crewai_event_bus.on(ToolUsageFinishedEvent)
+        def _on_tool_finished(source: Any, event: Any) -> None:
+            name = getattr(event, "tool_name", "tool")
+            _publish("tool", {"tool": name, "status": "finished"})
+            _record_tool(name, getattr(event, "tool_args", None), getattr(event, "output", None))
+
+        _listeners_installed = True
+        return True
+
+
+def replay(text: str) -> Iterator[str]:
+    """SSE events for an answer that is already known (e.g. served from a cache)."""
+    for i in range(0, len(text), 256):
+        yield sse(text[i:i + 256])
+    yield DONE_EVENT
+
+
+async def follow(answer: Awaitable[str], heartbeat: float = 15.0) -> AsyncIterator[str]:
+    """SSE events for an answer another request's crew run is producing.
+
+    Heartbeats until `answer` resolves, then replays it. Closing the stream does not
+    cancel `answer`.
+    """
+    task = asyncio.ensure_future(answer)
+    while not task.done():
+        await asyncio.wait({task}, timeout=heartbeat)
+        if not task.done():
+            yield HEARTBEAT
+    try:
+        text = task.result()
+    except Exception as exc:
+        yield sse(json.dumps({"error": str(exc)}), event="error")
+        yield DONE_EVENT
+        return
+    for event in replay(text):
+        yield event
+
+
+class ToolRecorder:
+    """Collects (tool, args, output) for every tool call of one crew run, for chat memory."""
+
+    def __init__(self) -> None:
+        self.results: List[Tuple[str, Any, Any]] = []
+        self.kicked_off = False  # the kickoff event reached this run's context
+        self.started = 0  # tool-start events seen in this run's context
+
+    def observed_results(self) -> Optional[List[Tuple[str, Any, Any]]]:
+        """`results` if they provably cover every tool call of the run, else None (unknown).
+
+        That needs the kickoff event, and one recorded result per tool start: a dropped
+        event, a finish not yet delivered or a call without output all leave a gap.
+        """
+        if not self.kicked_off or self.started != len(self.results):
+            return None
+        return self.results
+
+    def run(self, fn: Callable[[], Any]) -> Any:
+        token = _current_recorder.set(self)
+        try:
+            return fn()
+        finally:
+            _current_recorder.reset(token)
+
+
+class CrewEventStream:
+    """Per-request queue of crew events, consumed by the SSE generator.
+
+    Must be created on the event loop; :meth:`run` is executed on a worker thread.
+    """
+
+    def __init__(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def publish(self, kind: str, payload: Dict[str, Any] | None = None) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (kind, payload))
+
+    def run(self, fn: Callable[[], Any]) -> Any:
+        token = _current_stream.set(self)
+        try:
+            return fn()
+        finally:
+            _current_stream.reset(token)
+            self.publish("end")
+
+    async def events(self, future: Future, heartbeat: float = 15.0) -> AsyncIterator[str]:
+        result_future = asyncio.wrap_future(future)
+        streamed = False
+        while True:
+            try:
+                kind, payload = await asyncio.wait_for(self._queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if result_future.done():  # cancelled before it ever ran
+                    break
+                yield HEARTBEAT
+                continue
+            if kind == "end":
+                break
+            if kind == "token":
+                streamed = True
+                yield sse(payload["text"])
+            elif kind == "tool":
+                yield sse(json.dumps(payload, ensure_ascii=False), event="tool")
+
+        try:
+            result = await result_future
+        except Exception as exc:  # surface agent failures to the client instead of a dropped stream
+            logger.exception("Crew run failed during /chat/stream")
+            yield sse(json.dumps({"error": str(exc)}), event="error")
+            yield DONE_EVENT
+            return
+
+        text = str(result)
+        if streamed:
+            yield sse(text, event="answer")
+            yield DONE_EVENT
+        else:
+            for event in replay(text):
+                yield event
@@ -0,0 +1,269 @@
+# conversation_memory.py
+"""Per-``chat_id`` conversation memory for /chat and /chat/stream.
+
+A conversation keeps a running summary, the most recent turns and the tool results
+already fetched (keyed by tool and arguments, ``_auth`` stripped). Its rendered form is
+added to the agent's task so follow-up questions reuse earlier data instead of calling
+the same tools again. Whenever the rendering exceeds ``MEMORY_TOKEN_BUDGET`` (estimated
+at four characters per token) older turns are folded into the summary, the summary is
+shortened, and only then are the oldest tool results dropped.
+
+Conversations are keyed by the caller's auth scope plus ``chat_id``, so a chat is only
+ever visible to the user who created it. They live in an in-process LRU of
+``MEMORY_MAX_CHATS`` entries; with ``MEMORY_DATABASE_URL`` set they are also persisted
+to ``chat_memory`` (sql/14_chat_memory.sql) and survive restarts and load balancing.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.lighthouse_mcp.db import Auth, auth_settings
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_CHATS = int(os.environ.get("MEMORY_MAX_CHATS", "1000"))
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", "1500"))
+MEMORY_TURN_CHARS = int(os.environ.get("MEMORY_TURN_CHARS", "800"))  # per stored answer
+MEMORY_TOOL_CHARS = int(os.environ.get("MEMORY_TOOL_CHARS", "1500"))  # per stored tool result
+MEMORY_SUMMARIZER = os.environ.get("MEMORY_SUMMARIZER", "extractive")  # extractive | llm
+MEMORY_DATABASE_URL = os.environ.get("MEMORY_DATABASE_URL")  # needs write access to chat_memory
+
+ToolResult = Tuple[str, Any, Any]  # (tool name, arguments, output)
+Summarizer = Callable[[str, str, str], str]  # (summary, question, answer) -> summary
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:max(0, limit - 1)].rstrip() + "…"
+
+
+def _strip_auth(args: Any) -> Any:
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except ValueError:
+            return args
+    if isinstance(args, dict):
+        return {key: _strip_auth(value) for key, value in args.items() if key != "_auth"}
+    return args
+
+
+def extractive_summary(summary: str, question: str, answer: str) -> str:
+    first = _SENTENCE.split(" ".join(answer.split()), maxsplit=1)[0]
+    line = f"- Asked: {_clip(question, 160)} Answered: {_clip(first, 200)}"
+    return f"{summary}\n{line}".strip()
+
+
+def llm_summary(summary: str, question: str, answer: str) -> str:
+    from crewai import LLM
+
+    prompt = (
+        "Update this running summary of a conversation between a school assistant and a user"
+        " with the new exchange. Keep names, ids, subjects, terms and numbers; at most 120 words."
+        f"\n\nSummary so far:\n{summary or '(empty)'}\n\nUser: {question}\nAssistant: {answer}"
+    )
+    model = os.environ.get("OPENAI_MODEL_NAME", "gpt-4o-mini")
+    return str(LLM(model=model).call([{"role": "user", "content": prompt}])).strip()
+
+
+@dataclass
+class Conversation:
+    summary: str = ""
+    turns: List[List[str]] = field(default_factory=list)  # [question, answer], oldest first
+    tools: Dict[str, str] = field(default_factory=dict)  # "tool {args}" -> output, oldest first
+    # Serializes turns of one chat; held while an LLM summarizer runs, so not the store's lock.
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def state(self) -> Dict[str, Any]:
+        return {"summary": self.summary, "turns": list(self.turns), "tools": dict(self.tools)}
+
+    def render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append(f"Earlier in this conversation:\n{self.summary}")
+        if self.turns:
+            lines = [f"User: {q}\nAssistant: {a}" for q, a in self.turns]
+            parts.append("Recent turns:\n" + "\n".join(lines))
+        if self.tools:
+            lines = [f"- {call} -> {output}" for call, output in self.tools.items()]
+            parts.append(
+                "Data already fetched in this conversation (reuse it instead of calling the tool"
+                " again):\n" + "\n".join(lines)
+            )
+        return "\n\n".join(parts)
+
+
+class ConversationStore:
+    def __init__(
+        self,
+        max_chats: int = MEMORY_MAX_CHATS,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        summarizer: Optional[Summarizer] = None,
+        url: Optional[str] = None,
+    ) -> None:
+        self.max_chats = max(0, max_chats)
+        self.token_budget = token_budget
+        self.summarizer = summarizer or extractive_summary
+        self._chats: "OrderedDict[Tuple[str, str], Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"turns": 0, "folded_turns": 0, "dropped_tools": 0, "evictions": 0}
+        self._pool = None
+        if url:
+            from psycopg_pool import ConnectionPool
+
+            self._pool = ConnectionPool(url, min_size=1, max_size=4, kwargs={"autocommit": True}, open=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_chats) and self.token_budget > 0
+
+    @staticmethod
+    def key(chat_id: str, auth: Auth) -> Tuple[str, str]:
+        return json.dumps(auth_settings(auth)), str(chat_id)
+
+    # --- persistence
+    def _load(self, key: Tuple[str, str]) -> Conversation:
+        if self._pool is not None:
+            try:
+                with self._pool.connection() as conn:
+                    row = conn.execute(
+                        "SELECT state FROM chat_memory WHERE scope = %s AND chat_id = %s", key
+                    ).fetchone()
+                if row:
+                    return Conversation(**row[0])
+            except Exception as exc:  # memory is an optimisation; never fail the request
+                logger.warning("Could not load chat memory: %s", exc)
+        return Conversation()
+
+    def _save(self, key: Tuple[str, str], state: Dict[str, Any]) -> None:
+        if self._pool is None:
+            return
+        from psycopg.types.json import Jsonb
+
+        try:
+            with self._pool.connection() as conn:
+                conn.execute(
+                    "INSERT INTO chat_memory (scope, chat_id, state) VALUES (%s, %s, %s) "
+                    "ON CONFLICT (scope, chat_id) DO UPDATE SET state = EXCLUDED.state, updated_at = now()",
+                    (*key, Jsonb(state)),
+                )
+        except Exception as exc:
+            logger.warning("Could not save chat memory: %s", exc)
+
+    def _get(self, key: Tuple[str, str]) -> Conversation:
+        with self._lock:
+            conversation = self._chats.get(key)
+            if conversation is not None:
+                self._chats.move_to_end(key)
+                return conversation
+        conversation = self._load(key)
+        with self._lock:
+            conversation = self._chats.setdefault(key, conversation)
+            self._chats.move_to_end(key)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+                self.counters["evictions"] += 1
+        return conversation
+
+    # --- public API
+    def context(self, chat_id: Optional[str], auth: Auth) -> str:
+        """The conversation so far, rendered for the agent's task ("" for a new chat)."""
+        if not chat_id or not self.enabled:
+            return ""
+        conversation = self._get(self.key(chat_id, auth))
+        with conversation.lock:
+            return conversation.render()
+
+    def append(
+        self,
+        chat_id: Optional[str],
+        auth: Auth,
+        question: str,
+        answer: str,
+        tool_results: Iterable[ToolResult] = (),
+    ) -> None:
+        if not chat_id or not self.enabled:
+            return
+        key = self.key(chat_id, auth)
+        conversation = self._get(key)
+        with conversation.lock:
+            conversation.turns.append([_clip(question, 500), _clip(answer, MEMORY_TURN_CHARS)])
+            for tool, args, output in tool_results:
+                call = f"{tool} {json.dumps(_strip_auth(args), sort_keys=True, default=str)}"
+                conversation.tools.pop(call, None)  # re-insert as the most recent
+                if not isinstance(output, str):
+                    output = json.dumps(output, default=str)
+                conversation.tools[call] = _clip(output, MEMORY_TOOL_CHARS)
+            self._compact(conversation)
+            state = conversation.state()
+        with self._lock:
+            self.counters["turns"] += 1
+        self._save(key, state)
+
+    def _fold_oldest_turn(self, conversation: Conversation) -> None:
+        question, answer = conversation.turns.pop(0)
+        try:
+            conversation.summary = self.summarizer(conversation.summary, question, answer)
+        except Exception as exc:  # e.g. the LLM summarizer is unavailable
+            logger.warning("Chat memory summarizer failed (%s); using extractive summary", exc)
+            conversation.summary = extractive_summary(conversation.summary, question, answer)
+        self._count("folded_turns")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _compact(self, conversation: Conversation) -> None:
+        """Shrink `conversation` until its rendering fits the token budget.
+
+        Older turns are folded into the summary first and the summary is held to a quarter
+        of the budget (oldest lines go first), so the fetched tool results, which save the
+        most work on follow-ups, are dropped only after that.
+        """
+        budget = self.token_budget
+        while estimate_tokens(conversation.render()) > budget:
+            if len(conversation.turns) > 1:
+                self._fold_oldest_turn(conversation)
+            elif estimate_tokens(conversation.summary) > budget // 4:
+                lines = conversation.summary.split("\n")
+                conversation.summary = (
+                    "\n".join(lines[1:]) if len(lines) > 1 else _clip(conversation.summary, budget)
+                )
+            elif conversation.tools:
+                del conversation.tools[next(iter(conversation.tools))]
+                self._count("dropped_tools")
+            elif conversation.turns:
+                self._fold_oldest_turn(conversation)
+            else:
+                conversation.summary = _clip(conversation.summary, max(0, budget * 4 - 40))
+                break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["chats"] = len(self._chats)
+        return stats
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+
+
+@lru_cache(maxsize=1)
+def get_conversation_store() -> ConversationStore:
+    summarizer = llm_summary if MEMORY_SUMMARIZER == "llm" else extractive_summary
+    return ConversationStore(summarizer=summarizer, url=MEMORY_DATABASE_URL)
@@ -0,0 +1,167 @@
+# intent_router.py
+"""Deterministic fast path for structured chat requests.
+
+Requests such as "latest results for student 12" or "first term report for my child,
+2024/2025" map onto a single MCP tool call, so running them through a multi-turn Crew
+only adds LLM latency and cost. ``route`` recognizes them with plain patterns and
+``render`` turns the tool result into a templated answer. Anything open-ended (advice,
+explanations, comparisons), ambiguous (no student, session or term) or unsuccessful
+returns ``None`` and the request falls back to the agent.
+
+The tool calls carry the caller's ``_auth``. Results are hidden by row-level security;
+profiles and report headers are only returned for students in the caller's scope
+(``lighthouse_mcp.reports.student_scope_sql``), and when none comes back the request
+goes to the agent rather than being answered from an empty record.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+
+# Longer messages are almost always open-ended; leave them to the agent.
+MAX_MESSAGE_CHARS = 200
+
+_OPEN_ENDED = re.compile(
+    r"\b(why|how (?:can|could|should|do|does|to|is|are)|help|improve|suggest\w*|advi[cs]e|"
+    r"recommend\w*|explain|compare|plan|support|tips?|concern\w*|worr\w*|struggl\w*)\b",
+    re.IGNORECASE,
+)
+_STUDENT = re.compile(r"\bstudent\s*(?:id\s*)?(?:#|no\.?\s*|number\s*)?(\d+)\b", re.IGNORECASE)
+_LATEST = re.compile(
+    r"\b(?:latest|recent|current|last|newest)\s+(?:results?|grades?|scores?|marks?)\b", re.IGNORECASE
+)
+_REPORT = re.compile(r"\b(?:term\s+report|report\s+card)\b", re.IGNORECASE)
+_PROFILE = re.compile(r"\b(?:profile|details)\b", re.IGNORECASE)
+_TERM = re.compile(r"\b(first|second|third|1st|2nd|3rd)\s+term\b", re.IGNORECASE)
+_SESSION = re.compile(r"\b(\d{4})\s*[/-]\s*(\d{4})\b")
+_ORDINALS = {"1st": "first", "2nd": "second", "3rd": "third"}
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str  # latest_results | student_profile | term_report
+    tool: str
+    payload: Dict[str, Any]
+
+
+def _student_id(message: str, hints: Mapping[str, Any]) -> Optional[int]:
+    match = _STUDENT.search(message)
+    if match:
+        return int(match.group(1))
+    hinted = hints.get("student_id")
+    try:
+        return int(hinted) if hinted is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _term(message: str, hints: Mapping[str, Any]) -> Optional[str]:
+    match = _TERM.search(message)
+    term = match.group(1).lower() if match else str(hints.get("term") or "").lower() or None
+    return _ORDINALS.get(term, term)
+
+
+def _session(message: str, hints: Mapping[str, Any]) -> Optional[str]:
+    match = _SESSION.search(message)
+    if match:
+        return f"{match.group(1)}/{match.group(2)}"
+    return hints.get("session") or None
+
+
+def route(
+    message: str,
+    auth: Optional[Dict[str, Any]] = None,
+    hints: Optional[Mapping[str, Any]] = None,
+) -> Optional[Intent]:
+    """The tool call that fully answers `message`, or None to use the agent.
+
+    `hints` carries structured context from the request body (`student_id`, `session`,
+    `term`), e.g. the child a parent's UI has selected; the message takes precedence.
+    """
+    hints = hints or {}
+    if len(message) > MAX_MESSAGE_CHARS or _OPEN_ENDED.search(message):
+        return None
+    student_id = _student_id(message, hints)
+    if student_id is None:
+        return None
+
+    if _REPORT.search(message):
+        session, term = _session(message, hints), _term(message, hints)
+        if not session or term not in ("first", "second", "third"):
+            return None  # the agent can ask which term
+        payload = {"student_id": student_id, "session": session, "term": term, "_auth": auth}
+        return Intent("term_report", "report_compose", payload)
+    if _LATEST.search(message):
+        params = {"student_id": student_id, "_auth": auth}
+        return Intent("latest_results", "pg_safe_query", {"name": "latest_results", "params": params})
+    if _PROFILE.search(message):
+        params = {"student_id": student_id, "_auth": auth}
+        return Intent("student_profile", "pg_safe_query", {"name": "student_profile", "params": params})
+    return None
+
+
+def _score(row: Mapping[str, Any]) -> str:
+    total, grade = row.get("total"), row.get("grade")
+    score = f"{float(total):g}" if total is not None else "no score"
+    return f"{score} ({grade})" if grade else score
+
+
+def _result_lines(rows: List[Mapping[str, Any]], with_term: bool) -> List[str]:
+    lines = []
+    for row in rows:
+        subject = row.get("subject") or f"Subject {row.get('subject_id')}"
+        when = f" - {row.get('term')} term {row.get('session')}" if with_term else ""
+        line = f"- {subject}{when}: {_score(row)}"
+        remark = row.get("teacher_remark") or row.get("grade_remark")
+        lines.append(f"{line}. {remark}" if remark else line)
+    return lines
+
+
+def _name(student: Mapping[str, Any], student_id: Any) -> str:
+    name = " ".join(filter(None, (student.get("first_name"), student.get("last_name"))))
+    return name or f"student {student_id}"
+
+
+def render(intent: Intent, result: Any) -> Optional[str]:
+    """Templated answer for a tool result; None when the agent should take over."""
+    if isinstance(result, dict) and "error" in result:
+        return None
+    student_id = intent.payload.get("student_id") or intent.payload.get("params", {}).get("student_id")
+
+    if intent.name == "latest_results":
+        if not result:
+            return f"No results are visible to you for student {student_id}."
+        return "\n".join([f"Latest results for student {student_id}:", *_result_lines(result, True)])
+
+    if intent.name == "student_profile":
+        if not result:
+            return None  # unknown, or not in the caller's scope
+        profile = result[0]
+        lines = [f"{_name(profile, student_id)} (student {student_id})"]
+        if profile.get("admission_number"):
+            lines.append(f"- Admission number: {profile['admission_number']}")
+        if profile.get("current_class"):
+            lines.append(f"- Class: {profile['current_class']}")
+        return "\n".join(lines)
+
+    if intent.name == "term_report":
+        student = result.get("student") or {}
+        if not student:
+            return None  # unknown, or not in the caller's scope
+        header = f"{result['term'].capitalize()} term report {result['session']} for {_name(student, student_id)}"
+        results = result.get("results") or []
+        lines = [header + ":", *_result_lines(results, False)] if results else [
+            f"{header}: no results recorded for this term."
+        ]
+        behaviour = result.get("behaviour") or {}
+        for key in ("behaviours", "skills"):
+            if behaviour.get(key):
+                values = behaviour[key]
+                if isinstance(values, dict):
+                    values = ", ".join(f"{k}: {v}" for k, v in values.items())
+                elif isinstance(values, list):
+                    values = ", ".join(str(v) for v in values)
+                lines.append(f"{key.capitalize()}: {values}")
+        return "\n".join(lines)
+    return None
@@ -0,0 +1,147 @@
+# lighthouse_mcp/db.py
+"""Pooled Postgres access for the LightHouse MCP tools.
+
+Every query borrows a connection from a bounded pool and runs inside its own
+transaction. The ``_auth`` context used by the RLS policies is applied with
+``set_config(..., is_local => true)`` so it disappears on commit/rollback, and the
+pool's reset hook clears session state again before a connection is reused. New
+connections get the binary pgvector adapters from :mod:`vectors`.
+
+When libpq supports it, BEGIN, the GUC statement and the query are sent in pipeline
+mode, so a ``db_rows`` call costs one network round trip plus the COMMIT.
+
+Time spent borrowing a connection and running the query is recorded separately in
+``lighthouse_db_seconds{phase="connect"|"query"}`` (see :mod:`metrics`).
+"""
+from __future__ import annotations
+
+import os
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+from backend.lighthouse_mcp.metrics import DB_SECONDS, span
+from backend.lighthouse_mcp.vectors import register_vector
+
+DB_RO_URL = os.environ.get("DATABASE_URL_RO") or os.environ.get("DATABASE_URL")
+
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", "300"))
+POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600"))
+POOL_HEALTH_CHECK = os.environ.get("DB_POOL_HEALTH_CHECK", "1").lower() not in ("0", "false", "no")
+PIPELINE = psycopg.Pipeline.is_supported()  # libpq >= 14
+
+# `_auth` key -> Postgres GUC read by the RLS policies
+AUTH_GUCS = (
+    ("user_id", "app.user_id"),
+    ("role", "app.role"),
+    ("school_id", "app.school_id"),
+)
+
+Auth = Optional[Dict[str, Any]]
+Params = Union[Sequence[Any], Mapping[str, Any]]
+# Extra transaction-local GUCs, e.g. {"hnsw.iterative_scan": "relaxed_order"}
+Settings = Optional[Mapping[str, Any]]
+
+
+def auth_settings(auth: Auth) -> List[tuple[str, str]]:
+    """Return the (guc, value) pairs to apply for an `_auth` payload."""
+    if not auth:
+        return []
+    return [(guc, str(auth[key])) for key, guc in AUTH_GUCS if auth.get(key) is not None]
+
+
+def _settings_statement(auth: Auth, settings: Settings = None) -> tuple[str, list[str]] | None:
+    pairs = auth_settings(auth) + [(name, str(value)) for name, value in (settings or {}).items()]
+    if not pairs:
+        return None
+    sql = "SELECT " + ", ".join("set_config(%s, %s, true)" for _ in pairs)
+    return sql, [value for pair in pairs for value in pair]
+
+
+def apply_auth(cur: psycopg.Cursor, auth: Auth, settings: Settings = None) -> None:
+    """Set the RLS GUCs (plus any extra `settings`) for the current transaction in one round trip."""
+    stmt = _settings_statement(auth, settings)
+    if stmt is not None:
+        cur.execute(*stmt)
+
+
+def _require_url() -> str:
+    if not DB_RO_URL:
+        raise RuntimeError("Set DATABASE_URL_RO in your environment")
+    return DB_RO_URL
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    # autocommit lets us scope each call with an explicit transaction block, so
+    # SET LOCAL style GUCs never outlive the query that needed them.
+    return dict(
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT,
+        max_idle=POOL_MAX_IDLE,
+        max_lifetime=POOL_MAX_LIFETIME,
+        kwargs={"autocommit": True},
+        name="lighthouse-ro",
+    )
+
+
+def _configure(conn: psycopg.Connection) -> None:
+    register_vector(conn)
+
+
+def _reset(conn: psycopg.Connection) -> None:
+    conn.execute("RESET ALL")
+
+
+@lru_cache(maxsize=1)
+def get_pool() -> ConnectionPool:
+    return ConnectionPool(
+        _require_url(),
+        configure=_configure,
+        reset=_reset,
+        check=ConnectionPool.check_connection if POOL_HEALTH_CHECK else None,
+        open=True,
+        **_pool_kwargs(),
+    )
+
+
+@contextmanager
+def connection(auth: Auth = None, settings: Settings = None) -> Iterator[psycopg.Connection]:
+    """Borrow a pooled connection with `auth`/`settings` applied to a fresh transaction."""
+    with ExitStack() as stack:
+        with span("db_connect", DB_SECONDS, phase="connect"):  # pool wait, new connection, health check
+            conn = stack.enter_context(get_pool().connection())
+        with conn.pipeline() if PIPELINE else nullcontext(), conn.transaction():
+            if auth or settings:
+                with conn.cursor() as cur:
+                    apply_auth(cur, auth, settings)
+            yield conn
+
+
+def _as_dicts(cur: psycopg.Cursor, rows: list) -> List[Dict[str, Any]]:
+    cols = [c[0] for c in cur.description]
+    return [dict(zip(cols, r)) for r in rows]
+
+
+def db_rows(
+    sql: str, args: Params = (), auth: Auth = None, settings: Settings = None
+) -> List[Dict[str, Any]]:
+    with connection(auth, settings) as conn, conn.cursor() as cur:
+        with span("db_query", DB_SECONDS, phase="query"):
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+        return _as_dicts(cur, rows)
+
+
+def close_pools() -> None:
+    """Close the pool (if opened); the MCP server calls this on shutdown."""
+    if get_pool.cache_info().currsize:
+        get_pool().close()
+        get_pool.cache_clear()
+
@@ -0,0 +1,177 @@
+# lighthouse_mcp/embedding_cache.py
+"""Content-addressed cache for embeddings.
+
+Two tiers, both keyed by ``sha256(model, dimension, normalized text)``:
+
+1. an in-process LRU bounded by ``EMBEDDING_CACHE_SIZE`` entries, and
+2. a durable SQLite file (``EMBEDDING_CACHE_PATH``) shared by the MCP server and the
+   ingest script, bounded by ``EMBEDDING_CACHE_MAX_ROWS`` with least-recently-used
+   eviction.
+
+SQLite is used rather than Postgres because the MCP tools run on a read-only role.
+Set ``EMBEDDING_CACHE_PATH=off`` to keep only the in-memory tier.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "2048"))
+CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    str(Path.home() / ".cache" / "lighthouse" / "embeddings.sqlite3"),
+)
+CACHE_MAX_ROWS = int(os.environ.get("EMBEDDING_CACHE_MAX_ROWS", "500000"))
+
+# Check the on-disk row count every N writes rather than on every insert.
+_EVICT_CHECK_EVERY = 256
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of `text` used both as the cache key and as the API input."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def cache_key(model: str, dimension: int, text: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{dimension}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = CACHE_SIZE, path: Optional[str] = CACHE_PATH,
+                 max_rows: int = CACHE_MAX_ROWS) -> None:
+        self.max_entries = max(0, max_entries)
+        self.max_rows = max_rows
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        if path and path.lower() not in ("off", "none", "0"):
+            try:
+                self._db = self._open(path)
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning("Embedding cache at %s unavailable (%s); using memory only", path, exc)
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used)")
+        return db
+
+    # --- in-memory tier
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        if not self.max_entries:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["memory_evictions"] += 1
+
+    def get(self, model: str, dimension: int, text: str) -> Optional[np.ndarray]:
+        key = cache_key(model, dimension, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embedding_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype="<f4")
+                    if vector.shape[0] == dimension:
+                        self._db.execute(
+                            "UPDATE embedding_cache SET last_used = ? WHERE key = ?", (time.time(), key)
+                        )
+                        self._remember(key, vector)
+                        self.counters["disk_hits"] += 1
+                        return vector
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, model: str, dimension: int, text: str, vector: np.ndarray) -> None:
+        key = cache_key(model, dimension, text)
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)  # shared between callers
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, dimension, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, dimension, vector.astype("<f4", copy=False).tobytes(), time.time()),
+            )
+            self._writes += 1
+            if self._writes % _EVICT_CHECK_EVERY == 0:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+        excess = count - self.max_rows
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embedding_cache WHERE key IN ("
+                "SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.counters["disk_evictions"] += excess
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache()
@@ -0,0 +1,158 @@
+# lighthouse_mcp/embeddings.py
+"""OpenAI embeddings for rag_search and the ingest script.
+
+Separate from the MCP server module so callers that only embed text (the ingest CLI)
+do not pay for importing the server, and the OpenAI client is created on first use.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.lighthouse_mcp.embedding_cache import get_embedding_cache, normalize_text
+from backend.lighthouse_mcp.metrics import EMBEDDING_SECONDS, span
+from backend.lighthouse_mcp.singleflight import SingleFlight
+from backend.lighthouse_mcp.vectors import as_vector, from_base64
+
+logger = logging.getLogger(__name__)
+
+_embedding_flights = SingleFlight("embedding")
+
+EMBEDDING_MODEL = os.environ.get("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIM = int(os.environ.get("OPENAI_EMBEDDING_DIM", "1536"))
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "128"))
+EMBEDDING_CONCURRENCY = int(os.environ.get("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", "5"))
+
+
+@lru_cache(maxsize=1)
+def _get_openai_client():
+    try:
+        from openai import OpenAI  # type: ignore
+    except ImportError as exc:  # pragma: no cover - dependency missing at runtime
+        raise RuntimeError(
+            "Install the 'openai' package (pip install openai>=1.0.0) to enable embeddings"
+        ) from exc
+
+    if not os.environ.get("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY environment variable is required for embeddings")
+
+    return OpenAI()
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in ("RateLimitError", "APIConnectionError", "APITimeoutError")
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return min(float(headers["retry-after"]), 60.0)
+    except (KeyError, TypeError, ValueError):
+        return min(0.5 * 2 ** attempt, 20.0) * (0.5 + random.random())
+
+
+def _request_embeddings(snippets: List[str]) -> List[np.ndarray]:
+    """One embeddings API call for `snippets`, retried with backoff on rate limits."""
+    client = _get_openai_client()
+    attempt = 0
+    while True:
+        try:
+            # base64 lets us decode straight into float32 arrays, skipping JSON float lists.
+            with span("embedding_api", EMBEDDING_SECONDS, source="api"):
+                response = client.embeddings.create(
+                    model=EMBEDDING_MODEL, input=snippets, encoding_format="base64"
+                )
+            break
+        except Exception as exc:  # pragma: no cover - network/runtime errors
+            if attempt >= EMBEDDING_MAX_RETRIES or not _is_retryable(exc):
+                raise RuntimeError(f"OpenAI embeddings request failed: {exc}") from exc
+            delay = _retry_delay(exc, attempt)
+            logger.warning("Embeddings request failed (%s); retrying in %.1fs", exc, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    embeddings = [
+        from_base64(item.embedding) if isinstance(item.embedding, str) else as_vector(item.embedding)
+        for item in sorted(response.data, key=lambda item: item.index)
+    ]
+    for embedding in embeddings:
+        if len(embedding) != EMBEDDING_DIM:
+            raise RuntimeError(
+                f"Embedding dimension mismatch: expected {EMBEDDING_DIM}, received {len(embedding)}"
+            )
+    return embeddings
+
+
+def get_embedding(text: str) -> np.ndarray:
+    """Return a float32 embedding for the provided text (sent to pgvector in binary).
+
+    Results are cached by (model, dimension, normalized text) in memory and on disk,
+    so repeated queries and re-ingests of unchanged chunks skip the API call; concurrent
+    misses for the same text share one call.
+    """
+    snippet = normalize_text(text)
+    if not snippet:
+        raise ValueError("Cannot embed empty text")
+
+    cache = get_embedding_cache()
+    started = time.perf_counter()
+    cached = cache.get(EMBEDDING_MODEL, EMBEDDING_DIM, snippet)
+    if cached is not None:
+        EMBEDDING_SECONDS.observe(time.perf_counter() - started, source="cache")
+        return cached
+
+    embedding, shared = _embedding_flights.do(
+        (EMBEDDING_MODEL, EMBEDDING_DIM, snippet), lambda: _request_embeddings([snippet])[0]
+    )
+    if not shared:
+        cache.put(EMBEDDING_MODEL, EMBEDDING_DIM, snippet, embedding)
+    return embedding
+
+
+def get_embeddings(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> List[np.ndarray]:
+    """Embed many texts, preserving order.
+
+    Cached texts are served from the embedding cache; the remaining unique texts are
+    sent `batch_size` per request with at most `max_concurrency` requests in flight.
+    """
+    snippets = [normalize_text(text) for text in texts]
+    if not all(snippets):
+        raise ValueError("Cannot embed empty text")
+
+    cache = get_embedding_cache()
+    found: Dict[str, np.ndarray] = {}
+    missing: List[str] = []
+    for snippet in dict.fromkeys(snippets):
+        cached = cache.get(EMBEDDING_MODEL, EMBEDDING_DIM, snippet)
+        if cached is None:
+            missing.append(snippet)
+        else:
+            found[snippet] = cached
+
+    if missing:
+        size = max(1, batch_size or EMBEDDING_BATCH_SIZE)
+        batches = [missing[i:i + size] for i in range(0, len(missing), size)]
+        workers = max(1, min(max_concurrency or EMBEDDING_CONCURRENCY, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+            for batch, embeddings in zip(batches, pool.map(_request_embeddings, batches)):
+                for snippet, embedding in zip(batch, embeddings):
+                    embedding = as_vector(embedding)
+                    cache.put(EMBEDDING_MODEL, EMBEDDING_DIM, snippet, embedding)
+                    found[snippet] = embedding
+
+    return [found[snippet] for snippet in snippets]
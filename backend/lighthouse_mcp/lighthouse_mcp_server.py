@@ -1,162 +1,329 @@
 # lighthouse_mcp/lighthouse_mcp_server.py
 import logging
 import os
-from functools import lru_cache
-from typing import Literal, List, Dict, Any, Optional
-
-import psycopg
-from pydantic import BaseModel, Field
-try:  # pydantic v2
-    from pydantic import ConfigDict
-except ImportError:  # pragma: no cover - pydantic v1 fallback
-    ConfigDict = None  # type: ignore
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Dict, Any
+
 from mcp.server.fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import Response
+
+if __package__ in (None, ""):  # executed as a script (stdio transport): make `backend.` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.lighthouse_mcp.db import close_pools, db_rows
+from backend.lighthouse_mcp.embeddings import get_embedding
+from backend.lighthouse_mcp.metrics import CONTENT_TYPE, gauge, instrumented_tool, on_collect, render
+from backend.lighthouse_mcp.models import RagSearch, ReportCompose, ReportComposeBulk, SafeQuery
+from backend.lighthouse_mcp.query_cache import get_query_cache
+from backend.lighthouse_mcp.reports import compose_report, iter_reports, student_scope_sql
+from backend.lighthouse_mcp.vector_snapshot import get_snapshot_index
 
-mcp = FastMCP("LightHouse")
+MCP_HOST = os.environ.get("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.environ.get("MCP_PORT", "8765"))
+MCP_WORKERS = int(os.environ.get("MCP_WORKERS", "1"))
 
-DB_RO_URL = os.environ.get("DATABASE_URL_RO") or os.environ.get("DATABASE_URL")
-assert DB_RO_URL, "Set DATABASE_URL_RO in your environment"
+# Stateless JSON responses over streamable HTTP: any worker process can answer any request,
+# so the HTTP transport scales across processes without session affinity.
+mcp = FastMCP("LightHouse", host=MCP_HOST, port=MCP_PORT, stateless_http=True, json_response=True)
 
-EMBEDDING_MODEL = os.environ.get("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
-EMBEDDING_DIM = int(os.environ.get("OPENAI_EMBEDDING_DIM", "1536"))
+# pgvector >= 0.8 keeps scanning the ANN index until enough rows pass the filters.
+RAG_ITERATIVE_SCAN = os.environ.get("RAG_ITERATIVE_SCAN", "relaxed_order")
+# Default recall/latency knobs; unset means the pgvector defaults (ef_search=40, probes=1).
+RAG_HNSW_EF_SEARCH = int(os.environ.get("RAG_HNSW_EF_SEARCH", "0")) or None
+RAG_IVFFLAT_PROBES = int(os.environ.get("RAG_IVFFLAT_PROBES", "0")) or None
+# lexical/hybrid need sql/10_rag_fulltext.sql. Hybrid fuses the top RAG_HYBRID_CANDIDATES of
+# each ranking with reciprocal rank fusion: score = sum(1 / (RAG_RRF_K + rank)).
+RAG_SEARCH_MODE = os.environ.get("RAG_SEARCH_MODE", "vector")
+RAG_HYBRID_CANDIDATES = int(os.environ.get("RAG_HYBRID_CANDIDATES", "40"))
+RAG_RRF_K = int(os.environ.get("RAG_RRF_K", "60"))
+RAG_TEXT_SEARCH_CONFIG = "english"  # must match the chunk_tsv generated column
+
+# rag_search filter key -> promoted column (see sql/08_rag_filter_columns.sql) and value type
+RAG_FILTERS = {
+    "type": ("e.doc_type", str),
+    "subject_id": ("d.subject_id", int),
+    "class_id": ("d.class_id", int),
+    "academic_year": ("d.academic_year", str),
+    "student_id": ("d.student_id", int),
+}
+RAG_DOC_TYPES = ("curriculum_topic", "student_result")
+
+# pg_safe_query name -> (SQL, tables whose change notifications invalidate its cached results)
+SAFE_QUERIES = {
+    "student_profile": (
+        "SELECT * FROM v_student_profile p WHERE p.student_id = %(student_id)s AND "
+        + student_scope_sql("p.student_id"),  # v_student_profile has no RLS
+        # the view's tables plus those student_scope_sql reads (sql/17 notifies on them)
+        ("student", "class", "student_parent", "teacher_assignment", "enrollment", "app_user"),
+    ),
+    "latest_results": (
+        "SELECT lr.student_id, lr.subject_id, s.name AS subject, lr.session, lr.term, lr.total, "
+        "lr.grade, lr.teacher_remark FROM latest_result lr JOIN subject s ON s.id = lr.subject_id "
+        "WHERE lr.student_id = %(student_id)s ORDER BY s.name",
+        ("result",),  # latest_result only changes through the triggers on result
+    ),
+    "search_results": (
+        "SELECT * FROM tool_search_results(%(student_id)s, %(subject)s, %(k)s)",
+        ("result",),
+    ),
+}
 
 logger = logging.getLogger(__name__)
 
-# --- Models
-class SafeQuery(BaseModel):
-    name: Literal["student_profile", "latest_results", "search_results"]
-    params: Dict[str, Any] = Field(default_factory=dict)
-
-class RagSearch(BaseModel):
-    query: str
-    k: int = 8
-    filters: Dict[str, Any] = Field(default_factory=dict)
-
-class ReportCompose(BaseModel):
-    student_id: int
-    session: str
-    term: str
-    auth: Optional[Dict[str, Any]] = Field(default=None, alias="_auth")
-
-    if ConfigDict is not None:  # pragma: no branch - handled at import
-        model_config = ConfigDict(populate_by_name=True, extra="allow")  # type: ignore
-    else:  # pragma: no cover - pydantic v1
-        class Config:
-            allow_population_by_field_name = True
-            extra = "allow"
-
-# --- Helpers
-def db_rows(sql: str, args: tuple=(), auth: dict | None = None):
-    with psycopg.connect(DB_RO_URL) as conn, conn.cursor() as cur:
-        # Apply per-call auth context for RLS policies
-        if auth:
-            try:
-                if 'user_id' in auth:
-                    cur.execute("SET LOCAL app.user_id = %s", (auth['user_id'],))
-                if 'role' in auth:
-                    cur.execute("SET LOCAL app.role = %s", (auth['role'],))
-                if 'school_id' in auth:
-                    cur.execute("SET LOCAL app.school_id = %s", (auth['school_id'],))
-            except Exception:
-                pass
-        cur.execute(sql, args)
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, r)) for r in cur.fetchall()]
-
-@lru_cache(maxsize=1)
-def _get_openai_client():
-    try:
-        from openai import OpenAI  # type: ignore
-    except ImportError as exc:  # pragma: no cover - dependency missing at runtime
-        raise RuntimeError(
-            "Install the 'openai' package (pip install openai>=1.0.0) to enable embeddings"
-        ) from exc
+# --- Tools
+@mcp.tool()
+@instrumented_tool
+def pg_safe_query(payload: SafeQuery) -> Any:
+    # Execute a whitelisted read-only query or function; results are cached per auth scope.
+    if payload.name not in SAFE_QUERIES:
+        return {"error": "unknown query name"}
+    p = dict(payload.params)
+    auth = p.pop('_auth', None)
+    query, tables = SAFE_QUERIES[payload.name]
+    if payload.name == "search_results":
+        p.setdefault("k", 5)
+    return get_query_cache().fetch(
+        payload.name, p, auth, tables, lambda: db_rows(query, p, auth)
+    )
 
-    if not os.environ.get("OPENAI_API_KEY"):
-        raise RuntimeError("OPENAI_API_KEY environment variable is required for embeddings")
+def _rag_filters(filters: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Validate RagSearch.filters and normalise each one to a non-empty list of typed values."""
+    normalized: Dict[str, List[Any]] = {}
+    for key, value in filters.items():
+        if key not in RAG_FILTERS:
+            raise ValueError(f"unsupported filter {key!r}; use one of {sorted(RAG_FILTERS)}")
+        _, cast = RAG_FILTERS[key]
+        values = value if isinstance(value, (list, tuple)) else [value]
+        try:
+            values = [cast(v) for v in values]
+        except (TypeError, ValueError):
+            raise ValueError(f"filter {key!r} expects {cast.__name__} values") from None
+        if not values:
+            continue
+        if key == "type":
+            unknown = set(values) - set(RAG_DOC_TYPES)
+            if unknown:
+                raise ValueError(f"unknown document type(s) {sorted(unknown)}")
+        normalized[key] = values
+    return normalized
 
-    return OpenAI()
+def _rag_filter_clause(filters: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
+    """Translate RagSearch.filters into a WHERE clause over the promoted columns.
 
+    `type` is inlined as a literal (after whitelisting) so the planner can pick the
+    per-type partial ANN index; every other value is a bound parameter. A list value
+    matches any of its elements.
+    """
+    clauses: List[str] = []
+    params: Dict[str, Any] = {}
+    for key, values in _rag_filters(filters).items():
+        column, _ = RAG_FILTERS[key]
+        if key == "type":
+            clauses.append(f"{column} IN ({', '.join(repr(v) for v in values)})")
+        elif len(values) == 1:
+            clauses.append(f"{column} = %(f_{key})s")
+            params[f"f_{key}"] = values[0]
+        else:
+            clauses.append(f"{column} = ANY(%(f_{key})s)")
+            params[f"f_{key}"] = values
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
 
-def get_embedding(text: str) -> List[float]:
-    """Return a pgvector-compatible embedding for the provided text."""
-    snippet = text.strip()
-    if not snippet:
-        raise ValueError("Cannot embed empty text")
+def _rag_index_settings(payload: RagSearch) -> Dict[str, Any]:
+    """Per-query ANN knobs, applied as SET LOCAL equivalents for this transaction only."""
+    settings: Dict[str, Any] = {}
+    ef_search = payload.ef_search or RAG_HNSW_EF_SEARCH
+    if ef_search:
+        # HNSW returns at most ef_search candidates, so never ask for fewer than k.
+        settings["hnsw.ef_search"] = min(max(ef_search, payload.k), 1000)
+    probes = payload.probes or RAG_IVFFLAT_PROBES
+    if probes:
+        settings["ivfflat.probes"] = probes
+    return settings
 
-    client = _get_openai_client()
-    try:
-        response = client.embeddings.create(model=EMBEDDING_MODEL, input=[snippet])
-    except Exception as exc:  # pragma: no cover - network/runtime errors
-        raise RuntimeError(f"OpenAI embeddings request failed: {exc}") from exc
-
-    embedding = response.data[0].embedding
-    if len(embedding) != EMBEDDING_DIM:
-        raise RuntimeError(
-            f"Embedding dimension mismatch: expected {EMBEDDING_DIM}, received {len(embedding)}"
-        )
-    return embedding
+_RAG_JOINS = (
+    "FROM rag_embedding e "
+    "JOIN rag_chunk c ON c.id = e.chunk_id "
+    "JOIN rag_document d ON d.id = c.document_id"
+)
 
+def _rag_vector_sql(where: str, limit: str) -> str:
+    # The embedding is sent once, in binary; ORDER BY the alias keeps the ANN index usable.
+    return (
+        "SELECT c.id, c.chunk, d.source, d.metadata, e.embedding <=> %(q)b AS score "
+        f"{_RAG_JOINS}{where} "
+        "ORDER BY score "
+        f"LIMIT {limit}"
+    )
 
-def _vector_to_sql(vector: List[float]) -> str:
-    return "[" + ",".join(f"{value:.8f}" for value in vector) + "]"
+def _rag_lexical_sql(where: str, limit: str) -> str:
+    # `c.chunk_tsv @@ tsq` is answered by the GIN index; ts_rank_cd rewards close term proximity.
+    match = f"{' AND' if where else ' WHERE'} c.chunk_tsv @@ tsq"
+    return (
+        "SELECT c.id, c.chunk, d.source, d.metadata, ts_rank_cd(c.chunk_tsv, tsq) AS score "
+        f"{_RAG_JOINS} "
+        f"CROSS JOIN websearch_to_tsquery('{RAG_TEXT_SEARCH_CONFIG}', %(text)s) tsq"
+        f"{where}{match} "
+        "ORDER BY score DESC "
+        f"LIMIT {limit}"
+    )
 
-# --- Tools
-@mcp.tool()
-def pg_safe_query(payload: SafeQuery) -> Any:
-    # Execute a whitelisted read-only query or function.
-    name = payload.name
-    p = payload.params
-    if name == "student_profile":
-        auth = p.pop('_auth', None)
-        return db_rows("SELECT * FROM v_student_profile WHERE student_id = %s", (p["student_id"],), auth)
-    if name == "latest_results":
-        auth = p.pop('_auth', None)
-        return db_rows("SELECT * FROM mv_latest_results WHERE student_id = %s ORDER BY subject_id", (p["student_id"],), auth)
-    if name == "search_results":
-        auth = p.pop('_auth', None)
-        return db_rows("SELECT * FROM tool_search_results(%s,%s,%s)", (p["student_id"], p["subject"], p.get("k",5)), auth)
-    return {"error": "unknown query name"}
+def _rag_hybrid_sql(where: str) -> str:
+    """Reciprocal rank fusion of the vector and lexical candidate lists in one statement.
+
+    Each side keeps its own index-friendly ORDER BY ... LIMIT; chunks found by only one
+    ranking still score. `score` is the fused relevance (higher is better).
+    """
+    return (
+        f"WITH vector_hits AS ({_rag_vector_sql(where, '%(n)s')}), "
+        f"lexical_hits AS ({_rag_lexical_sql(where, '%(n)s')}), "
+        "ranked AS ("
+        "SELECT id, chunk, source, metadata, row_number() OVER (ORDER BY score) AS rank FROM vector_hits "
+        "UNION ALL "
+        "SELECT id, chunk, source, metadata, row_number() OVER (ORDER BY score DESC) AS rank FROM lexical_hits"
+        ") "
+        "SELECT id, chunk, source, metadata, sum(1.0 / (%(rrf_k)s + rank))::float8 AS score "
+        "FROM ranked GROUP BY id, chunk, source, metadata "
+        "ORDER BY score DESC, id "
+        "LIMIT %(k)s"
+    )
 
 @mcp.tool()
+@instrumented_tool
 def rag_search(payload: RagSearch) -> Any:
-    # Vector search over curriculum/help chunks.
+    # Curriculum/help search, optionally filtered on metadata. `score` is a cosine distance
+    # (lower is better) in vector mode and a relevance (higher is better) otherwise.
+    mode = payload.mode or RAG_SEARCH_MODE
+    try:
+        if mode not in ("vector", "lexical", "hybrid"):
+            raise ValueError(f"unknown search mode {mode!r}")
+        filters = _rag_filters(payload.filters)
+        where, params = _rag_filter_clause(filters)
+    except ValueError as exc:
+        return {"error": str(exc)}
+
+    if mode == "lexical":
+        # No embedding needed: skips the API call entirely.
+        return db_rows(_rag_lexical_sql(where, "%(k)s"), {"text": payload.query, "k": payload.k, **params})
+
     emb = get_embedding(payload.query)
-    vec_literal = _vector_to_sql(emb)
-    sql = (
-      "SELECT c.id, c.chunk, d.source, d.metadata, (e.embedding <=> %s::vector)::REAL AS score "
-      "FROM rag_embedding e "
-      "JOIN rag_chunk c ON c.id = e.chunk_id "
-      "JOIN rag_document d ON d.id = c.document_id "
-      "ORDER BY e.embedding <=> %s::vector "
-      "LIMIT %s"
-    )
-    return db_rows(sql, (vec_literal, vec_literal, payload.k), auth=None)
+    if mode == "vector":
+        # Exact in-process search when a published snapshot holds every candidate document.
+        index = get_snapshot_index()
+        snapshot = index.current() if index is not None else None
+        if snapshot is not None and snapshot.covers(filters):
+            return snapshot.search(emb, payload.k, filters)
+
+    settings = _rag_index_settings(payload)
+    if mode == "hybrid":
+        sql = _rag_hybrid_sql(where)
+        params.update(text=payload.query, n=max(payload.k, RAG_HYBRID_CANDIDATES), rrf_k=RAG_RRF_K)
+    else:
+        sql = _rag_vector_sql(where, "%(k)s")
+        if where and RAG_ITERATIVE_SCAN != "off":
+            # Relaxed ordering may return hits slightly out of order; re-sort the final k.
+            sql = f"SELECT * FROM ({sql}) hits ORDER BY score"
+    if where and RAG_ITERATIVE_SCAN != "off":
+        settings["hnsw.iterative_scan"] = RAG_ITERATIVE_SCAN
+        settings["ivfflat.iterative_scan"] = "relaxed_order"  # ivfflat has no strict mode
+    return db_rows(sql, {"q": emb, "k": payload.k, **params}, auth=None, settings=settings)
 
 @mcp.tool()
+@instrumented_tool
 def report_compose(payload: ReportCompose) -> Any:
-    # Build a term report JSON blob for one student.
-    auth = payload.auth
-    profile = db_rows(
-        "SELECT * FROM v_student_profile WHERE student_id=%s",
-        (payload.student_id,),
-        auth=auth,
+    # Build a term report JSON blob (profile, results, behaviour/skills) for one student.
+    return compose_report(payload.student_id, payload.session, payload.term, auth=payload.auth)
+
+@mcp.tool()
+@instrumented_tool
+def report_compose_bulk(payload: ReportComposeBulk) -> Any:
+    # Term reports for every student in a class or school, built with set-based queries.
+    try:
+        reports = iter_reports(
+            payload.session,
+            payload.term,
+            class_id=payload.class_id,
+            school_id=payload.school_id,
+            auth=payload.auth,
+        )
+    except (ValueError, PermissionError) as exc:
+        return {"error": str(exc)}
+    return list(reports)
+
+QUERY_CACHE_STATS = gauge(
+    "lighthouse_query_cache", "pg_safe_query result cache counters (see QueryCache.stats).", ("stat",)
+)
+
+
+def _collect_query_cache() -> None:
+    if get_query_cache.cache_info().currsize:  # never start the cache (and its listener) for a scrape
+        for stat, value in get_query_cache().stats().items():
+            QUERY_CACHE_STATS.set(float(value), stat=stat)
+
+on_collect(_collect_query_cache)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    # Prometheus scrape endpoint (sse/http transports); per worker process.
+    return Response(render(), headers={"Content-Type": CONTENT_TYPE})
+
+def http_app():
+    """ASGI app for the streamable HTTP transport (uvicorn factory, one per worker process)."""
+    app = mcp.streamable_http_app()
+    sessions = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with sessions(app):
+            try:
+                yield
+            finally:
+                close_pools()  # each worker process owns its pool
+
+    app.router.lifespan_context = lifespan
+    return app
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the LightHouse MCP server.")
+    parser.add_argument(
+        "--transport",
+        choices=("stdio", "sse", "http"),
+        default=os.environ.get("MCP_TRANSPORT", "stdio"),
+        help="stdio for a child process (local dev); http/sse for a standalone service.",
     )
-    results = db_rows(
-        "SELECT r.subject_id, s.name AS subject, r.total, r.grade, r.teacher_remark "
-        "FROM result r JOIN subject s ON s.id=r.subject_id "
-        "WHERE r.student_id=%s AND r.session=%s AND r.term=%s "
-        "ORDER BY s.name",
-        (payload.student_id, payload.session, payload.term),
-        auth=auth,
+    parser.add_argument("--host", default=MCP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MCP_WORKERS,
+        help="Worker processes for --transport http (sse sessions live in one process).",
     )
-    return {
-        "student": profile[0] if profile else {},
-        "session": payload.session,
-        "term": payload.term,
-        "results": results,
-    }
+    args = parser.parse_args()
+
+    if args.transport in ("stdio", "sse"):
+        if args.transport == "sse":
+            if args.workers > 1:
+                parser.error("--transport sse keeps sessions in-process; use --transport http for --workers > 1")
+            mcp.settings.host, mcp.settings.port = args.host, args.port
+        try:
+            mcp.run(args.transport)
+        finally:  # stdio ends when the parent closes the pipe; sse on shutdown
+            close_pools()
+    else:
+        import uvicorn
+
+        uvicorn.run(
+            "backend.lighthouse_mcp.lighthouse_mcp_server:http_app",
+            factory=True,
+            host=args.host,
+            port=args.port,
+            workers=max(1, args.workers),
+        )
 
 if __name__ == "__main__":
-    # Run over stdio in local dev
-    mcp.run()
+    main()
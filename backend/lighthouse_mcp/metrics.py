@@ -0,0 +1,316 @@
+# lighthouse_mcp/metrics.py
+"""Latency histograms, request traces and Prometheus text exposition.
+
+Shared by the API (``GET /metrics`` in app.py) and the MCP server (``GET /metrics`` on
+the sse/http transports). Metrics are process-local; with ``--workers N`` each worker
+reports its own numbers, so scrape every worker or aggregate by instance.
+
+``span(name)`` times one stage: it records into a histogram and, when it runs inside a
+``trace(...)`` (one per request or tool call), appends the stage to that trace. A
+trace slower than ``SLOW_REQUEST_MS`` is logged with all of its stage timings. Traces
+follow ``contextvars``, so stages run through ``asyncio.to_thread`` or the agent worker
+pool are attributed to the request that started them.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("lighthouse.slow")
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))  # 0 disables the slow log
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(f"{self.name} has no label(s) {sorted(unknown)}")
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(counts), total[0]) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+_registry: Dict[str, _Metric] = {}
+_collectors: List[Callable[[], None]] = []
+_registry_lock = threading.Lock()
+
+
+def _register(cls, name: str, *args: Any, **kwargs: Any) -> Any:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"metric {name} already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(
+    name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def on_collect(collector: Callable[[], None]) -> None:
+    """Run `collector` before every scrape, e.g. to copy pool or cache stats into gauges."""
+    with _registry_lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _registry_lock:
+        collectors = list(_collectors)
+    for collector in collectors:
+        try:
+            collector()
+        except Exception:  # a broken collector must not break the scrape
+            logger.exception("metrics collector %r failed", collector)
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = histogram(
+    "lighthouse_stage_seconds", "Time spent in each stage of a request.", ("stage", "persona")
+)
+TOOL_SECONDS = histogram("lighthouse_tool_seconds", "MCP tool call latency.", ("tool", "status"))
+DB_SECONDS = histogram(
+    "lighthouse_db_seconds",
+    "Postgres time per db_rows call: borrowing a pooled connection vs running the query.",
+    ("phase",),
+)
+EMBEDDING_SECONDS = histogram(
+    "lighthouse_embedding_seconds", "Embedding lookups, served from the cache or the API.", ("source",)
+)
+
+
+# --- traces and spans
+class Trace:
+    """Stage timings of one request or tool call. Use :func:`trace` or :func:`start_trace`."""
+
+    def __init__(self, name: str, labels: Dict[str, Any], outer: Optional["Trace"] = None) -> None:
+        self.name = name
+        self.labels = labels
+        self.outer = outer
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []  # (stage, ms) in completion order
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def finish(self, metric: Optional[Histogram] = None) -> None:
+        """Observe the total into `metric` with the trace's current labels; log it if slow.
+
+        A trace started inside another one is folded into it as a stage; only outermost
+        traces are checked against ``SLOW_REQUEST_MS``.
+        """
+        elapsed_ms = self.elapsed_ms()
+        if metric is not None:
+            metric.observe(
+                elapsed_ms / 1000, **{k: v for k, v in self.labels.items() if k in metric.labelnames}
+            )
+        if self.outer is not None:  # e.g. an in-process tool call inside a request
+            self.outer.spans.extend(self.spans)
+            self.outer.spans.append((self.name, round(elapsed_ms, 2)))
+        elif SLOW_REQUEST_MS and elapsed_ms >= SLOW_REQUEST_MS:
+            logger.warning(
+                "slow %s %.0fms %s",
+                self.name,
+                elapsed_ms,
+                json.dumps({"labels": self.labels, "spans": self.spans}, default=str),
+            )
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("lighthouse_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def label(**labels: Any) -> None:
+    """Set labels (e.g. the route a request took) on the current trace, if any."""
+    active = _current_trace.get()
+    if active is not None:
+        active.labels.update(labels)
+
+
+@contextmanager
+def span(name: str, metric: Optional[Histogram] = None, **labels: Any) -> Iterator[None]:
+    """Time a stage into `metric` (default: STAGE_SECONDS with stage=`name`)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if metric is None:
+            STAGE_SECONDS.observe(elapsed, stage=name, **labels)
+        else:
+            metric.observe(elapsed, **labels)
+        active = _current_trace.get()
+        if active is not None:
+            active.spans.append((name, round(elapsed * 1000, 2)))
+
+
+@contextmanager
+def trace(name: str, metric: Optional[Histogram] = None, **labels: Any) -> Iterator[Trace]:
+    """Collect the spans run inside the block; finish the trace into `metric` on exit."""
+    active = Trace(name, dict(labels), _current_trace.get())
+    token = _current_trace.set(active)
+    try:
+        yield active
+    finally:
+        _current_trace.reset(token)
+        active.finish(metric)
+
+
+def start_trace(name: str, **labels: Any) -> Trace:
+    """Make a new trace current for the rest of this context; call ``finish()`` yourself.
+
+    For work that outlives the block that starts it, e.g. a streamed response finished
+    by a worker thread.
+    """
+    active = Trace(name, dict(labels), _current_trace.get())
+    _current_trace.set(active)
+    return active
+
+
+def instrumented_tool(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Trace an MCP tool function into TOOL_SECONDS{tool, status}."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with trace(f"tool {fn.__name__}", TOOL_SECONDS, tool=fn.__name__, status="ok"):
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                label(status="error")
+                raise
+            if isinstance(result, dict) and "error" in result:
+                label(status="error")
+            return result
+
+    return wrapper
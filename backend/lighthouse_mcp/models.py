@@ -0,0 +1,58 @@
+# lighthouse_mcp/models.py
+"""Payload models for the LightHouse MCP tools.
+
+Kept free of database/embedding imports so clients (e.g. the remote adapter in
+``backend/mcp_adapter.py``) can build tool schemas without loading the server.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, Field
+try:  # pydantic v2
+    from pydantic import ConfigDict
+except ImportError:  # pragma: no cover - pydantic v1 fallback
+    ConfigDict = None  # type: ignore
+
+
+class SafeQuery(BaseModel):
+    name: Literal["student_profile", "latest_results", "search_results"]
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class RagSearch(BaseModel):
+    query: str
+    k: int = 8
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    # Higher = better recall, slower. ef_search applies to HNSW, probes to ivfflat.
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    probes: Optional[int] = Field(default=None, ge=1, le=10000)
+    # vector = cosine similarity, lexical = full-text match on exact terms, hybrid = both fused.
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+
+class ReportCompose(BaseModel):
+    student_id: int
+    session: str
+    term: str
+    auth: Optional[Dict[str, Any]] = Field(default=None, alias="_auth")
+
+    if ConfigDict is not None:  # pragma: no branch - handled at import
+        model_config = ConfigDict(populate_by_name=True, extra="allow")  # type: ignore
+    else:  # pragma: no cover - pydantic v1
+        class Config:
+            allow_population_by_field_name = True
+            extra = "allow"
+
+class ReportComposeBulk(BaseModel):
+    # Exactly one of class_id / school_id.
+    session: str
+    term: str
+    class_id: Optional[int] = None
+    school_id: Optional[int] = None
+    auth: Optional[Dict[str, Any]] = Field(default=None, alias="_auth")
+
+    if ConfigDict is not None:  # pragma: no branch - handled at import
+        model_config = ConfigDict(populate_by_name=True, extra="allow")  # type: ignore
+    else:  # pragma: no cover - pydantic v1
+        class Config:
+            allow_population_by_field_name = True
+            extra = "allow"
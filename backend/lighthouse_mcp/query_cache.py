@@ -0,0 +1,206 @@
+# lighthouse_mcp/query_cache.py
+"""Result cache for the whitelisted ``pg_safe_query`` queries.
+
+Entries are keyed by (query name, params, auth scope); the auth scope is the exact set
+of RLS GUCs the query ran with, so a cached row is only ever served to a caller the
+policies would have shown it to. Each entry remembers the tables it was read from and
+the student it concerns. Concurrent identical calls (same key, no invalidation in
+between) run the query once, also when the cache is disabled.
+
+Entries expire after ``QUERY_CACHE_TTL`` seconds and are dropped early when Postgres
+announces a change on ``QUERY_CACHE_CHANNEL`` (see sql/11_query_cache_notify.sql). A
+background thread holds the LISTEN connection; after a reconnect the whole cache is
+cleared because notifications may have been missed.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+import psycopg
+from psycopg import sql
+
+from backend.lighthouse_mcp.db import DB_RO_URL, Auth, auth_settings
+from backend.lighthouse_mcp.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "30"))
+CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+CACHE_CHANNEL = os.environ.get("QUERY_CACHE_CHANNEL", "lighthouse_data_changed")
+CACHE_LISTEN = os.environ.get("QUERY_CACHE_LISTEN", "1").lower() not in ("0", "false", "no")
+
+Key = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+class _Entry(NamedTuple):
+    expires: float
+    tables: frozenset
+    student_id: Optional[str]
+    value: Any
+
+
+def _copy(value: Any) -> Any:
+    # Callers get their own row dicts so mutating a result never corrupts the cache.
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    return value
+
+
+class QueryCache:
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_SIZE) -> None:
+        self.ttl = ttl
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that overlapped one is not stored.
+        self._generation = 0
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._flights = SingleFlight("pg_safe_query")
+
+    @staticmethod
+    def key(name: str, params: Dict[str, Any], auth: Auth) -> Key:
+        return name, json.dumps(params, sort_keys=True, default=str), tuple(auth_settings(auth))
+
+    def fetch(
+        self,
+        name: str,
+        params: Dict[str, Any],
+        auth: Auth,
+        tables: Iterable[str],
+        loader: Callable[[], Any],
+    ) -> Any:
+        """Return the cached result for this call, or run `loader` and cache what it returns."""
+        key = self.key(name, params, auth)
+        if not self.max_entries or self.ttl <= 0:
+            with self._lock:
+                generation = self._generation
+            value, shared = self._flights.do((key, generation), loader)
+            return _copy(value) if shared else value
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return _copy(entry.value)
+            self.counters["misses"] += 1
+            generation = self._generation
+
+        # Callers that join an in-flight load get its rows; only a load started after the
+        # last invalidation is joined.
+        value, _ = self._flights.do((key, generation), loader)
+        student_id = params.get("student_id")
+        entry = _Entry(
+            now + self.ttl, frozenset(tables), None if student_id is None else str(student_id), value
+        )
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters["evictions"] += 1
+        return _copy(value)
+
+    def invalidate(self, table: str, student_id: Optional[str] = None) -> int:
+        """Drop entries read from `table` (only those for `student_id` when given)."""
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if table in entry.tables
+                and (student_id is None or entry.student_id in (None, student_id))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.counters["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def handle_notification(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            table = message["table"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s payload %r; clearing query cache", CACHE_CHANNEL, payload)
+            self.clear()
+            return
+        student_id = message.get("student_id")
+        self.invalidate(table, None if student_id is None else str(student_id))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        stats["coalesced"] = self._flights.stats()["coalesced"]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["listening"] = bool(self._listener and self._listener.is_alive())
+        return stats
+
+    # --- change notifications
+    def start_listener(self, url: str, channel: str = CACHE_CHANNEL) -> None:
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(
+            target=self._listen, args=(url, channel), name="query-cache-listen", daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self, url: str, channel: str) -> None:
+        listen(url, channel, self.handle_notification, self.clear, self._stop)
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+def listen(
+    url: str,
+    channel: str,
+    on_payload: Callable[[str], None],
+    on_reset: Callable[[], None],
+    stop: threading.Event,
+) -> None:
+    """LISTEN on `channel` until `stop` is set, reconnecting with backoff.
+
+    `on_reset` runs whenever notifications may have been missed (on every (re)connect and
+    disconnect), so callers can drop everything they cached.
+    """
+    delay = 1.0
+    while not stop.is_set():
+        try:
+            with psycopg.connect(url, autocommit=True) as conn:
+                conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                on_reset()  # anything cached while we were not listening may be stale
+                delay = 1.0
+                while not stop.is_set():
+                    for notify in conn.notifies(timeout=5.0):
+                        on_payload(notify.payload)
+        except psycopg.Error as exc:
+            logger.warning("Listener on %s disconnected (%s); retrying in %.0fs", channel, exc, delay)
+            on_reset()
+            stop.wait(delay)
+            delay = min(delay * 2, 60.0)
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryCache:
+    cache = QueryCache()
+    if CACHE_LISTEN and DB_RO_URL and cache.max_entries and cache.ttl > 0:
+        cache.start_listener(DB_RO_URL)
+    return cache
@@ -0,0 +1,242 @@
+# lighthouse_mcp/reports.py
+"""Term report composition.
+
+A report is built in one statement: profile, term results (with the grade-band remark
+of the result's grading scheme) and behaviour/skills are aggregated per student with
+``jsonb_agg``, so composing a report is a single round trip on one pooled connection.
+
+Bulk (class or school) reports use the same statement over a batch of students: one
+query lists the students, then each batch of ``REPORT_BATCH_SIZE`` reports costs one
+more query, however many students it holds.
+
+Rosters read tables without row-level security (``student``, ``enrollment``), so bulk
+reports are checked in code: only teachers and admins may run them, a school roster must
+be the caller's own school, and a class must belong to that school or be taught by the
+calling teacher. Behaviour rows are filtered in the statement with the same rules as the
+``result`` policies, so reports stay scoped on databases without
+``sql/15_behaviour_skill_rls.sql``.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from backend.lighthouse_mcp.db import Auth, db_rows
+
+REPORT_BATCH_SIZE = int(os.environ.get("REPORT_BATCH_SIZE", "100"))
+BULK_REPORT_ROLES = ("teacher", "admin")
+
+
+def student_scope_sql(student_id: str) -> str:
+    """SQL condition: the caller (the ``app.*`` auth GUCs) may see student `student_id`.
+
+    ``student`` and ``v_student_profile`` have no row-level security, so queries on them
+    add this condition; it applies the parent/teacher/admin rules of the ``result``
+    policies (sql/04_rls_policies.sql) to the student rather than to one result row.
+    Without auth GUCs it is false.
+    """
+    user_id = "NULLIF(current_setting('app.user_id', true), '')::bigint"
+    return f"""(
+  EXISTS (
+    SELECT 1 FROM student_parent sp
+    WHERE sp.student_id = {student_id} AND sp.parent_user_id = {user_id}
+  )
+  OR EXISTS (
+    SELECT 1 FROM teacher_assignment ta
+    WHERE ta.teacher_user_id = {user_id}
+      AND (ta.class_id IN (SELECT e.class_id FROM enrollment e WHERE e.student_id = {student_id})
+           OR ta.class_id = (SELECT s.current_class_id FROM student s WHERE s.id = {student_id}))
+  )
+  OR EXISTS (
+    SELECT 1 FROM app_user u
+    JOIN student s ON s.id = {student_id}
+    WHERE u.id = {user_id} AND u.role = 'admin' AND u.school_id = s.school_id
+  )
+)"""
+
+
+# `{students}` is a query yielding the `student_id`s to report on; the profile is only
+# joined for students in the caller's scope (results and behaviour are scoped already).
+_REPORT_SQL = """
+WITH students AS ({students}),
+term_results AS (
+  SELECT r.student_id,
+         jsonb_agg(jsonb_build_object(
+           'subject_id', r.subject_id,
+           'subject', s.name,
+           'total', r.total,
+           'grade', r.grade,
+           'teacher_remark', r.teacher_remark,
+           'grade_remark', gb.remark
+         ) ORDER BY s.name) AS results
+  FROM result r
+  JOIN students st ON st.student_id = r.student_id
+  JOIN subject s ON s.id = r.subject_id
+  LEFT JOIN LATERAL (
+    SELECT g.remark FROM grade_band g
+    WHERE g.grading_scheme_id = r.grading_scheme_id
+      AND r.total BETWEEN g.min_score AND g.max_score
+    ORDER BY g.min_score DESC
+    LIMIT 1
+  ) gb ON true
+  WHERE r.session = %(session)s AND r.term = %(term)s
+  GROUP BY r.student_id
+),
+behaviour AS (
+  SELECT DISTINCT ON (b.student_id) b.student_id, b.behaviours, b.skills
+  FROM behaviour_skill b
+  JOIN students st ON st.student_id = b.student_id
+  WHERE b.session = %(session)s AND b.term = %(term)s
+    -- Same visibility as the result policies, in case behaviour_skill has no RLS yet
+    -- (sql/15_behaviour_skill_rls.sql); no auth GUCs means no behaviour rows.
+    AND (
+      EXISTS (
+        SELECT 1 FROM student_parent sp
+        WHERE sp.student_id = b.student_id
+          AND sp.parent_user_id = NULLIF(current_setting('app.user_id', true), '')::bigint
+      )
+      OR EXISTS (
+        SELECT 1 FROM teacher_assignment ta
+        WHERE ta.class_id = b.class_id
+          AND ta.teacher_user_id = NULLIF(current_setting('app.user_id', true), '')::bigint
+      )
+      OR EXISTS (
+        SELECT 1 FROM app_user u
+        JOIN student s ON s.id = b.student_id
+        WHERE u.id = NULLIF(current_setting('app.user_id', true), '')::bigint
+          AND u.role = 'admin'
+          AND u.school_id = s.school_id
+      )
+    )
+  ORDER BY b.student_id, b.id DESC
+)
+SELECT st.student_id,
+       COALESCE(to_jsonb(p), '{{}}'::jsonb) AS student,
+       COALESCE(tr.results, '[]'::jsonb) AS results,
+       CASE WHEN bh.student_id IS NOT NULL
+            THEN jsonb_build_object('behaviours', bh.behaviours, 'skills', bh.skills)
+       END AS behaviour
+FROM students st
+LEFT JOIN v_student_profile p ON p.student_id = st.student_id AND {profile_scope}
+LEFT JOIN term_results tr ON tr.student_id = st.student_id
+LEFT JOIN behaviour bh ON bh.student_id = st.student_id
+ORDER BY p.last_name, p.first_name, st.student_id
+"""
+
+STUDENT_REPORT_SQL = _REPORT_SQL.format(
+    students="SELECT %(student_id)s::BIGINT AS student_id", profile_scope=student_scope_sql("p.student_id")
+)
+BATCH_REPORT_SQL = _REPORT_SQL.format(
+    students="SELECT unnest(%(student_ids)s::BIGINT[]) AS student_id",
+    profile_scope=student_scope_sql("p.student_id"),
+)
+
+# Students enrolled in, or holding results for, the class/school in a given term.
+_ROSTER_SQL = """
+SELECT st.id AS student_id
+FROM student st
+JOIN (
+  SELECT e.student_id FROM enrollment e
+  WHERE e.session = %(session)s AND e.term = %(term)s{enrollment_class}
+  UNION
+  SELECT r.student_id FROM result r
+  WHERE r.session = %(session)s AND r.term = %(term)s{result_class}
+) term_students ON term_students.student_id = st.id{school}
+ORDER BY st.last_name, st.first_name, st.id
+"""
+CLASS_ROSTER_SQL = _ROSTER_SQL.format(
+    enrollment_class=" AND e.class_id = %(class_id)s",
+    result_class=" AND r.class_id = %(class_id)s",
+    school="",
+)
+SCHOOL_ROSTER_SQL = _ROSTER_SQL.format(
+    enrollment_class="", result_class="", school="\nWHERE st.school_id = %(school_id)s"
+)
+
+CLASS_SCOPE_SQL = """
+SELECT 1 FROM class c
+WHERE c.id = %(class_id)s
+  AND (c.school_id = %(school_id)s
+       OR EXISTS (
+         SELECT 1 FROM teacher_assignment ta
+         WHERE ta.class_id = c.id AND ta.teacher_user_id = %(user_id)s
+       ))
+"""
+
+
+def check_bulk_scope(auth: Auth, class_id: Optional[int] = None, school_id: Optional[int] = None) -> None:
+    """Raise PermissionError unless `auth` may list the class or school roster."""
+    auth = auth or {}
+    if auth.get("role") not in BULK_REPORT_ROLES:
+        raise PermissionError("bulk reports are available to teachers and admins only")
+    if auth.get("school_id") is None:
+        raise PermissionError("bulk reports need a school in the caller's token")
+    if school_id is not None and int(school_id) != int(auth["school_id"]):
+        raise PermissionError("bulk reports are limited to the caller's school")
+    if class_id is not None:
+        params = {"class_id": int(class_id), "school_id": int(auth["school_id"]),
+                  "user_id": auth.get("user_id")}
+        if not db_rows(CLASS_SCOPE_SQL, params):
+            raise PermissionError("class is not in the caller's school")
+
+
+def _report(row: Dict[str, Any], session: str, term: str) -> Dict[str, Any]:
+    return {
+        "student": row["student"],
+        "session": session,
+        "term": term,
+        "results": row["results"],
+        "behaviour": row["behaviour"],
+    }
+
+
+def compose_report(student_id: int, session: str, term: str, auth: Auth = None) -> Dict[str, Any]:
+    """Term report for one student in a single round trip."""
+    rows = db_rows(
+        STUDENT_REPORT_SQL,
+        {"student_id": student_id, "session": session, "term": term},
+        auth=auth,
+    )
+    return _report(rows[0], session, term)
+
+
+def iter_reports(
+    session: str,
+    term: str,
+    class_id: Optional[int] = None,
+    school_id: Optional[int] = None,
+    auth: Auth = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Term reports for every student of a class (or a whole school), lazily and in order.
+
+    Raises ValueError up front (not on first iteration) unless exactly one of
+    `class_id`/`school_id` is given, and PermissionError if `auth` may not read that
+    roster (see ``check_bulk_scope``).
+    """
+    if (class_id is None) == (school_id is None):
+        raise ValueError("pass exactly one of class_id or school_id")
+    check_bulk_scope(auth, class_id=class_id, school_id=school_id)
+    if class_id is not None:
+        roster_sql, scope = CLASS_ROSTER_SQL, {"class_id": int(class_id)}
+    else:
+        roster_sql, scope = SCHOOL_ROSTER_SQL, {"school_id": int(school_id)}
+    params = {"session": session, "term": term, **scope}
+    return _iter_reports(roster_sql, params, auth, max(1, batch_size or REPORT_BATCH_SIZE))
+
+
+def _iter_reports(
+    roster_sql: str, params: Dict[str, Any], auth: Auth, batch_size: int
+) -> Iterator[Dict[str, Any]]:
+    student_ids: List[int] = [row["student_id"] for row in db_rows(roster_sql, params, auth=auth)]
+    for start in range(0, len(student_ids), batch_size):
+        batch = student_ids[start:start + batch_size]
+        rows = db_rows(
+            BATCH_REPORT_SQL,
+            {"student_ids": batch, "session": params["session"], "term": params["term"]},
+            auth=auth,
+        )
+        by_id = {row["student_id"]: row for row in rows}
+        for student_id in batch:  # keep roster order across batches
+            if student_id in by_id:
+                yield _report(by_id[student_id], params["session"], params["term"])
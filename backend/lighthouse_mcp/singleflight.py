@@ -0,0 +1,128 @@
+# lighthouse_mcp/singleflight.py
+"""Coalesce concurrent identical calls so the work runs once and every caller gets its result.
+
+A call that arrives while an identical one (same key) is still running waits for it
+instead of starting its own; nothing is kept after the call finishes, so this never
+serves a result that was computed before the request arrived. Keys must contain
+everything the result depends on, including the caller's auth scope (see
+``lighthouse_mcp.db.auth_settings``), so a result is only shared between callers
+that would have been given the same answer. An exception is raised to every waiter.
+
+``SingleFlight`` is for threads (MCP tools, embedding calls) and ``AsyncSingleFlight``
+for coroutines on one event loop (crew runs in app.py). ``SINGLE_FLIGHT=0`` turns
+coalescing off.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from backend.lighthouse_mcp.metrics import counter
+
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "1").lower() not in ("0", "false", "no")
+
+COALESCED = counter(
+    "lighthouse_coalesced_total", "Calls served by an identical call already in flight.", ("flight",)
+)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT) -> None:
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result of `fn`, shared). `shared` is True when another caller ran it."""
+        if not self.enabled:
+            return fn(), False
+        with self._lock:
+            self.counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            COALESCED.inc(flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """Coroutine variant; the shared work runs as its own task.
+
+    Cancelling one waiter (e.g. a client disconnecting) never cancels the work the other
+    waiters depend on.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT) -> None:
+        self.name = name
+        self.enabled = enabled
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.counters: Dict[str, int] = {"calls": 0, "coalesced": 0}
+
+    def running(self, key: Hashable) -> Optional[asyncio.Future]:
+        """The in-flight call for `key`, counted as coalesced, or None."""
+        task = self._tasks.get(key) if self.enabled else None
+        if task is not None:
+            self.counters["calls"] += 1
+            self.counters["coalesced"] += 1
+            COALESCED.inc(flight=self.name)
+        return task
+
+    def start(self, key: Hashable, work: Awaitable[Any]) -> asyncio.Future:
+        """Run `work` as the call for `key` that later identical calls will join."""
+        task = asyncio.ensure_future(work)
+        if self.enabled:
+            self.counters["calls"] += 1
+            self._tasks[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # raised to the waiters; don't log it as never retrieved
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result of `work()`, shared), joining an identical call in flight."""
+        task = self.running(key)
+        shared = task is not None
+        if task is None:
+            task = self.start(key, work())
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "in_flight": len(self._tasks)}
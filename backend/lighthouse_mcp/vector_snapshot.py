@@ -0,0 +1,229 @@
+# lighthouse_mcp/vector_snapshot.py
+"""In-process exact vector search over a published snapshot of rag_embedding.
+
+The ingest script exports a slice of the RAG store (by default the curriculum topics)
+into a versioned directory of ``.npy`` files: L2-normalised vectors (float32 or
+float16), chunk ids, filter columns, and the chunk/source/metadata records.
+``rag_search`` memory-maps the current snapshot and answers queries it fully covers
+with a vectorised dot product and ``argpartition`` top-k, i.e. exact recall without a
+database round trip.
+
+Publishing is atomic: files go to a temp directory that is renamed into place, then
+the ``CURRENT`` pointer file is replaced. Readers notice the new pointer (checked at
+most every ``RAG_SNAPSHOT_CHECK_SECONDS``) and swap snapshots without locking queries.
+Publishing no rows removes ``CURRENT`` instead, and readers then drop their snapshot so
+``rag_search`` goes back to Postgres rather than serving deleted documents.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get("RAG_SNAPSHOT_DIR")
+SNAPSHOT_CHECK_SECONDS = float(os.environ.get("RAG_SNAPSHOT_CHECK_SECONDS", "2"))
+
+POINTER = "CURRENT"
+# filter key (as accepted by rag_search) -> snapshot column
+FILTER_COLUMNS = {
+    "type": "doc_type",
+    "subject_id": "subject_id",
+    "class_id": "class_id",
+    "academic_year": "academic_year",
+    "student_id": "student_id",
+}
+_INT_COLUMNS = ("chunk_id", "subject_id", "class_id", "student_id")
+_STR_COLUMNS = ("doc_type", "academic_year")
+_NULL_INT = -1
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorSnapshot:
+    """One immutable, memory-mapped snapshot."""
+
+    def __init__(self, path: Path) -> None:
+        meta = json.loads((path / "meta.json").read_text())
+        self.path = path
+        self.version: str = meta["version"]
+        self.doc_types = frozenset(meta["doc_types"])
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.columns = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _INT_COLUMNS + _STR_COLUMNS
+        }
+        self.records: List[Dict[str, Any]] = json.loads((path / "records.json").read_text())
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def covers(self, filters: Dict[str, List[Any]]) -> bool:
+        """True if every document the query could match is in this snapshot."""
+        if any(key not in FILTER_COLUMNS for key in filters):
+            return False
+        requested = filters.get("type")
+        return bool(requested) and set(requested) <= self.doc_types
+
+    def search(self, query: np.ndarray, k: int, filters: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+        """Exact cosine top-k; `score` is a cosine distance like pgvector's ``<=>``."""
+        q = np.asarray(query, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        similarity = self.vectors @ q.astype(self.vectors.dtype, copy=False)
+        similarity = similarity.astype(np.float32, copy=False)
+
+        mask: Optional[np.ndarray] = None
+        for key, values in filters.items():
+            column_mask = np.isin(self.columns[FILTER_COLUMNS[key]], values)
+            mask = column_mask if mask is None else mask & column_mask
+        if mask is not None:
+            similarity = np.where(mask, similarity, -np.inf)
+            available = int(mask.sum())
+        else:
+            available = similarity.shape[0]
+
+        k = min(k, available)
+        if k <= 0:
+            return []
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind="stable")]
+        return [{**self.records[i], "score": float(1.0 - similarity[i])} for i in top]
+
+
+class SnapshotIndex:
+    """Tracks the ``CURRENT`` snapshot in a directory and hot-reloads it."""
+
+    def __init__(self, directory: str | Path, check_seconds: float = SNAPSHOT_CHECK_SECONDS) -> None:
+        self.directory = Path(directory)
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[VectorSnapshot] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[VectorSnapshot]:
+        now = time.monotonic()
+        if now >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._next_check = now + self.check_seconds
+                self._maybe_reload()
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def _maybe_reload(self) -> None:
+        try:
+            version = (self.directory / POINTER).read_text().strip()
+        except FileNotFoundError:
+            if self._snapshot is not None:  # unpublished (e.g. nothing left to export)
+                logger.info("RAG snapshot %s withdrawn", self._snapshot.version)
+                self._snapshot = None
+            return
+        if self._snapshot is not None and version == self._snapshot.version:
+            return
+        try:
+            snapshot = VectorSnapshot(self.directory / version)
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Could not load RAG snapshot %s: %s", version, exc)
+            return
+        self._snapshot = snapshot  # atomic swap; in-flight searches keep the old one
+        logger.info("Loaded RAG snapshot %s (%d vectors)", version, len(snapshot))
+
+
+_index: Optional[SnapshotIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_snapshot_index() -> Optional[SnapshotIndex]:
+    """Process-wide index for ``RAG_SNAPSHOT_DIR``, or None when snapshots are disabled."""
+    global _index
+    if not SNAPSHOT_DIR:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SnapshotIndex(SNAPSHOT_DIR)
+    return _index
+
+
+# --- Publishing
+def write_snapshot(
+    directory: str | Path,
+    rows: Iterable[Dict[str, Any]],
+    doc_types: Sequence[str],
+    dtype: str = "float32",
+    keep: int = 2,
+) -> Optional[str]:
+    """Write `rows` (chunk id, chunk, source, metadata, filter columns, embedding) as a new
+    snapshot and atomically make it current. Returns the version, or None if `rows` is empty;
+    then no snapshot is current and searches fall back to the database."""
+    rows = list(rows)
+    directory = Path(directory)
+    if not rows:
+        (directory / POINTER).unlink(missing_ok=True)
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    version = time.strftime("%Y%m%dT%H%M%S") + f".{time.time_ns() % 1_000_000_000:09d}"
+    tmp = directory / f".{version}.tmp"
+    tmp.mkdir()
+
+    matrix = _normalize_rows(np.stack([np.asarray(r["embedding"], dtype=np.float32) for r in rows]))
+    np.save(tmp / "vectors.npy", matrix.astype(dtype))
+    for name in _INT_COLUMNS:
+        values = [r.get(name) for r in rows]
+        np.save(tmp / f"{name}.npy", np.array([_NULL_INT if v is None else v for v in values], dtype=np.int64))
+    for name in _STR_COLUMNS:
+        np.save(tmp / f"{name}.npy", np.array([r.get(name) or "" for r in rows], dtype=str))
+    records = [
+        {"id": r["chunk_id"], "chunk": r["chunk"], "source": r["source"], "metadata": r["metadata"]}
+        for r in rows
+    ]
+    (tmp / "records.json").write_text(json.dumps(records, default=str))
+    (tmp / "meta.json").write_text(
+        json.dumps({"version": version, "doc_types": list(doc_types), "count": len(rows), "dtype": dtype})
+    )
+
+    os.rename(tmp, directory / version)
+    pointer_tmp = directory / f".{POINTER}.tmp"
+    pointer_tmp.write_text(version)
+    os.replace(pointer_tmp, directory / POINTER)
+
+    snapshots = sorted(p for p in directory.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+def export_snapshot(
+    conn: Any,
+    directory: str | Path,
+    doc_types: Sequence[str] = ("curriculum_topic",),
+    dtype: str = "float32",
+) -> Optional[str]:
+    """Publish the given document types from Postgres (pgvector adapters must be registered)."""
+    with conn.cursor(binary=True) as cur:
+        cur.execute(
+            """
+            SELECT c.id AS chunk_id, c.chunk, d.source, d.metadata, d.doc_type, d.subject_id,
+                   d.class_id, d.academic_year, d.student_id, e.embedding
+            FROM rag_embedding e
+            JOIN rag_chunk c ON c.id = e.chunk_id
+            JOIN rag_document d ON d.id = c.document_id
+            WHERE d.doc_type = ANY(%s)
+            ORDER BY c.id
+            """,
+            (list(doc_types),),
+        )
+        cols = [c.name for c in cur.description]
+        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    return write_snapshot(directory, rows, doc_types, dtype=dtype)
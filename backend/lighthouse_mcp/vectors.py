@@ -0,0 +1,104 @@
+# lighthouse_mcp/vectors.py
+"""Binary pgvector adaptation for psycopg, backed by NumPy float32 arrays.
+
+Registering these adapters on a connection makes ``numpy.ndarray`` parameters travel
+as pgvector's binary wire format (``uint16 dim, uint16 unused, float32[dim]``, big
+endian) and makes ``vector`` columns load back as ``float32`` arrays, so embeddings
+are never formatted as ~20 KB decimal literals or re-parsed by Postgres.
+"""
+from __future__ import annotations
+
+import base64
+import logging
+import struct
+from typing import Any, Optional
+
+import numpy as np
+from psycopg import Connection
+from psycopg.adapt import Buffer, Dumper, Loader
+from psycopg.pq import Format
+from psycopg.types import TypeInfo
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">HH")
+_BE_FLOAT32 = np.dtype(">f4")
+
+# pgvector's OID differs per database but not per connection; fetch it once.
+_vector_info: Optional[TypeInfo] = None
+
+
+def as_vector(values: Any) -> np.ndarray:
+    """Return `values` as a contiguous float32 array (no copy if already one)."""
+    return np.ascontiguousarray(values, dtype=np.float32)
+
+
+def from_base64(data: str) -> np.ndarray:
+    """Decode an embeddings API ``encoding_format="base64"`` payload (little-endian float32)."""
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").astype(np.float32, copy=False)
+
+
+def to_binary(vector: np.ndarray) -> bytes:
+    vector = np.asarray(vector)
+    if vector.ndim != 1:
+        raise ValueError("pgvector values must be one-dimensional")
+    return _HEADER.pack(vector.shape[0], 0) + vector.astype(_BE_FLOAT32, copy=False).tobytes()
+
+
+def from_binary(data: Buffer) -> np.ndarray:
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_BE_FLOAT32, count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+class VectorDumper(Dumper):
+    format = Format.TEXT
+
+    def dump(self, obj: np.ndarray) -> bytes:
+        return ("[" + ",".join(repr(float(v)) for v in np.asarray(obj).ravel()) + "]").encode()
+
+
+class VectorBinaryDumper(Dumper):
+    format = Format.BINARY
+
+    def dump(self, obj: np.ndarray) -> bytes:
+        return to_binary(obj)
+
+
+class VectorLoader(Loader):
+    format = Format.TEXT
+
+    def load(self, data: Buffer) -> np.ndarray:
+        text = bytes(data).decode()
+        return np.array(text[1:-1].split(","), dtype=np.float32)
+
+
+class VectorBinaryLoader(Loader):
+    format = Format.BINARY
+
+    def load(self, data: Buffer) -> np.ndarray:
+        return from_binary(data)
+
+
+def _register(conn: Connection, info: TypeInfo) -> None:
+    info.register(conn)
+    adapters = conn.adapters
+    # The binary dumper is registered last so plain `%s` placeholders pick it too.
+    adapters.register_dumper(np.ndarray, type("VectorDumper", (VectorDumper,), {"oid": info.oid}))
+    adapters.register_dumper(
+        np.ndarray, type("VectorBinaryDumper", (VectorBinaryDumper,), {"oid": info.oid})
+    )
+    adapters.register_loader(info.oid, VectorLoader)
+    adapters.register_loader(info.oid, VectorBinaryLoader)
+
+
+def register_vector(conn: Connection) -> bool:
+    """Register pgvector adapters on `conn`; returns False if the extension is missing."""
+    global _vector_info
+    if _vector_info is None:
+        _vector_info = TypeInfo.fetch(conn, "vector")
+        if _vector_info is None:
+            logger.warning("pgvector extension not found; vectors will not be adapted")
+            return False
+    _register(conn, _vector_info)
+    return True
+
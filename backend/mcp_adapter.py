@@ -1,4 +1,8 @@
-"""Lightweight MCP server adapter used when crewai_tools lacks MCPServerAdapter."""
+"""Lightweight MCP server adapters.
+
+``MCPServerAdapter`` runs the tools in-process when crewai_tools lacks its own adapter;
+``RemoteMCPAdapter`` calls a standalone MCP server over HTTP/SSE (``MCP_SERVER_URL``).
+"""
 from __future__ import annotations
 
 from importlib import import_module
@@ -38,6 +42,18 @@ class MCPFunctionTool(BaseTool):
         return self._func(payload)
 
 
+# name -> (description, payload model in backend.lighthouse_mcp.models)
+TOOL_SPECS = {
+    "pg_safe_query": ("Run whitelisted read-only queries via MCP.", "SafeQuery"),
+    "rag_search": ("Search the curriculum/document embeddings store via MCP.", "RagSearch"),
+    "report_compose": ("Compose term reports for a student via MCP.", "ReportCompose"),
+    "report_compose_bulk": (
+        "Compose term reports for every student in a class or school via MCP.",
+        "ReportComposeBulk",
+    ),
+}
+
+
 class MCPServerAdapter:
     """Minimal adapter that exposes MCP tools as CrewAI tools without spawning a subprocess."""
 
@@ -45,24 +61,13 @@ class MCPServerAdapter:
         module = import_module("backend.lighthouse_mcp.lighthouse_mcp_server")
 
         self.tools = {
-            "pg_safe_query": MCPFunctionTool(
-                name="pg_safe_query",
-                description="Run whitelisted read-only queries via MCP.",
-                payload_model=module.SafeQuery,
-                func=module.pg_safe_query,
-            ),
-            "rag_search": MCPFunctionTool(
-                name="rag_search",
-                description="Search the curriculum/document embeddings store via MCP.",
-                payload_model=module.RagSearch,
-                func=module.rag_search,
-            ),
-            "report_compose": MCPFunctionTool(
-                name="report_compose",
-                description="Compose term reports for a student via MCP.",
-                payload_model=module.ReportCompose,
-                func=module.report_compose,
-            ),
+            name: MCPFunctionTool(
+                name=name,
+                description=description,
+                payload_model=getattr(module, model),
+                func=getattr(module, name),
+            )
+            for name, (description, model) in TOOL_SPECS.items()
         }
 
         self._module = module
@@ -71,3 +76,36 @@ class MCPServerAdapter:
     def shutdown(self) -> None:
         """Placeholder for interface compatibility."""
         return None
+
+
+class RemoteMCPAdapter:
+    """Expose the tools of a standalone MCP server (``--transport http|sse``) as CrewAI tools.
+
+    All tools share one persistent, auto-reconnecting client session, so tool execution
+    runs in the MCP server's worker processes rather than in the API process.
+    """
+
+    def __init__(self, url: str, transport: str = "http", timeout: float = 60.0) -> None:
+        from backend.lighthouse_mcp import models
+        from backend.mcp_client import MCPClient
+
+        self.client = MCPClient(url, transport=transport, timeout=timeout)
+        self.tools = {
+            name: MCPFunctionTool(
+                name=name,
+                description=description,
+                payload_model=getattr(models, model),
+                func=self._remote_call(name),
+            )
+            for name, (description, model) in TOOL_SPECS.items()
+        }
+
+    def _remote_call(self, name: str) -> Callable[[BaseModel], Any]:
+        def call(payload: BaseModel) -> Any:
+            arguments = payload.model_dump(by_alias=True, exclude_none=True)
+            return self.client.call_tool(name, {"payload": arguments})
+
+        return call
+
+    def shutdown(self) -> None:
+        self.client.close()
@@ -0,0 +1,143 @@
+"""Persistent client session to a standalone LightHouse MCP server (HTTP or SSE transport).
+
+The session lives on a private event loop thread so synchronous callers (CrewAI tools
+running on the agent worker pool) can share it. A dropped connection or a timed-out call
+tears the session down; the next call reconnects, retrying with backoff.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from contextlib import AsyncExitStack
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.types import CallToolResult
+
+from backend.lighthouse_mcp.metrics import histogram, span
+
+logger = logging.getLogger(__name__)
+
+MCP_CALL_SECONDS = histogram(
+    "lighthouse_mcp_call_seconds", "MCP tool calls as seen by the client, network included.", ("tool",)
+)
+
+
+def decode_result(result: CallToolResult) -> Any:
+    """Turn a tool result back into the Python value the tool returned."""
+    texts = [block.text for block in result.content if getattr(block, "type", None) == "text"]
+    if result.isError:
+        return {"error": " ".join(texts) or "tool call failed"}
+    if result.structuredContent is not None:
+        structured = result.structuredContent
+        # FastMCP wraps non-object return values as {"result": value}
+        return structured["result"] if set(structured) == {"result"} else structured
+    values = []
+    for text in texts:
+        try:
+            values.append(json.loads(text))
+        except ValueError:
+            values.append(text)
+    return values[0] if len(values) == 1 else values
+
+
+class MCPClient:
+    def __init__(
+        self,
+        url: str,
+        transport: str = "http",
+        timeout: float = 60.0,
+        max_retries: int = 2,
+    ) -> None:
+        if transport not in ("http", "sse"):
+            raise ValueError(f"unsupported MCP transport {transport!r}")
+        self.url = url
+        self.transport = transport
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-client", daemon=True)
+        self._thread.start()
+        self._session: Optional[ClientSession] = None
+        self._closed: Optional[asyncio.Event] = None
+        self._connecting: Optional[asyncio.Future] = None
+
+    # --- connection lifecycle (runs on the private loop)
+    async def _hold_session(self, ready: asyncio.Future, closed: asyncio.Event) -> None:
+        # The transport's task groups must be entered and exited by the same task, so one
+        # task owns each connection for its whole life.
+        try:
+            async with AsyncExitStack() as stack:
+                if self.transport == "sse":
+                    read, write = await stack.enter_async_context(sse_client(self.url))
+                else:
+                    read, write, _ = await stack.enter_async_context(streamablehttp_client(self.url))
+                session = await stack.enter_async_context(
+                    ClientSession(read, write, read_timeout_seconds=timedelta(seconds=self.timeout))
+                )
+                await session.initialize()
+                ready.set_result(session)
+                await closed.wait()
+        except BaseException as exc:  # noqa: BLE001 - reported to whoever is waiting
+            if not ready.done():
+                ready.set_exception(exc)
+            else:
+                logger.warning("MCP session to %s ended: %s", self.url, exc)
+        finally:
+            if self._closed is closed:
+                self._session = None
+
+    async def _ensure_session(self) -> ClientSession:
+        if self._session is not None:
+            return self._session
+        if self._connecting is None:
+            ready: asyncio.Future = self._loop.create_future()
+            closed = asyncio.Event()
+            self._connecting, self._closed = ready, closed
+            self._loop.create_task(self._hold_session(ready, closed))
+        connecting = self._connecting
+        try:
+            self._session = await connecting
+        finally:
+            if self._connecting is connecting:
+                self._connecting = None
+        return self._session
+
+    def _drop_session(self) -> None:
+        if self._closed is not None:
+            self._closed.set()
+        self._session = None
+        self._closed = None
+
+    async def _call(self, name: str, arguments: Dict[str, Any]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                session = await self._ensure_session()
+                return decode_result(await session.call_tool(name, arguments))
+            except Exception as exc:  # transport errors, timeouts, closed streams
+                self._drop_session()
+                if attempt >= self.max_retries:
+                    raise RuntimeError(f"MCP call {name!r} to {self.url} failed: {exc}") from exc
+                delay = min(0.5 * 2 ** attempt, 5.0)
+                logger.warning("MCP call %s failed (%s); reconnecting in %.1fs", name, exc, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    # --- public, thread-safe API
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        with span(f"mcp {name}", MCP_CALL_SECONDS, tool=name):
+            future = asyncio.run_coroutine_threadsafe(self._call(name, arguments), self._loop)
+            return future.result()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._drop_session)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Measure per-request agent construction cost with and without the persona template cache.
+
+"uncached" builds a plain Agent (LLM client, tool schemas, prompts) per request, as the app
+did before the cache; "cached" is the request path, a copy of the persona's template. Task
+and Crew construction is the same either way and is not timed. No LLM or tool calls are
+made. Prints one JSON object with per-build timings in ms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def _time_builds(app, iterations: int, persona: str, stream: bool, cached: bool) -> dict:
+    build = app.build_agent if cached else app.new_agent
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build(persona, stream)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--persona", default="teacher")
+    parser.add_argument("--stream", action="store_true", help="Build the streaming variant.")
+    args = parser.parse_args()
+
+    from backend import app
+
+    app.agent_template(args.persona, args.stream)  # warm imports/adapters outside the timings
+    results = {
+        "persona": args.persona,
+        "stream": args.stream,
+        "iterations": args.iterations,
+        "uncached": _time_builds(app, args.iterations, args.persona, args.stream, cached=False),
+        "cached": _time_builds(app, args.iterations, args.persona, args.stream, cached=True),
+    }
+    print(json.dumps(results, indent=2), file=sys.stdout)
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()
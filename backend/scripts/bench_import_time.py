@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Measure cold import time of the API, the MCP server and the ingest CLI.
+
+Each target is imported in a fresh interpreter with ``-X importtime``; the script
+reports wall time (interpreter start included) and the target's cumulative import
+time, and lists the slowest imports it pulled in. ``--budget module=ms`` turns a
+regression into a non-zero exit status for CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_TARGETS = (
+    "backend.app",
+    "backend.lighthouse_mcp.lighthouse_mcp_server",
+    "backend.scripts.ingest_rag_data",
+)
+
+
+def _parse_importtime(stderr: str) -> Dict[str, int]:
+    """Map module -> cumulative import time (us) from ``-X importtime`` output."""
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            cumulative[name] = int(cum)
+        except ValueError:  # header row
+            continue
+    return cumulative
+
+
+def measure(module: str, runs: int) -> Dict[str, object]:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    walls: List[float] = []
+    imports: List[float] = []
+    slowest: Dict[str, int] = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=ROOT,
+        )
+        walls.append((time.perf_counter() - started) * 1000)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+            return {"module": module, "error": error}
+        cumulative = _parse_importtime(proc.stderr)
+        imports.append(cumulative.get(module, 0) / 1000)
+        slowest = cumulative
+    top = sorted(
+        ((name, us) for name, us in slowest.items() if "." not in name and name != module),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:8]
+    return {
+        "module": module,
+        "wall_ms": round(statistics.median(walls), 1),
+        "import_ms": round(statistics.median(imports), 1),
+        "slowest_top_level": {name: round(us / 1000, 1) for name, us in top},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_TARGETS))
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median).")
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="MODULE=MS",
+        help="Fail if MODULE's median import time exceeds MS milliseconds.",
+    )
+    args = parser.parse_args()
+
+    budgets = {}
+    for item in args.budget:
+        module, _, limit = item.partition("=")
+        budgets[module] = float(limit)
+
+    results = [measure(module, args.runs) for module in args.modules]
+    print(json.dumps(results, indent=2), file=sys.stdout)
+
+    over = [
+        r["module"]
+        for r in results
+        if r["module"] in budgets and ("error" in r or r["import_ms"] > budgets[r["module"]])
+    ]
+    if over:
+        raise SystemExit(f"Import-time budget exceeded: {', '.join(over)}")
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()
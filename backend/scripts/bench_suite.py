@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""Offline benchmark and load-test suite: ingest, rag_search, SQL tools and /chat.
+
+Runs without network access. Embeddings come from a deterministic hashing fake and
+the agents from a fake LLM that answers after ``--llm-latency`` seconds, so results
+depend only on this code and the database. The database parts need a scratch
+Postgres with pgvector, schema/lighthouse_erd_schema.sql and backend/sql applied,
+passed as ``--database-url`` (never read from DATABASE_URL): synthetic rows are
+seeded under a "LightHouse Benchmark" school and removed afterwards (``--keep`` to
+keep them). The /chat parts need fastapi and crewai. Parts that cannot run are listed
+under ``skipped``.
+
+Results are one JSON document (``--output``); ``--compare BASELINE.json`` reports
+latencies (``*_ms``) and throughputs (``*_per_sec``) that regressed by more than
+``--tolerance`` and exits non-zero, so two commits can be compared in CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+BENCH_SCHOOL = "LightHouse Benchmark"
+BENCH_ADMIN_EMAIL = "bench-admin@lighthouse.invalid"
+SESSION = "2024/2025"
+TERMS = ("first", "second", "third")
+SUBJECTS = (
+    "Mathematics", "English Language", "Basic Science", "Basic Technology",
+    "Social Studies", "Civic Education", "Agricultural Science", "Computer Studies",
+)
+WORDS = (
+    "algebra", "fractions", "reading", "comprehension", "essay", "photosynthesis", "energy",
+    "electricity", "drawing", "measurement", "citizenship", "rights", "soil", "crops",
+    "programming", "networks", "geometry", "statistics", "grammar", "vocabulary",
+)
+REMARKS = (
+    "Excellent work, keep it up.", "Good effort; revise the weaker topics.",
+    "Needs more practice with homework.", "Improving steadily this term.",
+    "Participates well in class discussions.", "Should pay more attention in class.",
+)
+CHAT_QUESTIONS = (
+    "How can I support {w} at home?", "Why is {w} hard for many students?",
+    "Suggest a revision plan for {w}.", "Explain the best way to teach {w}.",
+)
+
+_TOKEN = re.compile(r"\w+")
+
+
+# --- fakes
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector: hashed bag of words, so similar texts are close."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in _TOKEN.findall(text.lower()):
+        digest = zlib.crc32(token.encode())
+        vector[digest % dim] += 1.0 if digest & 1 << 31 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if not norm:
+        vector[0] = norm = 1.0
+    return vector / norm
+
+
+def install_fake_embeddings(latency: float = 0.0) -> None:
+    """Replace the embeddings API (and the on-disk embedding cache) in this process."""
+    from backend.lighthouse_mcp import embeddings
+    from backend.lighthouse_mcp.embedding_cache import EmbeddingCache
+
+    def request(snippets: List[str]) -> List[np.ndarray]:
+        if latency:
+            time.sleep(latency)
+        return [fake_embedding(snippet, embeddings.EMBEDDING_DIM) for snippet in snippets]
+
+    cache = EmbeddingCache(path=None)
+    embeddings._request_embeddings = request
+    embeddings.get_embedding_cache = lambda: cache
+
+
+def fake_llm(latency: float, stream: bool = False):
+    """A CrewAI LLM that gives a final answer after `latency` seconds, without tool calls."""
+    try:
+        from crewai import BaseLLM  # type: ignore
+    except ImportError:  # older CrewAI
+        from crewai.llms.base_llm import BaseLLM  # type: ignore
+
+    class FakeLLM(BaseLLM):
+        def __init__(self) -> None:
+            super().__init__(model="fake-llm", temperature=0)
+
+        def call(self, messages: Any, *args: Any, **kwargs: Any) -> str:
+            prompt = messages if isinstance(messages, str) else str(messages[-1].get("content", ""))
+            words = _TOKEN.findall(prompt.lower())[-8:]
+            answer = f"Here is a short plan covering {' '.join(words)}."
+            time.sleep(latency)
+            if stream:
+                _emit_chunks(self, answer)
+            return f"Thought: I now know the final answer\nFinal Answer: {answer}"
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def supports_stop_words(self) -> bool:
+            return False
+
+        def get_context_window_size(self) -> int:
+            return 8192
+
+    return FakeLLM()
+
+
+def _emit_chunks(source: Any, text: str) -> None:
+    try:
+        from crewai.events import LLMStreamChunkEvent, crewai_event_bus  # type: ignore
+    except ImportError:
+        from crewai.utilities.events import LLMStreamChunkEvent, crewai_event_bus  # type: ignore
+    for word in text.split(" "):
+        crewai_event_bus.emit(source, event=LLMStreamChunkEvent(chunk=word + " "))
+
+
+# --- timing
+def summarize(samples_ms: Sequence[float], errors: int = 0) -> Dict[str, Any]:
+    """Latency summary; percentiles use the nearest-rank method."""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"n": 0, "errors": errors}
+
+    def percentile(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 3)
+
+    return {
+        "n": len(ordered),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def time_calls(fn: Callable[[Any], Any], inputs: Iterable[Any]) -> Dict[str, Any]:
+    """Call `fn` once per input; exceptions and ``{"error": ...}`` results count as errors."""
+    samples: List[float] = []
+    errors: List[str] = []
+    for item in inputs:
+        started = time.perf_counter()
+        try:
+            result = fn(item)
+        except Exception as exc:
+            errors.append(str(exc))
+            continue
+        elapsed = (time.perf_counter() - started) * 1000
+        if isinstance(result, dict) and "error" in result:
+            errors.append(str(result["error"]))
+            continue
+        samples.append(elapsed)
+    stats = summarize(samples, len(errors))
+    if errors:
+        stats["first_error"] = errors[0][:200]
+    return stats
+
+
+# --- synthetic data
+_SEED_CURRICULUM = """
+    WITH cls AS (
+        INSERT INTO class (name, academic_year, school_id)
+        SELECT 'Bench ' || g, %(session)s, %(school_id)s FROM generate_series(1, %(classes)s) g
+        RETURNING id
+    ), subj AS (
+        INSERT INTO subject (name, class_id, school_id)
+        SELECT s.name, cls.id, %(school_id)s FROM cls CROSS JOIN unnest(%(subjects)s::TEXT[]) s(name)
+        RETURNING id, name
+    ), th AS (
+        INSERT INTO theme (name, subject_id)
+        SELECT subj.name || ' theme ' || g, subj.id FROM subj CROSS JOIN generate_series(1, 3) g
+        RETURNING id, name
+    )
+    INSERT INTO topic (name, theme_id, week_covered, learning_outcome, coverage_status)
+    SELECT (%(words)s::TEXT[])[1 + (th.id * 4 + g) %% %(n_words)s] || ' ' || g,
+           th.id, g,
+           'Students can explain ' || (%(words)s::TEXT[])[1 + (th.id + g) %% %(n_words)s]
+             || ' and apply it to ' || (%(words)s::TEXT[])[1 + (th.id * 7 + g) %% %(n_words)s] || '.',
+           (ARRAY['planned', 'in_progress', 'completed'])[1 + g %% 3]
+    FROM th CROSS JOIN generate_series(1, 4) g
+"""
+
+_SEED_STUDENTS = """
+    INSERT INTO student (first_name, last_name, admission_number, school_id, current_class_id)
+    SELECT 'Student', 'Bench ' || g, 'BENCH-' || g, %(school_id)s,
+           (%(class_ids)s::BIGINT[])[1 + g %% cardinality(%(class_ids)s::BIGINT[])]
+    FROM generate_series(%(first)s, %(last)s) g
+"""
+
+# Results of the new students. created_at is fixed, unique and decreasing in seeding order
+# so that ingest_student_results(limit=n), which reads newest first, always picks the
+# first n rows seeded (ahead of any real rows).
+_SEED_RESULTS = """
+    INSERT INTO result (student_id, class_id, subject_id, session, term, ca1, ca2, exam, grade,
+                        teacher_remark, created_at)
+    SELECT st.id, st.current_class_id, subj.id, %(session)s, t.term::term_enum,
+           5 + (st.id * 7 + subj.id) %% 16, 5 + (st.id * 3 + subj.id * 5) %% 16,
+           20 + (st.id * 11 + subj.id * 13 + t.ord) %% 41,
+           (ARRAY['A', 'B', 'C', 'D', 'E', 'F'])[1 + (st.id + subj.id + t.ord) %% 6],
+           (%(remarks)s::TEXT[])[1 + (st.id + subj.id * 3 + t.ord) %% %(n_remarks)s],
+           TIMESTAMPTZ '2099-01-01'
+             - make_interval(secs => %(seeded)s + row_number() OVER (ORDER BY st.id, subj.id, t.ord))
+    FROM student st
+    JOIN subject subj ON subj.class_id = st.current_class_id
+    CROSS JOIN unnest(%(terms)s::TEXT[]) WITH ORDINALITY t(term, ord)
+    WHERE st.school_id = %(school_id)s AND st.id > %(after)s
+"""
+
+
+class BenchData:
+    """The synthetic school, admin user and students seeded for one run."""
+
+    def __init__(self, conn, classes: int) -> None:
+        self.conn = conn
+        self.cleanup()
+        self.school_id = conn.execute(
+            "INSERT INTO school (name) VALUES (%s) RETURNING id", (BENCH_SCHOOL,)
+        ).fetchone()[0]
+        self.admin_id = conn.execute(
+            "INSERT INTO app_user (name, email, role, school_id) VALUES (%s, %s, 'admin', %s) RETURNING id",
+            ("Benchmark Admin", BENCH_ADMIN_EMAIL, self.school_id),
+        ).fetchone()[0]
+        conn.execute(_SEED_CURRICULUM, {
+            "school_id": self.school_id, "session": SESSION, "classes": classes,
+            "subjects": list(SUBJECTS), "words": list(WORDS), "n_words": len(WORDS),
+        })
+        self.class_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM class WHERE school_id = %s ORDER BY id", (self.school_id,)
+        )]
+        conn.commit()
+        self.students: List[int] = []
+        self.results = 0
+
+    @property
+    def auth(self) -> Dict[str, Any]:
+        return {"user_id": self.admin_id, "role": "admin", "school_id": self.school_id}
+
+    def grow(self, results: int) -> None:
+        """Add students until the school has at least `results` result rows."""
+        per_student = len(SUBJECTS) * len(TERMS)
+        needed = math.ceil(results / per_student) - len(self.students)
+        if needed <= 0:
+            return
+        after = max(self.students, default=0)
+        first = len(self.students) + 1
+        self.conn.execute(_SEED_STUDENTS, {
+            "school_id": self.school_id, "class_ids": self.class_ids,
+            "first": first, "last": first + needed - 1,
+        })
+        self.results += self.conn.execute(_SEED_RESULTS, {
+            "school_id": self.school_id, "session": SESSION, "terms": list(TERMS),
+            "remarks": list(REMARKS), "n_remarks": len(REMARKS), "after": after, "seeded": self.results,
+        }).rowcount
+        self.students = [row[0] for row in self.conn.execute(
+            "SELECT id FROM student WHERE school_id = %s ORDER BY id", (self.school_id,)
+        )]
+        self.conn.execute("ANALYZE result")
+        self.conn.commit()
+
+    def cleanup(self) -> None:
+        """Remove the benchmark school (cascading to its rows) and its RAG documents."""
+        self.conn.execute(
+            """
+            DELETE FROM rag_document d
+            USING student s JOIN school sc ON sc.id = s.school_id
+            WHERE sc.name = %(name)s AND d.metadata->>'type' = 'student_result'
+              AND d.metadata->>'student_id' = s.id::TEXT
+            """,
+            {"name": BENCH_SCHOOL},
+        )
+        self.conn.execute(
+            """
+            DELETE FROM rag_document d
+            USING class c JOIN school sc ON sc.id = c.school_id
+            WHERE sc.name = %(name)s AND d.metadata->>'type' = 'curriculum_topic'
+              AND d.metadata->>'class_id' = c.id::TEXT
+            """,
+            {"name": BENCH_SCHOOL},
+        )
+        self.conn.execute("DELETE FROM app_user WHERE email = %s", (BENCH_ADMIN_EMAIL,))
+        self.conn.execute("DELETE FROM school WHERE name = %s", (BENCH_SCHOOL,))
+        self.conn.commit()
+
+
+# --- database benchmarks
+def rag_queries(rng: random.Random, count: int) -> List[str]:
+    templates = (
+        "{a} and {b} lesson outcomes", "student remark about {a}", "{subject} {a} {b}",
+        "how to improve in {subject}", "{term} term {subject} results",
+    )
+    return [
+        rng.choice(templates).format(
+            a=rng.choice(WORDS), b=rng.choice(WORDS), subject=rng.choice(SUBJECTS), term=rng.choice(TERMS)
+        )
+        for _ in range(count)
+    ]
+
+
+def bench_database(url: str, args: argparse.Namespace, results: Dict[str, Any]) -> None:
+    import psycopg
+
+    from backend.lighthouse_mcp import lighthouse_mcp_server as server
+    from backend.lighthouse_mcp.db import close_pools
+    from backend.lighthouse_mcp.models import RagSearch, ReportCompose, SafeQuery
+    from backend.lighthouse_mcp.vectors import register_vector
+    from backend.scripts import ingest_rag_data as ingest
+
+    rng = random.Random(args.seed)
+    with psycopg.connect(url) as conn:
+        register_vector(conn)
+        data = BenchData(conn, args.classes)
+        try:
+            started = time.perf_counter()
+            counts = ingest.ingest_curriculum_topics(conn)
+            results["ingest_topics"] = _rate(counts.written, time.perf_counter() - started)
+
+            results["ingest"], results["rag_search"] = {}, {}
+            for size in sorted(args.sizes):
+                data.grow(size)
+                started = time.perf_counter()
+                counts = ingest.ingest_student_results(conn, limit=size)
+                results["ingest"][str(size)] = _rate(counts.written, time.perf_counter() - started)
+                conn.execute("ANALYZE rag_embedding")
+                conn.commit()
+
+                corpus = conn.execute("SELECT count(*) FROM rag_embedding").fetchone()[0]
+                by_mode: Dict[str, Any] = {"corpus_rows": corpus}
+                queries = rag_queries(rng, args.queries)
+                for mode in args.modes:
+                    by_mode[mode] = time_calls(
+                        lambda q: server.rag_search(RagSearch(query=q, k=args.k, mode=mode)), queries
+                    )
+                students = [rng.choice(data.students) for _ in queries]
+                by_mode["vector_filtered"] = time_calls(
+                    lambda pair: server.rag_search(RagSearch(
+                        query=pair[0], k=args.k, mode="vector",
+                        filters={"type": "student_result", "student_id": pair[1]},
+                    )),
+                    list(zip(queries, students)),
+                )
+                results["rag_search"][str(size)] = by_mode
+
+            students = [rng.choice(data.students) for _ in range(args.queries)]
+            results["pg_safe_query"] = {
+                name: time_calls(
+                    lambda sid: server.pg_safe_query(
+                        SafeQuery(name=name, params={"student_id": sid, "_auth": data.auth})
+                    ),
+                    students,
+                )
+                for name in ("latest_results", "student_profile")
+            }
+            results["report_compose"] = time_calls(
+                lambda sid: server.report_compose(ReportCompose(
+                    student_id=sid, session=SESSION, term=rng.choice(TERMS), _auth=data.auth
+                )),
+                students,
+            )
+        finally:
+            close_pools()
+            if not args.keep:
+                data.cleanup()
+
+
+def _rate(rows: int, seconds: float) -> Dict[str, Any]:
+    return {"rows": rows, "seconds": round(seconds, 3), "rows_per_sec": round(rows / seconds, 1) if seconds else None}
+
+
+# --- /chat benchmarks
+def install_fake_agents(app: Any, latency: float) -> None:
+    """Build persona agents with the fake LLM and no tools (no MCP server is started)."""
+    from crewai import Agent
+
+    @lru_cache(maxsize=None)
+    def agent_template(persona: str, stream: bool = False):
+        return Agent(
+            **app.PERSONAS[persona],
+            tools=[],
+            allow_delegation=False,
+            verbose=False,
+            llm=fake_llm(latency, stream),
+        )
+
+    app.agent_template = agent_template
+
+
+async def _load(concurrency: int, requests: int, call: Callable[[int], Any]) -> Dict[str, Any]:
+    gate = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    first_chunks: List[float] = []
+    rejected = errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal rejected, errors
+        async with gate:
+            started = time.perf_counter()
+            try:
+                first = await call(i)
+            except Exception as exc:
+                if getattr(exc, "status_code", None) == 503:
+                    rejected += 1
+                else:
+                    errors += 1
+                return
+            samples.append((time.perf_counter() - started) * 1000)
+            if first is not None:
+                first_chunks.append((first - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stats = summarize(samples, errors)
+    stats["rejected"] = rejected
+    stats["requests_per_sec"] = round(len(samples) / elapsed, 2) if elapsed else None
+    if first_chunks:
+        stats["first_chunk_p50_ms"] = summarize(first_chunks)["p50_ms"]
+        stats["first_chunk_p99_ms"] = summarize(first_chunks)["p99_ms"]
+    return stats
+
+
+def bench_chat(args: argparse.Namespace, results: Dict[str, Any]) -> None:
+    import jwt
+
+    from backend import app
+
+    install_fake_agents(app, args.llm_latency)
+    token = jwt.encode({"uid": 1, "role": "admin", "sid": 1}, app.JWT_SECRET, algorithm="HS256")
+
+    def body(i: int) -> Dict[str, Any]:
+        # Distinct questions: measure the agent path, not the answer cache.
+        question = CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)].format(w=WORDS[i % len(WORDS)])
+        return {"message": f"{question} ({i})", "persona": ("parent", "teacher", "admin")[i % 3]}
+
+    async def chat(i: int) -> None:
+        await app.chat(body(i), ctx=app.auth(f"Bearer {token}"))
+
+    async def chat_stream(i: int) -> float:
+        response = await app.chat_stream(body(i), ctx=app.auth(f"Bearer {token}"))
+        first = None
+        async for chunk in response.iterator:
+            if first is None and not chunk.startswith(":"):
+                first = time.perf_counter()
+        return first
+
+    results["chat"], results["chat_stream"] = {}, {}
+    for concurrency in args.concurrency:
+        key = f"c{concurrency}"
+        results["chat"][key] = asyncio.run(_load(concurrency, args.requests, chat))
+        results["chat_stream"][key] = asyncio.run(_load(concurrency, args.requests, chat_stream))
+    app.agent_pool.shutdown()
+
+
+# --- results
+def _git(*command: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *command], capture_output=True, text=True, cwd=ROOT, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Dotted-path view of every numeric result, e.g. ``rag_search.1000.vector.p99_ms``."""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[Tuple[str, float, float]]:
+    """Metrics that got worse than `baseline` by more than `tolerance` (a fraction)."""
+    before, after = flatten(baseline["results"]), flatten(current["results"])
+    regressions = []
+    for path, old in sorted(before.items()):
+        new = after.get(path)
+        if new is None or not old:
+            continue
+        if path.endswith("_ms") and new > old * (1 + tolerance):
+            regressions.append((path, old, new))
+        elif path.endswith("_per_sec") and new < old * (1 - tolerance):
+            regressions.append((path, old, new))
+    return regressions
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    # Measure the tools themselves: no result/answer caches, no LISTEN threads.
+    os.environ.setdefault("QUERY_CACHE_TTL", "0")
+    os.environ.setdefault("QUERY_CACHE_LISTEN", "0")
+    os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+    os.environ.setdefault("ANSWER_CACHE_LISTEN", "0")
+    os.environ.setdefault("APP_WARMUP", "0")
+    if args.database_url:
+        os.environ["DATABASE_URL_RO"] = os.environ["DATABASE_URL"] = args.database_url
+    install_fake_embeddings(args.embedding_latency)
+
+    results: Dict[str, Any] = {}
+    skipped: Dict[str, str] = {}
+    if "db" in args.parts:
+        if args.database_url:
+            bench_database(args.database_url, args, results)
+        else:
+            skipped["db"] = "no --database-url (or BENCH_DATABASE_URL)"
+
+    if "chat" in args.parts:
+        try:
+            import crewai  # noqa: F401
+            import fastapi  # noqa: F401
+        except ImportError as exc:
+            skipped["chat"] = f"{exc.name} is not installed"
+        else:
+            bench_chat(args, results)
+
+    return {
+        "suite": "lighthouse-bench",
+        "version": 1,
+        "meta": {
+            "commit": _git("rev-parse", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                key: value for key, value in vars(args).items()
+                if key not in ("database_url", "output", "compare")
+            },
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="Scratch database to seed and query (default: $BENCH_DATABASE_URL).")
+    parser.add_argument("--parts", type=lambda v: v.split(","), default=["db", "chat"],
+                        help="Comma-separated: db (ingest, rag_search, SQL tools), chat.")
+    parser.add_argument("--sizes", type=_int_list, default=[1000, 5000, 20000],
+                        help="Student-result corpus sizes for ingest and rag_search.")
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=["vector"],
+                        help="rag_search modes; lexical/hybrid need sql/10_rag_fulltext.sql.")
+    parser.add_argument("--queries", type=int, default=200, help="Timed calls per tool and size.")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--classes", type=int, default=6)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="/chat requests per concurrency level.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM seconds per call.")
+    parser.add_argument("--embedding-latency", type=float, default=0.0,
+                        help="Fake embeddings API seconds per request.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows after the run.")
+    parser.add_argument("--output", help="Write the JSON results here as well as to stdout.")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown before --compare fails (0.2 = 20%%).")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(baseline, report, args.tolerance)
+        for path, old, new in regressions:
+            print(f"REGRESSION {path}: {old} -> {new}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    sys.exit(main())
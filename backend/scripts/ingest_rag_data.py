@@ -7,12 +7,44 @@ import argparse
 import json
 import os
 import sys
-from typing import Iterable, Sequence
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
 
 import psycopg
-from psycopg import rows
+from psycopg import rows, sql
 
-from backend.lighthouse_mcp.lighthouse_mcp_server import EMBEDDING_DIM, EMBEDDING_MODEL, get_embedding
+from backend.lighthouse_mcp.embedding_cache import cache_key, normalize_text
+from backend.lighthouse_mcp.embeddings import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    get_embeddings,
+)
+from backend.lighthouse_mcp.vector_snapshot import SNAPSHOT_DIR, export_snapshot
+from backend.lighthouse_mcp.vectors import register_vector
+
+# `result.updated_at` is the writing transaction's start time, so a transaction that commits
+# after a run has moved the watermark past it would never be read. Incremental runs re-read
+# this many seconds before the watermark; unchanged rows in the overlap cost a hash lookup.
+INGEST_OVERLAP_SECONDS = float(os.environ.get("INGEST_OVERLAP_SECONDS", "900"))
+
+
+class RenderedDoc(NamedTuple):
+    """One rag_document/rag_chunk pair rendered from a source row."""
+
+    source: str
+    metadata: Dict[str, Any]
+    chunk: str
+    source_updated_at: Any = None
+
+
+class IngestCounts(NamedTuple):
+    scanned: int = 0
+    written: int = 0
+    unchanged: int = 0
+    deleted: int = 0
 
 
 def _require_database_url() -> str:
@@ -22,11 +54,225 @@ def _require_database_url() -> str:
     return url
 
 
-def _vector_to_sql(vector: Iterable[float]) -> str:
-    return "[" + ",".join(f"{value:.8f}" for value in vector) + "]"
+def content_hash(chunk: str) -> str:
+    """Hash of what gets embedded; a model/dimension change also invalidates it."""
+    return cache_key(EMBEDDING_MODEL, EMBEDDING_DIM, normalize_text(chunk))
+
 
+_STAGE_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS _rag_ingest_stage (
+        doc_type TEXT NOT NULL,
+        doc_key TEXT NOT NULL,
+        source TEXT NOT NULL,
+        metadata TEXT NOT NULL,
+        chunk TEXT NOT NULL,
+        embedding vector NOT NULL,
+        content_hash TEXT NOT NULL,
+        source_updated_at TEXT,
+        document_id BIGINT,
+        chunk_id BIGINT
+    )
+"""
+
+_STAGE_COPY = (
+    "COPY _rag_ingest_stage "
+    "(doc_type, doc_key, source, metadata, chunk, embedding, content_hash, source_updated_at) "
+    "FROM STDIN (FORMAT BINARY)"
+)
+
+# Replace existing documents for the staged keys and insert the new
+# document/chunk/embedding rows set-wise. Ids are drawn up front so the three
+# inserts can be joined without RETURNING round trips. `{key}` is a literal so the
+# DELETE can use the (type, <key>) expression indexes.
+_STAGE_MERGE = """
+    DELETE FROM rag_document d
+    USING _rag_ingest_stage s
+    WHERE d.metadata->>'type' = s.doc_type
+      AND d.metadata->>{key} = s.doc_key;
+
+    UPDATE _rag_ingest_stage
+    SET document_id = nextval(pg_get_serial_sequence('rag_document', 'id')),
+        chunk_id = nextval(pg_get_serial_sequence('rag_chunk', 'id'));
+
+    INSERT INTO rag_document (id, source, metadata, content_hash, source_updated_at)
+    SELECT document_id, source, metadata::jsonb, content_hash, source_updated_at::timestamptz
+    FROM _rag_ingest_stage;
+
+    INSERT INTO rag_chunk (id, document_id, chunk)
+    SELECT chunk_id, document_id, chunk FROM _rag_ingest_stage;
+
+    INSERT INTO rag_embedding (chunk_id, embedding, doc_type)
+    SELECT chunk_id, embedding, doc_type FROM _rag_ingest_stage;
+
+    TRUNCATE _rag_ingest_stage;
+"""
+
+_EXISTING_HASHES = """
+    SELECT metadata->>{key}, content_hash
+    FROM rag_document
+    WHERE metadata->>'type' = %s
+      AND metadata->>{key} = ANY(%s)
+"""
+
+_SAVE_WATERMARK = """
+    INSERT INTO rag_ingest_state (doc_type, watermark, last_key, updated_at)
+    VALUES (%s, %s, %s, now())
+    ON CONFLICT (doc_type) DO UPDATE
+    SET watermark = EXCLUDED.watermark, last_key = EXCLUDED.last_key, updated_at = now()
+"""
+
+
+def load_watermark(conn: psycopg.Connection, doc_type: str) -> tuple[Any, Optional[str]]:
+    row = conn.execute(
+        "SELECT watermark, last_key FROM rag_ingest_state WHERE doc_type = %s", (doc_type,)
+    ).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def _write_documents(
+    conn: psycopg.Connection,
+    docs: List[RenderedDoc],
+    id_key: str,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    watermark_type: str | None = None,
+) -> IngestCounts:
+    """Embed and store `docs`, replacing any existing document with the same type/id_key.
+
+    Documents whose rendered text hashes to the stored `content_hash` are skipped.
+    Each window is streamed into a temp table with binary COPY (embeddings in
+    pgvector's binary format) and merged with a handful of set-based statements,
+    then committed; when `watermark_type` is given the last row of the window is
+    recorded in rag_ingest_state in the same transaction so an interrupted run
+    resumes from there.
+    """
+    # Later rows win if the same key appears twice, matching the old per-row replace.
+    docs = list({(d.metadata["type"], str(d.metadata[id_key])): d for d in docs}.values())
+    merge = sql.SQL(_STAGE_MERGE).format(key=sql.Literal(id_key))
+    existing_hashes = sql.SQL(_EXISTING_HASHES).format(key=sql.Literal(id_key))
+
+    # Embed several API batches at once so `concurrency` requests can be in flight.
+    slice_size = max(1, batch_size) * max(1, concurrency)
+    written = unchanged = 0
+    with conn.cursor() as cur:
+        cur.execute(_STAGE_DDL)
+        for start in range(0, len(docs), slice_size):
+            window = docs[start:start + slice_size]
+            hashes = [content_hash(d.chunk) for d in window]
+            keys = [str(d.metadata[id_key]) for d in window]
+            stored = dict(cur.execute(existing_hashes, (window[0].metadata["type"], keys)).fetchall())
+            changed = [
+                (d, digest) for d, key, digest in zip(window, keys, hashes) if stored.get(key) != digest
+            ]
+            unchanged += len(window) - len(changed)
+
+            if changed:
+                embeddings = get_embeddings(
+                    [d.chunk for d, _ in changed],
+                    batch_size=batch_size,
+                    max_concurrency=concurrency,
+                )
+                with cur.copy(_STAGE_COPY) as copy:
+                    copy.set_types(["text"] * 5 + ["vector"] + ["text"] * 2)
+                    for (doc, digest), embedding in zip(changed, embeddings):
+                        copy.write_row((
+                            doc.metadata["type"],
+                            str(doc.metadata[id_key]),
+                            doc.source,
+                            json.dumps(doc.metadata),
+                            doc.chunk,
+                            embedding,
+                            digest,
+                            doc.source_updated_at.isoformat() if doc.source_updated_at else None,
+                        ))
+                cur.execute(merge)
+                written += len(changed)
+
+            if watermark_type:
+                last = window[-1]
+                cur.execute(_SAVE_WATERMARK, (watermark_type, last.source_updated_at, keys[-1]))
+            conn.commit()
+
+    return IngestCounts(scanned=len(docs), written=written, unchanged=unchanged)
+
+
+def _delete_orphans(conn: psycopg.Connection, doc_type: str, id_key: str, table: str) -> int:
+    """Remove documents whose source row no longer exists (a scan of both tables; see --prune)."""
+    cur = conn.execute(
+        sql.SQL(
+            """
+            DELETE FROM rag_document d
+            WHERE d.metadata->>'type' = %s
+              AND NOT EXISTS (
+                SELECT 1 FROM {table} src WHERE src.id::TEXT = d.metadata->>{key}
+              )
+            """
+        ).format(table=sql.Identifier(table), key=sql.Literal(id_key)),
+        (doc_type,),
+    )
+    deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def render_topic(row: Dict[str, Any]) -> RenderedDoc:
+    metadata = {
+        "type": "curriculum_topic",
+        "topic_id": row["topic_id"],
+        "theme_id": row["theme_id"],
+        "subject_id": row["subject_id"],
+        "class_id": row["class_id"],
+        "academic_year": row["academic_year"],
+    }
+    summary_lines = [
+        f"Subject: {row['subject_name']}",
+        f"Class: {row['class_name']} ({row['academic_year']})",
+        f"Theme: {row['theme_name']}",
+        f"Topic: {row['topic_name']}",
+    ]
+    if row.get("week_covered"):
+        summary_lines.append(f"Week covered: {row['week_covered']}")
+    if row.get("learning_outcome"):
+        summary_lines.append(f"Learning outcomes: {row['learning_outcome']}")
+    if row.get("coverage_status"):
+        summary_lines.append(f"Coverage status: {row['coverage_status']}")
+    if row.get("completed_date"):
+        summary_lines.append(f"Completed date: {row['completed_date']}")
+    return RenderedDoc(row["subject_name"], metadata, "\n".join(summary_lines))
+
+
+def render_result(row: Dict[str, Any]) -> RenderedDoc:
+    metadata = {
+        "type": "student_result",
+        "result_id": row["result_id"],
+        "student_id": row["student_id"],
+        "class_id": row["class_id"],
+        "subject_id": row["subject_id"],
+        "session": row["session"],
+        "term": row["term"],
+    }
+    summary_lines = [
+        f"Student: {row['first_name']} {row['last_name']} (ID {row['student_id']})",
+        f"Class: {row['class_name']} | Subject: {row['subject_name']}",
+        f"Session: {row['session']} | Term: {row['term']}",
+        f"Total score: {row['total']} | Grade: {row.get('grade') or 'N/A'}",
+    ]
+    if row.get("teacher_remark"):
+        summary_lines.append(f"Teacher remark: {row['teacher_remark']}")
+    if row.get("head_teacher_remark"):
+        summary_lines.append(f"Head teacher remark: {row['head_teacher_remark']}")
+    return RenderedDoc(
+        "result", metadata, "\n".join(summary_lines), row.get("source_updated_at")
+    )
 
-def ingest_curriculum_topics(conn: psycopg.Connection, limit: int | None = None) -> int:
+
+def ingest_curriculum_topics(
+    conn: psycopg.Connection,
+    limit: int | None = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    prune: bool = False,
+) -> IngestCounts:
     query = """
         SELECT
             t.id AS topic_id,
@@ -57,79 +303,35 @@ def ingest_curriculum_topics(conn: psycopg.Connection, limit: int | None = None)
         cur.execute(query, params)
         rows_to_embed = cur.fetchall()
 
-    inserted = 0
-    with conn.cursor() as cur:
-        for row in rows_to_embed:
-            metadata = {
-                "type": "curriculum_topic",
-                "topic_id": row["topic_id"],
-                "theme_id": row["theme_id"],
-                "subject_id": row["subject_id"],
-                "class_id": row["class_id"],
-                "academic_year": row["academic_year"],
-            }
-            summary_lines = [
-                f"Subject: {row['subject_name']}",
-                f"Class: {row['class_name']} ({row['academic_year']})",
-                f"Theme: {row['theme_name']}",
-                f"Topic: {row['topic_name']}",
-            ]
-            if row.get("week_covered"):
-                summary_lines.append(f"Week covered: {row['week_covered']}")
-            if row.get("learning_outcome"):
-                summary_lines.append(f"Learning outcomes: {row['learning_outcome']}")
-            if row.get("coverage_status"):
-                summary_lines.append(f"Coverage status: {row['coverage_status']}")
-            if row.get("completed_date"):
-                summary_lines.append(f"Completed date: {row['completed_date']}")
-            chunk_text = "\n".join(summary_lines)
-
-            # Remove any existing chunk for this topic so reruns stay idempotent.
-            cur.execute(
-                """
-                DELETE FROM rag_document
-                WHERE metadata->>'type' = 'curriculum_topic'
-                  AND metadata->>'topic_id' = %s
-                """,
-                (str(row["topic_id"]),),
-            )
-
-            doc_id = cur.execute(
-                """
-                INSERT INTO rag_document (source, metadata)
-                VALUES (%s, %s)
-                RETURNING id
-                """,
-                (row["subject_name"], json.dumps(metadata)),
-            ).fetchone()[0]
-
-            chunk_id = cur.execute(
-                """
-                INSERT INTO rag_chunk (document_id, chunk)
-                VALUES (%s, %s)
-                RETURNING id
-                """,
-                (doc_id, chunk_text),
-            ).fetchone()[0]
-
-            embedding = get_embedding(chunk_text)
-            cur.execute(
-                """
-                INSERT INTO rag_embedding (chunk_id, embedding)
-                VALUES (%s, %s::vector)
-                """,
-                (chunk_id, _vector_to_sql(embedding)),
-            )
-            inserted += 1
-
-    return inserted
+    # Topics carry no timestamps and are few, so they are always fully scanned and
+    # change detection relies on the content hash alone.
+    counts = _write_documents(
+        conn, [render_topic(row) for row in rows_to_embed], "topic_id", batch_size, concurrency
+    )
+    if prune:
+        counts = counts._replace(deleted=_delete_orphans(conn, "curriculum_topic", "topic_id", "topic"))
+    return counts
 
 
 def ingest_student_results(
     conn: psycopg.Connection,
     student_id: int | None = None,
     limit: int | None = None,
-) -> int:
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    incremental: bool = False,
+    prune: bool = False,
+) -> IngestCounts:
+    """Embed result narratives.
+
+    With `incremental`, only results whose COALESCE(updated_at, created_at) is past
+    the stored watermark minus ``INGEST_OVERLAP_SECONDS`` are read, oldest first, and
+    the watermark advances with every committed window. `limit` then caps the rows
+    handled by this run. Renaming a student, class or subject does not touch `result`,
+    so it needs a full (non-incremental) run to reach the narratives.
+
+    With `prune`, documents whose result row was deleted are removed afterwards.
+    """
     query = """
         SELECT
             r.id AS result_id,
@@ -143,6 +345,7 @@ def ingest_student_results(
             r.teacher_remark,
             r.head_teacher_remark,
             r.created_at,
+            COALESCE(r.updated_at, r.created_at) AS source_updated_at,
             stu.first_name,
             stu.last_name,
             cls.name AS class_name,
@@ -151,10 +354,24 @@ def ingest_student_results(
         JOIN student stu ON stu.id = r.student_id
         JOIN class cls ON cls.id = r.class_id
         JOIN subject subj ON subj.id = r.subject_id
-        WHERE (%(student_id)s IS NULL OR r.student_id = %(student_id)s)
-        ORDER BY r.created_at DESC
+        WHERE (%(student_id)s::BIGINT IS NULL OR r.student_id = %(student_id)s)
     """
-    params = {"student_id": student_id}
+    params: Dict[str, Any] = {"student_id": student_id}
+    # A student-scoped run must not move the global watermark.
+    track_watermark = incremental and student_id is None
+    if incremental:
+        since, since_key = load_watermark(conn, "student_result") if track_watermark else (None, None)
+        query += """
+          AND (%(since)s::TIMESTAMPTZ IS NULL
+               OR (COALESCE(r.updated_at, r.created_at), r.id)
+                  > (%(since)s::TIMESTAMPTZ, %(since_id)s::BIGINT))
+        ORDER BY COALESCE(r.updated_at, r.created_at), r.id
+        """
+        if since is not None:
+            since -= timedelta(seconds=INGEST_OVERLAP_SECONDS)
+        params.update(since=since, since_id=int(since_key or 0))
+    else:
+        query += " ORDER BY r.created_at DESC"
     if limit is not None:
         query += " LIMIT %(limit)s"
         params["limit"] = limit
@@ -163,73 +380,17 @@ def ingest_student_results(
         cur.execute(query, params)
         rows_to_embed = cur.fetchall()
 
-    inserted = 0
-    with conn.cursor() as cur:
-        for row in rows_to_embed:
-            metadata = {
-                "type": "student_result",
-                "result_id": row["result_id"],
-                "student_id": row["student_id"],
-                "class_id": row["class_id"],
-                "subject_id": row["subject_id"],
-                "session": row["session"],
-                "term": row["term"],
-            }
-            summary_lines = [
-                f"Student: {row['first_name']} {row['last_name']} (ID {row['student_id']})",
-                f"Class: {row['class_name']} | Subject: {row['subject_name']}",
-                f"Session: {row['session']} | Term: {row['term']}",
-                f"Total score: {row['total']} | Grade: {row.get('grade') or 'N/A'}",
-            ]
-            if row.get("teacher_remark"):
-                summary_lines.append(f"Teacher remark: {row['teacher_remark']}")
-            if row.get("head_teacher_remark"):
-                summary_lines.append(f"Head teacher remark: {row['head_teacher_remark']}")
-            chunk_text = "\n".join(summary_lines)
-
-            cur.execute(
-                """
-                DELETE FROM rag_document
-                WHERE metadata->>'type' = 'student_result'
-                  AND metadata->>'result_id' = %s
-                """,
-                (str(row["result_id"]),),
-            )
-
-            doc_id = cur.execute(
-                """
-                INSERT INTO rag_document (source, metadata)
-                VALUES (%s, %s)
-                RETURNING id
-                """,
-                ("result", json.dumps(metadata)),
-            ).fetchone()[0]
-
-            chunk_id = cur.execute(
-                """
-                INSERT INTO rag_chunk (document_id, chunk)
-                VALUES (%s, %s)
-                RETURNING id
-                """,
-                (doc_id, chunk_text),
-            ).fetchone()[0]
-
-            embedding = get_embedding(chunk_text)
-            cur.execute(
-                """
-                INSERT INTO rag_embedding (chunk_id, embedding)
-                VALUES (%s, %s::vector)
-                """,
-                (chunk_id, _vector_to_sql(embedding)),
-            )
-            inserted += 1
-
-    return inserted
-
-
-def refresh_materialized_views(conn: psycopg.Connection) -> None:
-    with conn.cursor() as cur:
-        cur.execute("REFRESH MATERIALIZED VIEW mv_latest_results")
+    counts = _write_documents(
+        conn,
+        [render_result(row) for row in rows_to_embed],
+        "result_id",
+        batch_size,
+        concurrency,
+        watermark_type="student_result" if track_watermark else None,
+    )
+    if prune and student_id is None:
+        counts = counts._replace(deleted=_delete_orphans(conn, "student_result", "result_id", "result"))
+    return counts
 
 
 def main() -> None:
@@ -259,7 +420,55 @@ def main() -> None:
         type=int,
         help="Optional limit for curriculum topics and/or results processed.",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only read results changed since the last committed watermark (less "
+            "INGEST_OVERLAP_SECONDS) and resume from it after an interrupted run. Unchanged "
+            "chunks are skipped in every mode. Renamed students, classes or subjects need a "
+            "full run."
+        ),
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help=(
+            "Also delete documents whose topic/result row no longer exists. This scans the "
+            "whole table, so run it occasionally (e.g. weekly) rather than with every refresh."
+        ),
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EMBEDDING_BATCH_SIZE,
+        help=f"Texts per embeddings API request (default {EMBEDDING_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=EMBEDDING_CONCURRENCY,
+        help=f"Embeddings API requests in flight at once (default {EMBEDDING_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--publish-snapshot",
+        nargs="?",
+        const=SNAPSHOT_DIR or "",
+        metavar="DIR",
+        help=(
+            "After ingesting, publish the curriculum embeddings as an in-process search snapshot "
+            "to DIR (default RAG_SNAPSHOT_DIR); running MCP servers pick it up automatically."
+        ),
+    )
+    parser.add_argument(
+        "--snapshot-dtype",
+        choices=("float32", "float16"),
+        default="float32",
+        help="Vector precision of the published snapshot; float16 halves its memory footprint.",
+    )
     args = parser.parse_args()
+    if args.publish_snapshot == "":
+        parser.error("--publish-snapshot needs a directory or RAG_SNAPSHOT_DIR")
 
     if not args.include_results and not args.topics_only:
         # Default behaviour: embed topics and results if requested via flag.
@@ -267,20 +476,44 @@ def main() -> None:
 
     database_url = _require_database_url()
 
+    started = time.perf_counter()
     with psycopg.connect(database_url) as conn:
-        topics_processed = ingest_curriculum_topics(conn, limit=args.limit)
-        results_processed = 0
+        if not register_vector(conn):
+            raise SystemExit("The pgvector extension is required; run sql/01_rag_schema.sql first")
+        topics = ingest_curriculum_topics(
+            conn,
+            limit=args.limit,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            prune=args.prune,
+        )
+        results = IngestCounts()
         if args.include_results and not args.topics_only:
-            results_processed = ingest_student_results(
-                conn, student_id=args.student_id, limit=args.limit
+            results = ingest_student_results(
+                conn,
+                student_id=args.student_id,
+                limit=args.limit,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                incremental=args.incremental,
+                prune=args.prune,
             )
         conn.commit()
-        refresh_materialized_views(conn)
-        conn.commit()
-
+        if args.publish_snapshot:
+            version = export_snapshot(conn, args.publish_snapshot, dtype=args.snapshot_dtype)
+            if version is None:
+                print(f"No documents to publish; withdrew the RAG snapshot in {args.publish_snapshot}",
+                      file=sys.stdout)
+            else:
+                print(f"Published RAG snapshot {version} to {args.publish_snapshot}", file=sys.stdout)
+
+    elapsed = time.perf_counter() - started
+    scanned = topics.scanned + results.scanned
     print(
-        f"Embedded curriculum topics: {topics_processed}; "
-        f"student results: {results_processed}",
+        f"Curriculum topics: {topics.written} embedded, {topics.unchanged} unchanged, "
+        f"{topics.deleted} removed; student results: {results.written} embedded, "
+        f"{results.unchanged} unchanged, {results.deleted} removed "
+        f"in {elapsed:.1f}s ({scanned / elapsed if elapsed else 0.0:.1f} rows/s)",
         file=sys.stdout,
     )
 
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Rebuild or retune the rag_embedding ANN indexes based on how many rows they cover.
+
+For every index (the global one plus the per-type partial indexes) the script counts
+the rows it covers, derives target build parameters, and rebuilds the index without
+blocking writes (CREATE INDEX CONCURRENTLY + swap) when the current parameters differ.
+Once the global HNSW index is in place, the legacy ivfflat index is dropped. It also
+prints the ef_search/probes values to use at query time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+from typing import Dict, NamedTuple, Optional
+
+import psycopg
+from psycopg import sql
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    where: Optional[str]  # partial index predicate, or None for the global index
+
+
+INDEXES = (
+    IndexSpec("idx_rag_embedding_hnsw", None),
+    IndexSpec("idx_rag_embedding_curriculum", "doc_type = 'curriculum_topic'"),
+    IndexSpec("idx_rag_embedding_student_result", "doc_type = 'student_result'"),
+)
+# ivfflat (lists=100) index from sql/01, superseded by INDEXES[0] (see sql/09)
+LEGACY_INDEX = "idx_rag_embedding"
+
+
+class IndexPlan(NamedTuple):
+    method: str
+    options: Dict[str, int]
+    query_settings: Dict[str, int]
+
+
+def _require_database_url() -> str:
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        raise SystemExit("DATABASE_URL environment variable is required")
+    return url
+
+
+def plan_index(rows: int, method: str = "hnsw") -> IndexPlan:
+    """Build and query parameters for an index covering `rows` vectors.
+
+    HNSW: larger graphs need more links (m) and a wider build beam to keep recall
+    above ~0.95. ivfflat follows the pgvector guidance of rows/1000 lists up to 1M
+    rows and sqrt(rows) beyond, probing about sqrt(lists) of them.
+    """
+    if method == "ivfflat":
+        lists = max(1, rows // 1000) if rows <= 1_000_000 else int(math.sqrt(rows))
+        return IndexPlan("ivfflat", {"lists": lists}, {"ivfflat.probes": max(1, int(math.sqrt(lists)))})
+    if rows < 100_000:
+        m, ef_construction, ef_search = 16, 64, 40
+    elif rows < 1_000_000:
+        m, ef_construction, ef_search = 16, 128, 80
+    elif rows < 10_000_000:
+        m, ef_construction, ef_search = 24, 200, 120
+    else:
+        m, ef_construction, ef_search = 32, 256, 200
+    return IndexPlan("hnsw", {"m": m, "ef_construction": ef_construction}, {"hnsw.ef_search": ef_search})
+
+
+def _count_rows(conn: psycopg.Connection, spec: IndexSpec) -> int:
+    query = sql.SQL("SELECT count(*) FROM rag_embedding")
+    if spec.where:
+        query += sql.SQL(" WHERE ") + sql.SQL(spec.where)
+    return conn.execute(query).fetchone()[0]
+
+
+def _current_index(conn: psycopg.Connection, name: str) -> Optional[tuple[str, Dict[str, int]]]:
+    row = conn.execute(
+        """
+        SELECT am.amname, c.reloptions
+        FROM pg_class c
+        JOIN pg_am am ON am.oid = c.relam
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s AND c.relkind = 'i' AND i.indisvalid
+        """,
+        (name,),
+    ).fetchone()
+    if row is None:
+        return None
+    options = dict(opt.split("=", 1) for opt in (row[1] or []))
+    return row[0], {key: int(value) for key, value in options.items()}
+
+
+def _build_statements(spec: IndexSpec, plan: IndexPlan, exists: bool) -> list[sql.Composable]:
+    # an invalid index (failed concurrent build) counts as missing and is dropped first
+    target = spec.name if not exists else f"{spec.name}_new"
+    old = sql.Identifier(f"{spec.name}_old")
+    create = sql.SQL(
+        "CREATE INDEX CONCURRENTLY {target} ON rag_embedding USING {method} "
+        "(embedding vector_cosine_ops) WITH ({options})"
+    ).format(
+        target=sql.Identifier(target),
+        method=sql.SQL(plan.method),
+        options=sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.SQL(key), sql.Literal(value))
+            for key, value in plan.options.items()
+        ),
+    )
+    if spec.where:
+        create += sql.SQL(" WHERE ") + sql.SQL(spec.where)
+    statements = [sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(target)), create]
+    if exists:
+        # Both renames run as one implicit transaction, so the live index is only dropped
+        # after the new one has taken its name.
+        statements += [
+            sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(old),
+            sql.SQL("ALTER INDEX {name} RENAME TO {old}; ALTER INDEX {new} RENAME TO {name}").format(
+                name=sql.Identifier(spec.name), old=old, new=sql.Identifier(target)
+            ),
+            sql.SQL("DROP INDEX CONCURRENTLY {}").format(old),
+        ]
+    return statements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--method", choices=("hnsw", "ivfflat"), default="hnsw")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if parameters match.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without changing anything.")
+    parser.add_argument(
+        "--maintenance-work-mem",
+        default="1GB",
+        help="maintenance_work_mem for the build; HNSW builds are much faster when the graph fits.",
+    )
+    args = parser.parse_args()
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with psycopg.connect(_require_database_url(), autocommit=True) as conn:
+        conn.execute(
+            sql.SQL("SET maintenance_work_mem = {}").format(sql.Literal(args.maintenance_work_mem))
+        )
+        rebuilt = False
+        for spec in INDEXES:
+            rows = _count_rows(conn, spec)
+            plan = plan_index(rows, args.method)
+            current = _current_index(conn, spec.name)
+            up_to_date = current == (plan.method, plan.options)
+            settings = ", ".join(f"{key}={value}" for key, value in plan.query_settings.items())
+            print(
+                f"{spec.name}: {rows} rows; current={current or 'missing'}; "
+                f"target={plan.method} {plan.options}; query settings: {settings}",
+                file=sys.stdout,
+            )
+            if up_to_date and not args.force:
+                continue
+            for statement in _build_statements(spec, plan, exists=current is not None):
+                print(f"  {statement.as_string(conn)}", file=sys.stdout)
+                if not args.dry_run:
+                    conn.execute(statement)
+                    rebuilt = True
+        global_index = _current_index(conn, INDEXES[0].name)
+        if global_index is not None and _current_index(conn, LEGACY_INDEX) is not None:
+            statement = sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(LEGACY_INDEX))
+            print(f"{LEGACY_INDEX}: superseded by {INDEXES[0].name}", file=sys.stdout)
+            print(f"  {statement.as_string(conn)}", file=sys.stdout)
+            if not args.dry_run:
+                conn.execute(statement)
+                rebuilt = True
+        if rebuilt:
+            conn.execute("ANALYZE rag_embedding")
+
+    print(
+        "Set RAG_HNSW_EF_SEARCH / RAG_IVFFLAT_PROBES (or pass ef_search/probes to rag_search) "
+        "to the query settings above.",
+        file=sys.stdout,
+    )
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()
@@ -7,6 +7,14 @@ CREATE TABLE IF NOT EXISTS rag_document (
   source TEXT NOT NULL,     -- 'NERDC', 'TeacherGuide', 'Internal'
   uri TEXT,
   metadata JSONB,
+  content_hash TEXT,              -- hash of the embedded chunk text (incremental ingest)
+  source_updated_at TIMESTAMPTZ,  -- updated_at/created_at of the source row
+  -- metadata keys promoted to columns so rag_search filters can use indexes
+  doc_type TEXT GENERATED ALWAYS AS (metadata->>'type') STORED,
+  subject_id BIGINT GENERATED ALWAYS AS ((metadata->>'subject_id')::BIGINT) STORED,
+  class_id BIGINT GENERATED ALWAYS AS ((metadata->>'class_id')::BIGINT) STORED,
+  academic_year TEXT GENERATED ALWAYS AS (metadata->>'academic_year') STORED,
+  student_id BIGINT GENERATED ALWAYS AS ((metadata->>'student_id')::BIGINT) STORED,
   created_at TIMESTAMPTZ DEFAULT now()
 );
 
@@ -14,6 +22,7 @@ CREATE TABLE IF NOT EXISTS rag_chunk (
   id BIGSERIAL PRIMARY KEY,
   document_id BIGINT REFERENCES rag_document(id) ON DELETE CASCADE,
   chunk TEXT NOT NULL,
+  chunk_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', chunk)) STORED,  -- lexical/hybrid rag_search
   token_count INT,
   created_at TIMESTAMPTZ DEFAULT now()
 );
@@ -21,14 +30,40 @@ CREATE TABLE IF NOT EXISTS rag_chunk (
 -- Choose a dimension that matches your embedding model
 CREATE TABLE IF NOT EXISTS rag_embedding (
   chunk_id BIGINT PRIMARY KEY REFERENCES rag_chunk(id) ON DELETE CASCADE,
-  embedding vector(1536)
+  embedding vector(1536),
+  doc_type TEXT  -- copy of rag_document.doc_type for the per-type partial ANN indexes
 );
 
-CREATE INDEX IF NOT EXISTS idx_rag_embedding
-  ON rag_embedding USING ivfflat (embedding vector_cosine_ops) WITH (lists=100);
+-- HNSW needs no training data, so it is safe to create on an empty table.
+-- Retune as the corpus grows with scripts/tune_rag_index.py.
+CREATE INDEX IF NOT EXISTS idx_rag_embedding_hnsw
+  ON rag_embedding USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS idx_rag_chunk_tsv ON rag_chunk USING gin (chunk_tsv);
 
 CREATE INDEX IF NOT EXISTS idx_rag_document_topic
   ON rag_document ((metadata->>'type'), (metadata->>'topic_id'));
 
 CREATE INDEX IF NOT EXISTS idx_rag_document_result
   ON rag_document ((metadata->>'type'), (metadata->>'result_id'));
+
+-- Filtered rag_search: per-type ANN indexes plus btree indexes on the promoted columns
+CREATE INDEX IF NOT EXISTS idx_rag_embedding_curriculum
+  ON rag_embedding USING hnsw (embedding vector_cosine_ops) WHERE doc_type = 'curriculum_topic';
+
+CREATE INDEX IF NOT EXISTS idx_rag_embedding_student_result
+  ON rag_embedding USING hnsw (embedding vector_cosine_ops) WHERE doc_type = 'student_result';
+
+CREATE INDEX IF NOT EXISTS idx_rag_document_filters
+  ON rag_document (doc_type, subject_id, class_id, academic_year);
+
+CREATE INDEX IF NOT EXISTS idx_rag_document_student
+  ON rag_document (student_id) WHERE student_id IS NOT NULL;
+
+-- Resume point for incremental ingestion, one row per document type
+CREATE TABLE IF NOT EXISTS rag_ingest_state (
+  doc_type TEXT PRIMARY KEY,
+  watermark TIMESTAMPTZ,
+  last_key TEXT,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
@@ -1,15 +1,102 @@
 -- 02_agent_views_and_functions.sql
 -- Views and functions the agent can safely call
 
--- Latest result per (student, subject)
-DROP MATERIALIZED VIEW IF EXISTS mv_latest_results;
-CREATE MATERIALIZED VIEW mv_latest_results AS
-SELECT r.student_id, r.subject_id, r.session, r.term, r.total, r.grade, r.teacher_remark
+-- Latest result per (student, subject), maintained incrementally by triggers on `result`.
+-- Only the (student, subject) pairs touched by a statement are recomputed, so uploads never
+-- rebuild the whole table or block readers.
+CREATE TABLE IF NOT EXISTS latest_result (
+  student_id BIGINT NOT NULL,
+  subject_id BIGINT NOT NULL,
+  result_id BIGINT NOT NULL,
+  class_id BIGINT NOT NULL,
+  session TEXT NOT NULL,
+  term term_enum NOT NULL,
+  total NUMERIC(6,2),
+  grade TEXT,
+  teacher_remark TEXT,
+  created_at TIMESTAMPTZ,
+  PRIMARY KEY (student_id, subject_id)
+);
+
+-- Each statement below runs on a fresh snapshot. A concurrent writer refreshing the same
+-- pair holds its advisory lock until it commits, so the recompute that follows sees its rows
+-- and can overwrite the stored copy unconditionally.
+CREATE OR REPLACE FUNCTION refresh_latest_results_for(p_student_ids BIGINT[], p_subject_ids BIGINT[])
+RETURNS void LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+  SELECT pg_advisory_xact_lock(pair_key)
+  FROM (
+    SELECT DISTINCT hashtextextended('latest_result:' || student_id || ':' || subject_id, 0) AS pair_key
+    FROM unnest(p_student_ids, p_subject_ids) AS p(student_id, subject_id)
+  ) pairs
+  ORDER BY pair_key;  -- a fixed lock order, so two multi-pair refreshes can't deadlock
+
+  INSERT INTO latest_result AS lr
+    (student_id, subject_id, result_id, class_id, session, term, total, grade, teacher_remark, created_at)
+  SELECT DISTINCT ON (r.student_id, r.subject_id)
+         r.student_id, r.subject_id, r.id, r.class_id, r.session, r.term, r.total, r.grade,
+         r.teacher_remark, r.created_at
+  FROM result r
+  JOIN (SELECT DISTINCT * FROM unnest(p_student_ids, p_subject_ids) AS t(student_id, subject_id)) p
+    ON p.student_id = r.student_id AND p.subject_id = r.subject_id
+  ORDER BY r.student_id, r.subject_id, r.created_at DESC NULLS LAST, r.id DESC
+  ON CONFLICT (student_id, subject_id) DO UPDATE
+    SET result_id = EXCLUDED.result_id, class_id = EXCLUDED.class_id, session = EXCLUDED.session,
+        term = EXCLUDED.term, total = EXCLUDED.total, grade = EXCLUDED.grade,
+        teacher_remark = EXCLUDED.teacher_remark, created_at = EXCLUDED.created_at;
+
+  DELETE FROM latest_result lr
+  USING unnest(p_student_ids, p_subject_ids) AS p(student_id, subject_id)
+  WHERE lr.student_id = p.student_id AND lr.subject_id = p.subject_id
+    AND NOT EXISTS (
+      SELECT 1 FROM result r WHERE r.student_id = lr.student_id AND r.subject_id = lr.subject_id
+    );
+$$;
+
+-- Statement-level triggers with transition tables: one recompute per statement, not per row.
+CREATE OR REPLACE FUNCTION latest_result_after_insert() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM refresh_latest_results_for(array_agg(student_id), array_agg(subject_id)) FROM new_rows;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION latest_result_after_update() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM refresh_latest_results_for(array_agg(student_id), array_agg(subject_id))
+  FROM (SELECT student_id, subject_id FROM old_rows
+        UNION SELECT student_id, subject_id FROM new_rows) touched;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION latest_result_after_delete() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM refresh_latest_results_for(array_agg(student_id), array_agg(subject_id)) FROM old_rows;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_latest_result_insert ON result;
+CREATE TRIGGER trg_latest_result_insert AFTER INSERT ON result
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION latest_result_after_insert();
+
+DROP TRIGGER IF EXISTS trg_latest_result_update ON result;
+CREATE TRIGGER trg_latest_result_update AFTER UPDATE ON result
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION latest_result_after_update();
+
+DROP TRIGGER IF EXISTS trg_latest_result_delete ON result;
+CREATE TRIGGER trg_latest_result_delete AFTER DELETE ON result
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION latest_result_after_delete();
+
+-- Backfill (a no-op on a fresh install)
+INSERT INTO latest_result
+  (student_id, subject_id, result_id, class_id, session, term, total, grade, teacher_remark, created_at)
+SELECT DISTINCT ON (r.student_id, r.subject_id)
+       r.student_id, r.subject_id, r.id, r.class_id, r.session, r.term, r.total, r.grade,
+       r.teacher_remark, r.created_at
 FROM result r
-JOIN (
-  SELECT student_id, subject_id, MAX(created_at) AS max_ct
-  FROM result GROUP BY 1,2
-) m ON m.student_id=r.student_id AND m.subject_id=r.subject_id AND m.max_ct=r.created_at;
+ORDER BY r.student_id, r.subject_id, r.created_at DESC NULLS LAST, r.id DESC
+ON CONFLICT (student_id, subject_id) DO NOTHING;
 
 -- Simple student profile view
 CREATE OR REPLACE VIEW v_student_profile AS
@@ -36,3 +36,73 @@ USING (
       AND u.school_id = result.school_id
   )
 );
+
+-- latest_result mirrors result, so it gets the same visibility rules
+ALTER TABLE IF EXISTS latest_result ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS parent_can_view_child_latest_results ON latest_result;
+CREATE POLICY parent_can_view_child_latest_results ON latest_result
+USING (
+  EXISTS (
+    SELECT 1 FROM student_parent sp
+    WHERE sp.student_id = latest_result.student_id
+      AND sp.parent_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS teacher_can_view_class_latest_results ON latest_result;
+CREATE POLICY teacher_can_view_class_latest_results ON latest_result
+USING (
+  EXISTS (
+    SELECT 1 FROM teacher_assignment ta
+    WHERE ta.class_id = latest_result.class_id
+      AND ta.teacher_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS admin_can_view_school_latest_results ON latest_result;
+CREATE POLICY admin_can_view_school_latest_results ON latest_result
+USING (
+  EXISTS (
+    SELECT 1 FROM app_user u
+    JOIN student s ON s.id = latest_result.student_id
+    WHERE u.id = current_setting('app.user_id')::bigint
+      AND u.role = 'admin'
+      AND u.school_id = s.school_id
+  )
+);
+
+-- behaviour_skill feeds term reports, so it gets the same visibility rules as result
+ALTER TABLE IF EXISTS behaviour_skill ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS parent_can_view_child_behaviour ON behaviour_skill;
+CREATE POLICY parent_can_view_child_behaviour ON behaviour_skill
+USING (
+  EXISTS (
+    SELECT 1 FROM student_parent sp
+    WHERE sp.student_id = behaviour_skill.student_id
+      AND sp.parent_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS teacher_can_view_class_behaviour ON behaviour_skill;
+CREATE POLICY teacher_can_view_class_behaviour ON behaviour_skill
+USING (
+  EXISTS (
+    SELECT 1 FROM teacher_assignment ta
+    WHERE ta.class_id = behaviour_skill.class_id
+      AND ta.teacher_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS admin_can_view_school_behaviour ON behaviour_skill;
+CREATE POLICY admin_can_view_school_behaviour ON behaviour_skill
+USING (
+  EXISTS (
+    SELECT 1 FROM app_user u
+    JOIN student s ON s.id = behaviour_skill.student_id
+    WHERE u.id = current_setting('app.user_id')::bigint
+      AND u.role = 'admin'
+      AND u.school_id = s.school_id
+  )
+);
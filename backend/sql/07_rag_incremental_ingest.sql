@@ -0,0 +1,31 @@
+-- 07_rag_incremental_ingest.sql
+-- One-off patch for incremental RAG ingestion (scripts/ingest_rag_data.py --incremental).
+-- 1. Track when results change so re-ingestion can read only new/edited rows.
+-- 2. Store a content hash and source watermark per rag_document.
+-- 3. Persist the ingest resume point.
+
+ALTER TABLE result ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := now();
+  RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_result_updated_at ON result;
+CREATE TRIGGER trg_result_updated_at
+  BEFORE UPDATE ON result
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_result_changed ON result ((COALESCE(updated_at, created_at)), id);
+
+ALTER TABLE rag_document
+  ADD COLUMN IF NOT EXISTS content_hash TEXT,
+  ADD COLUMN IF NOT EXISTS source_updated_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS rag_ingest_state (
+  doc_type TEXT PRIMARY KEY,
+  watermark TIMESTAMPTZ,
+  last_key TEXT,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
@@ -0,0 +1,38 @@
+-- 08_rag_filter_columns.sql
+-- One-off patch so rag_search filters run inside the index scan instead of post-filtering.
+-- 1. Promote the filterable metadata keys to generated columns on rag_document.
+-- 2. Denormalise the document type onto rag_embedding and build per-type partial ANN indexes.
+-- 3. Add btree indexes for selective filters (student, subject/class).
+-- pgvector >= 0.8 is recommended: rag_search enables iterative index scans for filtered
+-- queries (set RAG_ITERATIVE_SCAN=off on older versions).
+
+ALTER TABLE rag_document
+  ADD COLUMN IF NOT EXISTS doc_type TEXT GENERATED ALWAYS AS (metadata->>'type') STORED,
+  ADD COLUMN IF NOT EXISTS subject_id BIGINT GENERATED ALWAYS AS ((metadata->>'subject_id')::BIGINT) STORED,
+  ADD COLUMN IF NOT EXISTS class_id BIGINT GENERATED ALWAYS AS ((metadata->>'class_id')::BIGINT) STORED,
+  ADD COLUMN IF NOT EXISTS academic_year TEXT GENERATED ALWAYS AS (metadata->>'academic_year') STORED,
+  ADD COLUMN IF NOT EXISTS student_id BIGINT GENERATED ALWAYS AS ((metadata->>'student_id')::BIGINT) STORED;
+
+ALTER TABLE rag_embedding ADD COLUMN IF NOT EXISTS doc_type TEXT;
+
+UPDATE rag_embedding e
+SET doc_type = d.doc_type
+FROM rag_chunk c
+JOIN rag_document d ON d.id = c.document_id
+WHERE c.id = e.chunk_id
+  AND e.doc_type IS DISTINCT FROM d.doc_type;
+
+CREATE INDEX IF NOT EXISTS idx_rag_embedding_curriculum
+  ON rag_embedding USING hnsw (embedding vector_cosine_ops) WHERE doc_type = 'curriculum_topic';
+
+CREATE INDEX IF NOT EXISTS idx_rag_embedding_student_result
+  ON rag_embedding USING hnsw (embedding vector_cosine_ops) WHERE doc_type = 'student_result';
+
+CREATE INDEX IF NOT EXISTS idx_rag_document_filters
+  ON rag_document (doc_type, subject_id, class_id, academic_year);
+
+CREATE INDEX IF NOT EXISTS idx_rag_document_student
+  ON rag_document (student_id) WHERE student_id IS NOT NULL;
+
+ANALYZE rag_document;
+ANALYZE rag_embedding;
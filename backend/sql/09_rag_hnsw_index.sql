@@ -0,0 +1,25 @@
+-- 09_rag_hnsw_index.sql
+-- One-off patch replacing the fixed ivfflat (lists=100) index with HNSW.
+-- Builds without blocking writes, then drops the old index. Run outside a transaction:
+--   psql "$DATABASE_URL" -v hnsw_m=16 -v hnsw_ef_construction=64 -f sql/09_rag_hnsw_index.sql
+-- Later retuning (by corpus size) is handled by scripts/tune_rag_index.py.
+
+\if :{?hnsw_m}
+\else
+\set hnsw_m 16
+\endif
+
+\if :{?hnsw_ef_construction}
+\else
+\set hnsw_ef_construction 64
+\endif
+
+SET maintenance_work_mem = '1GB';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rag_embedding_hnsw
+  ON rag_embedding USING hnsw (embedding vector_cosine_ops)
+  WITH (m = :hnsw_m, ef_construction = :hnsw_ef_construction);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_rag_embedding;
+
+ANALYZE rag_embedding;
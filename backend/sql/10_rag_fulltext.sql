@@ -0,0 +1,11 @@
+-- 10_rag_fulltext.sql
+-- One-off patch enabling lexical and hybrid rag_search (RAG_SEARCH_MODE / RagSearch.mode).
+-- Adds a generated tsvector over rag_chunk.chunk and a GIN index so exact topic names
+-- ("Simultaneous equations", "Week 4") can be matched and fused with the vector ranking.
+
+ALTER TABLE rag_chunk
+  ADD COLUMN IF NOT EXISTS chunk_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', chunk)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_rag_chunk_tsv ON rag_chunk USING gin (chunk_tsv);
+
+ANALYZE rag_chunk;
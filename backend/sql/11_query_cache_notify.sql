@@ -0,0 +1,28 @@
+-- 11_query_cache_notify.sql
+-- Change notifications for the pg_safe_query result cache (lighthouse_mcp/query_cache.py).
+-- Writes to result/student send NOTIFY lighthouse_data_changed with the table and the
+-- affected student; identical payloads are collapsed per transaction, so bulk imports
+-- send one message per student. latest_result (sql/12) only changes through the triggers
+-- on result, so its readers are covered by the result notifications.
+
+CREATE OR REPLACE FUNCTION notify_data_changed() RETURNS TRIGGER AS $$
+DECLARE
+  row_data JSONB := to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END);
+BEGIN
+  -- TG_ARGV[0] names the column holding the student id
+  PERFORM pg_notify(
+    'lighthouse_data_changed',
+    json_build_object('table', TG_TABLE_NAME, 'student_id', row_data->>TG_ARGV[0])::TEXT
+  );
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_result_notify ON result;
+CREATE TRIGGER trg_result_notify
+  AFTER INSERT OR UPDATE OR DELETE ON result
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed('student_id');
+
+DROP TRIGGER IF EXISTS trg_student_notify ON student;
+CREATE TRIGGER trg_student_notify
+  AFTER INSERT OR UPDATE OR DELETE ON student
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed('id');
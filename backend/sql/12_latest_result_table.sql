@@ -0,0 +1,57 @@
+-- 12_latest_result_table.sql
+-- One-off patch replacing the mv_latest_results materialized view (full, blocking REFRESH)
+-- with the trigger-maintained latest_result table read by pg_safe_query('latest_results').
+-- 1. Apply 02_agent_views_and_functions.sql first: it defines latest_result,
+--    refresh_latest_results_for and the incremental triggers on result (in that file only).
+-- 2. This patch backfills the table, then drops the materialized view.
+-- 3. It applies RLS so parents/teachers/admins only see the rows they may see on result.
+
+BEGIN;
+
+TRUNCATE latest_result;
+INSERT INTO latest_result
+  (student_id, subject_id, result_id, class_id, session, term, total, grade, teacher_remark, created_at)
+SELECT DISTINCT ON (r.student_id, r.subject_id)
+       r.student_id, r.subject_id, r.id, r.class_id, r.session, r.term, r.total, r.grade,
+       r.teacher_remark, r.created_at
+FROM result r
+ORDER BY r.student_id, r.subject_id, r.created_at DESC NULLS LAST, r.id DESC;
+
+DROP MATERIALIZED VIEW IF EXISTS mv_latest_results;
+
+-- latest_result mirrors result, so it gets the same visibility rules
+ALTER TABLE IF EXISTS latest_result ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS parent_can_view_child_latest_results ON latest_result;
+CREATE POLICY parent_can_view_child_latest_results ON latest_result
+USING (
+  EXISTS (
+    SELECT 1 FROM student_parent sp
+    WHERE sp.student_id = latest_result.student_id
+      AND sp.parent_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS teacher_can_view_class_latest_results ON latest_result;
+CREATE POLICY teacher_can_view_class_latest_results ON latest_result
+USING (
+  EXISTS (
+    SELECT 1 FROM teacher_assignment ta
+    WHERE ta.class_id = latest_result.class_id
+      AND ta.teacher_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS admin_can_view_school_latest_results ON latest_result;
+CREATE POLICY admin_can_view_school_latest_results ON latest_result
+USING (
+  EXISTS (
+    SELECT 1 FROM app_user u
+    JOIN student s ON s.id = latest_result.student_id
+    WHERE u.id = current_setting('app.user_id')::bigint
+      AND u.role = 'admin'
+      AND u.school_id = s.school_id
+  )
+);
+
+COMMIT;
@@ -0,0 +1,29 @@
+-- 13_answer_cache_notify.sql
+-- Change notifications for the semantic answer cache (answer_cache.py), which versions its
+-- entries per school. Adds the affected school to the lighthouse_data_changed payload
+-- (looked up from the student for tables without a school_id column) and announces
+-- curriculum/document changes with one school-less message per statement.
+-- The pg_safe_query cache (sql/11) ignores the new key.
+
+CREATE OR REPLACE FUNCTION notify_data_changed() RETURNS TRIGGER AS $$
+DECLARE
+  row_data JSONB := CASE WHEN TG_LEVEL = 'ROW'
+                         THEN to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END) END;
+  -- TG_ARGV[0] names the column holding the student id (none for statement triggers)
+  v_student_id TEXT := row_data->>TG_ARGV[0];
+  v_school_id TEXT := row_data->>'school_id';
+BEGIN
+  IF v_school_id IS NULL AND v_student_id IS NOT NULL THEN
+    SELECT s.school_id::TEXT INTO v_school_id FROM student s WHERE s.id = v_student_id::BIGINT;
+  END IF;
+  PERFORM pg_notify(
+    'lighthouse_data_changed',
+    json_build_object('table', TG_TABLE_NAME, 'student_id', v_student_id, 'school_id', v_school_id)::TEXT
+  );
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rag_document_notify ON rag_document;
+CREATE TRIGGER trg_rag_document_notify
+  AFTER INSERT OR UPDATE OR DELETE ON rag_document
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_data_changed();
@@ -0,0 +1,18 @@
+-- 14_chat_memory.sql
+-- Optional persistence for per-chat conversation memory (conversation_memory.py), used
+-- when the API runs with MEMORY_DATABASE_URL. `scope` is the caller's auth context, so a
+-- chat_id is only ever resolved for the user/role/school that created it. The API needs
+-- a role with write access to this table only; the agent role stays read-only.
+
+CREATE TABLE IF NOT EXISTS chat_memory (
+  scope TEXT NOT NULL,
+  chat_id TEXT NOT NULL,
+  state JSONB NOT NULL,  -- {"summary": ..., "turns": [[question, answer], ...], "tools": {...}}
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (scope, chat_id)
+);
+
+-- Expire old chats with e.g. DELETE FROM chat_memory WHERE updated_at < now() - interval '30 days'
+CREATE INDEX IF NOT EXISTS idx_chat_memory_updated_at ON chat_memory (updated_at);
+
+REVOKE ALL ON chat_memory FROM lighthouse_ro;
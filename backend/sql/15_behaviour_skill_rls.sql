@@ -0,0 +1,39 @@
+-- 15_behaviour_skill_rls.sql
+-- Row-level security for behaviour_skill on databases set up before it was added to
+-- 04_rls_policies.sql (safe to re-run). Term reports (lighthouse_mcp/reports.py) read
+-- behaviour_skill next to result, so a caller sees behaviour ratings for exactly the
+-- students whose results they can see.
+
+ALTER TABLE IF EXISTS behaviour_skill ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS parent_can_view_child_behaviour ON behaviour_skill;
+CREATE POLICY parent_can_view_child_behaviour ON behaviour_skill
+USING (
+  EXISTS (
+    SELECT 1 FROM student_parent sp
+    WHERE sp.student_id = behaviour_skill.student_id
+      AND sp.parent_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS teacher_can_view_class_behaviour ON behaviour_skill;
+CREATE POLICY teacher_can_view_class_behaviour ON behaviour_skill
+USING (
+  EXISTS (
+    SELECT 1 FROM teacher_assignment ta
+    WHERE ta.class_id = behaviour_skill.class_id
+      AND ta.teacher_user_id = current_setting('app.user_id')::bigint
+  )
+);
+
+DROP POLICY IF EXISTS admin_can_view_school_behaviour ON behaviour_skill;
+CREATE POLICY admin_can_view_school_behaviour ON behaviour_skill
+USING (
+  EXISTS (
+    SELECT 1 FROM app_user u
+    JOIN student s ON s.id = behaviour_skill.student_id
+    WHERE u.id = current_setting('app.user_id')::bigint
+      AND u.role = 'admin'
+      AND u.school_id = s.school_id
+  )
+);
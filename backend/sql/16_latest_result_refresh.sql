@@ -0,0 +1,30 @@
+-- 16_latest_result_refresh.sql
+-- For databases that applied 12_latest_result_table.sql before this fix. The old
+-- refresh_latest_results_for only overwrote a stored row with a newer (created_at,
+-- result_id), so an UPDATE moving created_at back, or a NULL created_at, left
+-- latest_result stale. Re-apply 02_agent_views_and_functions.sql first (it holds the only
+-- definition of the function, which now serializes refreshes of a pair and always
+-- overwrites), then run this file once to recompute every pair (safe to re-run).
+
+BEGIN;
+
+-- Undated results no longer count as the newest, and earlier refreshes may have been
+-- skipped: recompute every pair once.
+INSERT INTO latest_result AS lr
+  (student_id, subject_id, result_id, class_id, session, term, total, grade, teacher_remark, created_at)
+SELECT DISTINCT ON (r.student_id, r.subject_id)
+       r.student_id, r.subject_id, r.id, r.class_id, r.session, r.term, r.total, r.grade,
+       r.teacher_remark, r.created_at
+FROM result r
+ORDER BY r.student_id, r.subject_id, r.created_at DESC NULLS LAST, r.id DESC
+ON CONFLICT (student_id, subject_id) DO UPDATE
+  SET result_id = EXCLUDED.result_id, class_id = EXCLUDED.class_id, session = EXCLUDED.session,
+      term = EXCLUDED.term, total = EXCLUDED.total, grade = EXCLUDED.grade,
+      teacher_remark = EXCLUDED.teacher_remark, created_at = EXCLUDED.created_at;
+
+DELETE FROM latest_result lr
+WHERE NOT EXISTS (
+  SELECT 1 FROM result r WHERE r.student_id = lr.student_id AND r.subject_id = lr.subject_id
+);
+
+COMMIT;
@@ -0,0 +1,32 @@
+-- 17_scope_change_notify.sql
+-- Change notifications for the tables that decide who may see a student (student_scope_sql
+-- in lighthouse_mcp/reports.py) and for class, which v_student_profile joins. Cached
+-- pg_safe_query('student_profile') results list these tables, so a revoked parent link or
+-- teacher assignment drops them at once instead of after QUERY_CACHE_TTL.
+-- Apply after 13_answer_cache_notify.sql, whose notify_data_changed adds the school.
+
+DROP TRIGGER IF EXISTS trg_student_parent_notify ON student_parent;
+CREATE TRIGGER trg_student_parent_notify
+  AFTER INSERT OR UPDATE OR DELETE ON student_parent
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed('student_id');
+
+DROP TRIGGER IF EXISTS trg_enrollment_notify ON enrollment;
+CREATE TRIGGER trg_enrollment_notify
+  AFTER INSERT OR UPDATE OR DELETE ON enrollment
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed('student_id');
+
+-- the tables below have no student column: their messages drop every entry read from them
+DROP TRIGGER IF EXISTS trg_teacher_assignment_notify ON teacher_assignment;
+CREATE TRIGGER trg_teacher_assignment_notify
+  AFTER INSERT OR UPDATE OR DELETE ON teacher_assignment
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed();
+
+DROP TRIGGER IF EXISTS trg_class_notify ON class;
+CREATE TRIGGER trg_class_notify
+  AFTER INSERT OR UPDATE OR DELETE ON class
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed();
+
+DROP TRIGGER IF EXISTS trg_app_user_notify ON app_user;
+CREATE TRIGGER trg_app_user_notify
+  AFTER INSERT OR UPDATE OR DELETE ON app_user
+  FOR EACH ROW EXECUTE FUNCTION notify_data_changed();
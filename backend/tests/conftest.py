@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+# Make `backend.` importable and give the MCP server a DSN; no test opens a real connection
+# except test_latest_result.py, which needs TEST_DATABASE_URL (a scratch database).
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+os.environ.setdefault("DATABASE_URL_RO", "postgresql://localhost/lighthouse_test")
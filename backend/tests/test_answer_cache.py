@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import zlib
+
+import numpy as np
+
+from backend.answer_cache import AnswerCache
+from backend.chat_stream import ToolRecorder, _record_kickoff, _record_tool, _record_tool_started
+
+PARENT = {"user_id": 7, "role": "parent", "school_id": 1}
+OTHER_PARENT = {"user_id": 8, "role": "parent", "school_id": 1}
+QUESTION = "How do I help my child with JSS3 English at home?"
+
+
+def bag_of_words(text: str) -> np.ndarray:
+    """Deterministic stand-in for the embeddings API: one hashed bucket per word."""
+    vector = np.zeros(64, dtype=np.float32)
+    for word in text.replace("?", " ").split():
+        vector[zlib.crc32(word.encode()) % 64] += 1.0
+    return vector
+
+
+def test_hits_similar_questions_only_within_scope() -> None:
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.9, embed=bag_of_words)
+    answer, probe = cache.lookup("parent", PARENT, QUESTION)
+    assert answer is None
+    cache.store(probe, "Read together every evening.")
+
+    assert cache.lookup("parent", PARENT, "how do I help my child with JSS3 English at home")[0] == (
+        "Read together every evening."
+    )
+    assert cache.lookup("parent", OTHER_PARENT, QUESTION)[0] is None  # other RLS scope
+    assert cache.lookup("teacher", PARENT, QUESTION)[0] is None
+    assert cache.lookup("parent", PARENT, QUESTION, {"student_id": 4})[0] is None
+    assert cache.lookup("parent", PARENT, QUESTION.replace("JSS3", "JSS2"))[0] is None  # numbers differ
+    assert cache.lookup("parent", PARENT, "What is the school fee schedule?")[0] is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 6
+    assert stats["hit_rate"] == 1 / 7
+
+
+def test_answers_without_student_data_are_shared_by_role_and_school() -> None:
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.9, embed=bag_of_words)
+    _, probe = cache.lookup("parent", PARENT, QUESTION)
+    curriculum = [("rag_search", {"query": "JSS3 English"}, '[{"metadata": {"type": "curriculum_topic"}}]')]
+    cache.store(probe, "Read together every evening.", curriculum)
+
+    assert cache.lookup("parent", OTHER_PARENT, QUESTION)[0] == "Read together every evening."
+    assert cache.lookup("parent", {**OTHER_PARENT, "school_id": 2}, QUESTION)[0] is None
+    assert cache.lookup("parent", {**OTHER_PARENT, "role": "teacher"}, QUESTION)[0] is None
+
+    question = "How is my child doing in JSS3 English?"
+    for tools in ([("pg_safe_query", {"name": "latest_results"}, "[]")],
+                  [("rag_search", {}, '[{"metadata": {"type": "student_result"}}]')]):
+        _, probe = cache.lookup("parent", PARENT, question)
+        cache.store(probe, "Ada scored 78.", tools)
+        assert cache.lookup("parent", PARENT, question)[0] == "Ada scored 78."
+        assert cache.lookup("parent", OTHER_PARENT, question)[0] is None
+
+
+def test_answers_stay_per_user_when_the_recorder_missed_a_tool_call() -> None:
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.9, embed=bag_of_words)
+    question = "How is my child doing in JSS3 English?"
+
+    def run(missed: bool) -> ToolRecorder:
+        def kickoff() -> None:
+            _record_kickoff()
+            _record_tool_started()
+            _record_tool("rag_search", {}, '[{"metadata": {"type": "curriculum_topic"}}]')
+            _record_tool_started()
+            if not missed:  # e.g. the finish event was dispatched outside the run's context
+                _record_tool("pg_safe_query", {"name": "latest_results"}, "[]")
+
+        recorder = ToolRecorder()
+        recorder.run(kickoff)
+        return recorder
+
+    recorder = run(missed=True)
+    assert recorder.observed_results() is None
+    _, probe = cache.lookup("parent", PARENT, question)
+    cache.store(probe, "Ada scored 78.", recorder.observed_results())
+    assert cache.lookup("parent", PARENT, question)[0] == "Ada scored 78."
+    assert cache.lookup("parent", OTHER_PARENT, question)[0] is None
+
+    assert run(missed=False).observed_results() is not None
+    unobserved = ToolRecorder()  # no kickoff event: not even a tool-free run is proven
+    assert unobserved.observed_results() is None
+
+
+def test_data_changes_invalidate_the_school_scope() -> None:
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.9, embed=bag_of_words)
+    _, probe = cache.lookup("parent", PARENT, QUESTION)
+    cache.store(probe, "cached")
+
+    cache.handle_notification(json.dumps({"table": "result", "student_id": "3", "school_id": "2"}))
+    assert cache.lookup("parent", PARENT, QUESTION)[0] == "cached"  # another school changed
+
+    _, racing_probe = cache.lookup("parent", OTHER_PARENT, QUESTION)
+    cache.handle_notification(json.dumps({"table": "result", "student_id": "5", "school_id": "1"}))
+    assert cache.lookup("parent", PARENT, QUESTION)[0] is None
+    cache.store(racing_probe, "computed from data that just changed")
+    assert cache.lookup("parent", OTHER_PARENT, QUESTION)[0] is None
+    assert cache.stats()["stale"] == 1
+
+    _, probe = cache.lookup("parent", PARENT, QUESTION)
+    cache.store(probe, "fresh")
+    cache.handle_notification(json.dumps({"table": "rag_document", "student_id": None, "school_id": None}))
+    assert cache.lookup("parent", PARENT, QUESTION)[0] is None  # curriculum changes reach every school
+
+
+def test_embedding_failures_skip_the_cache() -> None:
+    def broken(text: str) -> np.ndarray:
+        raise RuntimeError("embeddings API unavailable")
+
+    cache = AnswerCache(max_entries=10, ttl=60, embed=broken)
+    assert cache.lookup("parent", PARENT, QUESTION) == (None, None)
+    cache.store(None, "ignored")
+    assert cache.stats()["errors"] == 1 and cache.stats()["entries"] == 0
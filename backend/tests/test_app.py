@@ -3,13 +3,19 @@ from __future__ import annotations
 import asyncio
 import importlib
 import sys
+import threading
 import types
+import zlib
 from pathlib import Path
 from typing import Any
 
 import jwt
+import numpy as np
 import pytest
 
+from backend.answer_cache import AnswerCache
+from backend.conversation_memory import ConversationStore
+
 # Ensure repo root on sys.path so we can import app.py
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -28,17 +34,29 @@ class DummyAdapter:
 
 
 class DummyAgent:
+    created = 0
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
+        DummyAgent.created += 1
         self.args = args
         self.kwargs = kwargs
 
+    def copy(self) -> DummyAgent:
+        return DummyAgent(*self.args, **self.kwargs)
+
+
+class DummyLLM:
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.kwargs = kwargs
+
 
 class DummyTask:
     created: list[DummyTask] = []
 
-    def __init__(self, description: str, agent: Any) -> None:
+    def __init__(self, description: str, agent: Any, expected_output: str = "") -> None:
         self.description = description
         self.agent = agent
+        self.expected_output = expected_output
         DummyTask.created.append(self)
 
 
@@ -63,16 +81,18 @@ crewai_stub = types.ModuleType("crewai")
 crewai_stub.Agent = DummyAgent
 crewai_stub.Task = DummyTask
 crewai_stub.Crew = DummyCrew
+crewai_stub.LLM = DummyLLM
 sys.modules["crewai"] = crewai_stub
 
 fastapi_stub = types.ModuleType("fastapi")
 
 
 class HTTPException(Exception):
-    def __init__(self, status_code: int, detail: str) -> None:
+    def __init__(self, status_code: int, detail: str, headers: dict[str, str] | None = None) -> None:
         super().__init__(detail)
         self.status_code = status_code
         self.detail = detail
+        self.headers = headers
 
 
 def Depends(dependency: Any) -> Any:
@@ -94,6 +114,8 @@ class FastAPI:
 
         return decorator
 
+    get = post
+
 
 fastapi_stub.FastAPI = FastAPI
 fastapi_stub.Depends = Depends
@@ -111,12 +133,25 @@ class JSONResponse(dict):
 
 
 class StreamingResponse:
-    def __init__(self, iterator: Any, media_type: str | None = None) -> None:
+    def __init__(
+        self,
+        iterator: Any,
+        media_type: str | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> None:
         self.iterator = iterator
         self.media_type = media_type
+        self.headers = headers
+
+
+class PlainTextResponse:
+    def __init__(self, content: str, media_type: str | None = None) -> None:
+        self.body = content
+        self.media_type = media_type
 
 
 responses_stub.JSONResponse = JSONResponse
+responses_stub.PlainTextResponse = PlainTextResponse
 responses_stub.StreamingResponse = StreamingResponse
 fastapi_stub.responses = responses_stub
 
@@ -128,9 +163,30 @@ sys.modules.pop("app", None)
 app = importlib.import_module("app")
 
 
-def _make_token(app_module) -> str:
+@pytest.fixture(autouse=True)
+def answer_cache(monkeypatch: pytest.MonkeyPatch) -> AnswerCache:
+    """A fresh answer cache per test, embedding with a deterministic fake."""
+    def embed(text: str) -> np.ndarray:
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.replace("?", " ").split():
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector
+
+    cache = AnswerCache(max_entries=16, ttl=60, threshold=0.9, embed=embed)
+    monkeypatch.setattr(app, "get_answer_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def conversation_store(monkeypatch: pytest.MonkeyPatch) -> ConversationStore:
+    store = ConversationStore(max_chats=16, token_budget=1000)
+    monkeypatch.setattr(app, "get_conversation_store", lambda: store)
+    return store
+
+
+def _make_token(app_module, role: str = "admin", sid: int = 1) -> str:
     return jwt.encode(
-        {"uid": 1, "role": "admin", "sid": 1},
+        {"uid": 1, "role": role, "sid": sid},
         app_module.JWT_SECRET,
         algorithm="HS256",
     )
@@ -147,9 +203,11 @@ def test_chat_returns_stubbed_answer() -> None:
 
     token = _make_token(app)
     ctx = app.auth(f"Bearer {token}")
-    response = app.chat(
-        {"message": "Need help", "persona": "teacher"},
-        ctx=ctx,
+    response = asyncio.run(
+        app.chat(
+            {"message": "Need help", "persona": "teacher"},
+            ctx=ctx,
+        )
     )
 
     assert isinstance(response, app.JSONResponse)
@@ -188,3 +246,195 @@ def test_chat_stream_emits_chunks() -> None:
     description = DummyTask.created[-1].description
     assert '_auth' in description
     assert 'Need help' in description
+
+
+def test_chat_returns_503_when_agent_pool_saturated(monkeypatch: pytest.MonkeyPatch) -> None:
+    pool = app.AgentWorkerPool(max_workers=1, max_queue=0)
+    release = threading.Event()
+    pool.submit(release.wait)
+    monkeypatch.setattr(app, "agent_pool", pool)
+
+    token = _make_token(app)
+    ctx = app.auth(f"Bearer {token}")
+    try:
+        with pytest.raises(app.HTTPException) as exc:
+            asyncio.run(app.chat({"message": "Need help"}, ctx=ctx))
+    finally:
+        release.set()
+        pool.shutdown()
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers == {"Retry-After": app.AGENT_RETRY_AFTER}
+    assert pool.stats()["rejected"] == 1
+
+
+def test_reports_bulk_streams_ndjson(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[dict[str, Any]] = []
+
+    def fake_reports(session: str, term: str, **kwargs: Any):
+        calls.append({"session": session, "term": term, **kwargs})
+        return iter([{"student": {"student_id": 1}}, {"student": {"student_id": 2}}])
+
+    from backend.lighthouse_mcp import reports
+
+    monkeypatch.setattr(reports, "iter_reports", fake_reports)
+    ctx = app.auth(f"Bearer {_make_token(app)}")
+    response = asyncio.run(
+        app.reports_bulk({"class_id": 4, "session": "2025/2026", "term": "First"}, ctx=ctx)
+    )
+
+    assert response.media_type == "application/x-ndjson"
+    assert list(response.iterator) == [
+        '{"student": {"student_id": 1}}\n',
+        '{"student": {"student_id": 2}}\n',
+    ]
+    assert calls[0]["class_id"] == 4 and calls[0]["auth"] == ctx
+
+    with pytest.raises(app.HTTPException) as exc:
+        asyncio.run(app.reports_bulk({"class_id": 4}, ctx=ctx))
+    assert exc.value.status_code == 400
+
+
+def test_reports_bulk_is_limited_to_the_callers_school(monkeypatch: pytest.MonkeyPatch) -> None:
+    from backend.lighthouse_mcp import reports
+
+    lookups: list[dict[str, Any]] = []
+
+    def fake_rows(sql: str, args: Any, auth: Any = None) -> list[dict]:
+        lookups.append(args)
+        return []  # class 4 is neither in the caller's school nor taught by them
+
+    monkeypatch.setattr(reports, "db_rows", fake_rows)
+    term = {"session": "2025/2026", "term": "First"}
+    denied = [
+        ({"school_id": 1, **term}, app.auth(f"Bearer {_make_token(app, role='parent')}")),
+        ({"school_id": 1, **term}, app.auth(f"Bearer {_make_token(app, sid=2)}")),
+        ({"class_id": 4, **term}, app.auth(f"Bearer {_make_token(app, role='teacher')}")),
+    ]
+    for body, ctx in denied:
+        with pytest.raises(app.HTTPException) as exc:
+            asyncio.run(app.reports_bulk(body, ctx=ctx))
+        assert exc.value.status_code == 403
+
+    assert lookups == [{"class_id": 4, "school_id": 1, "user_id": 1}]
+
+
+def test_persona_agents_are_built_once_and_copied_per_request() -> None:
+    first = app.build_agent("parent")
+    built = DummyAgent.created
+    second = app.build_agent("parent")
+
+    assert DummyAgent.created == built + 1  # only the per-request copy
+    assert first is not second
+    assert first.kwargs["tools"] == second.kwargs["tools"]
+    assert app.build_agent("unknown").kwargs["role"] == "Teacher Advisor"
+
+
+def test_chat_answers_structured_requests_without_the_agent(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[tuple[str, dict[str, Any]]] = []
+
+    def fake_call_tool(name: str, payload: dict[str, Any]) -> Any:
+        calls.append((name, payload))
+        return [{"subject": "Mathematics", "session": "2024/2025", "term": "first", "total": 80, "grade": "A"}]
+
+    monkeypatch.setattr(app, "call_tool", fake_call_tool)
+    DummyTask.created.clear()
+    ctx = app.auth(f"Bearer {_make_token(app)}")
+
+    response = asyncio.run(app.chat({"message": "Latest results for student 5"}, ctx=ctx))
+
+    assert response.content == {
+        "answer": "Latest results for student 5:\n- Mathematics - first term 2024/2025: 80 (A)"
+    }
+    assert calls == [("pg_safe_query", {"name": "latest_results", "params": {"student_id": 5, "_auth": ctx}})]
+    assert not DummyTask.created  # no crew was built
+
+    monkeypatch.setattr(app, "call_tool", lambda name, payload: {"error": "denied"})
+    response = asyncio.run(app.chat({"message": "Latest results for student 5"}, ctx=ctx))
+    assert response.content == {"answer": "stubbed response"}  # tool error: the agent takes over
+
+
+def test_chat_serves_repeated_questions_from_the_answer_cache(answer_cache: AnswerCache) -> None:
+    ctx = app.auth(f"Bearer {_make_token(app)}")
+    asyncio.run(app.chat({"message": "How can I support reading at home?", "persona": "parent"}, ctx=ctx))
+    DummyTask.created.clear()
+
+    response = asyncio.run(
+        app.chat({"message": "how can I support reading at home", "persona": "parent"}, ctx=ctx)
+    )
+    assert response.content == {"answer": "stubbed response"}
+    assert not DummyTask.created  # answered from the cache
+    stats = asyncio.run(app.cache_stats(ctx=ctx)).content["answer_cache"]
+    assert stats["hits"] == 1 and stats["hit_rate"] == 0.5
+
+    asyncio.run(app.chat({"message": "How can I support reading at home?", "persona": "admin"}, ctx=ctx))
+    assert DummyTask.created  # other persona, other scope
+
+
+def test_follow_ups_see_earlier_turns_and_fetched_data(monkeypatch: pytest.MonkeyPatch) -> None:
+    rows = [{"subject": "Mathematics", "session": "2024/2025", "term": "first", "total": 64, "grade": "C"}]
+    monkeypatch.setattr(app, "call_tool", lambda name, payload: rows)
+    ctx = app.auth(f"Bearer {_make_token(app)}")
+    DummyTask.created.clear()
+
+    asyncio.run(app.chat({"message": "Latest results for student 5", "chat_id": "c1"}, ctx=ctx))
+    asyncio.run(app.chat({"message": "How can she improve in maths?", "chat_id": "c1"}, ctx=ctx))
+
+    description = DummyTask.created[-1].description
+    assert "User: Latest results for student 5\nAssistant: Latest results for student 5:" in description
+    assert '- pg_safe_query {"name": "latest_results", "params": {"student_id": 5}} -> [{"subject": "Mathematics"' in description
+    assert description.endswith("User says: How can she improve in maths?")
+
+    asyncio.run(app.chat({"message": "How can she improve in maths?"}, ctx=ctx))
+    assert "Recent turns" not in DummyTask.created[-1].description  # no chat_id, no memory
+
+
+def test_metrics_report_request_latency_by_route(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(app, "call_tool", lambda name, payload: [])
+    ctx = app.auth(f"Bearer {_make_token(app)}")
+    asyncio.run(app.chat({"message": "Latest results for student 5"}, ctx=ctx))
+    asyncio.run(app.chat({"message": "Any tips for revision?", "persona": "parent"}, ctx=ctx))
+
+    response = asyncio.run(app.prometheus_metrics())
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    body = response.body
+    assert 'lighthouse_request_seconds_count{endpoint="/chat",persona="teacher",route="fast"}' in body
+    assert 'lighthouse_request_seconds_count{endpoint="/chat",persona="parent",route="agent"}' in body
+    assert 'lighthouse_stage_seconds_count{stage="crew_kickoff",persona="parent"}' in body
+    assert 'lighthouse_agent_pool{stat="in_flight"} 0' in body
+
+
+def test_identical_concurrent_questions_share_one_crew_run(monkeypatch: pytest.MonkeyPatch) -> None:
+    release = threading.Event()
+    runs: list[DummyCrew] = []
+
+    def kickoff(self: DummyCrew) -> str:
+        runs.append(self)
+        release.wait(5)
+        return "shared answer"
+
+    monkeypatch.setattr(DummyCrew, "kickoff", kickoff)
+    ctx = app.auth(f"Bearer {_make_token(app)}")
+    body = {"message": "Any tips for revision?", "persona": "parent"}
+    coalesced = app.crew_flights.stats()["coalesced"]
+
+    async def scenario():
+        leader = asyncio.ensure_future(app.chat(dict(body), ctx=ctx))
+        while not runs:
+            await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(app.chat(dict(body), ctx=ctx)) for _ in range(3)]
+        other_scope = asyncio.ensure_future(app.chat(dict(body), ctx={**ctx, "user_id": 2}))
+        stream = await app.chat_stream(dict(body), ctx=ctx)
+        while app.crew_flights.stats()["coalesced"] < coalesced + 4 or len(runs) < 2:
+            await asyncio.sleep(0.01)
+        release.set()
+        answers = await asyncio.gather(leader, *followers, other_scope)
+        chunks = [chunk async for chunk in stream.iterator]
+        return [response.content["answer"] for response in answers], chunks
+
+    answers, chunks = asyncio.run(scenario())
+
+    assert answers == ["shared answer"] * 5
+    assert len(runs) == 2  # one per auth scope
+    assert chunks[0] == "data: shared answer\n\n" and chunks[-1] == "event: done\ndata: [DONE]\n\n"
+    assert app.crew_flights.stats()["in_flight"] == 0
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from backend.lighthouse_mcp import embeddings
+from backend.scripts.bench_suite import compare, fake_embedding, install_fake_embeddings, summarize
+
+
+def test_fake_embeddings_are_deterministic_unit_vectors(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embeddings, "_request_embeddings", embeddings._request_embeddings)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", embeddings.get_embedding_cache)
+    install_fake_embeddings()
+
+    vector = embeddings.get_embedding("Algebra and fractions lesson")
+    assert vector.shape == (embeddings.EMBEDDING_DIM,)
+    assert np.array_equal(vector, fake_embedding("algebra and fractions lesson", embeddings.EMBEDDING_DIM))
+    assert abs(float(np.linalg.norm(vector)) - 1.0) < 1e-6
+
+    related = fake_embedding("fractions lesson", 64) @ fake_embedding("algebra fractions lesson", 64)
+    unrelated = fake_embedding("fractions lesson", 64) @ fake_embedding("soil crops", 64)
+    assert related > unrelated
+
+
+def test_summary_and_regression_check() -> None:
+    stats = summarize([float(ms) for ms in range(1, 101)], errors=2)
+    assert (stats["n"], stats["errors"], stats["p50_ms"], stats["p99_ms"]) == (100, 2, 50.0, 99.0)
+    assert summarize([]) == {"n": 0, "errors": 0}
+
+    baseline = {"results": {"rag_search": {"1000": {"vector": {"p99_ms": 10.0, "n": 200}}},
+                            "ingest": {"1000": {"rows_per_sec": 500.0}}}}
+    current = {"results": {"rag_search": {"1000": {"vector": {"p99_ms": 13.0, "n": 200}}},
+                           "ingest": {"1000": {"rows_per_sec": 450.0}}}}
+    assert compare(baseline, current, tolerance=0.2) == [("rag_search.1000.vector.p99_ms", 10.0, 13.0)]
+    assert compare(baseline, current, tolerance=0.05) == [
+        ("ingest.1000.rows_per_sec", 500.0, 450.0),
+        ("rag_search.1000.vector.p99_ms", 10.0, 13.0),
+    ]
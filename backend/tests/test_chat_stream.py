@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import chat_stream
+
+
+def test_sse_splits_multiline_data() -> None:
+    assert chat_stream.sse("a\nb", event="answer") == "event: answer\ndata: a\ndata: b\n\n"
+
+
+def test_describe_tool_names_the_whitelisted_query() -> None:
+    args = '{"payload": {"name": "latest_results", "params": {"student_id": 1}}}'
+    assert chat_stream.describe_tool("pg_safe_query", args) == "querying latest_results…"
+    assert chat_stream.describe_tool("rag_search", None) == "searching curriculum…"
+
+
+def test_stream_relays_tokens_tool_progress_and_final_answer() -> None:
+    def fake_kickoff() -> str:
+        chat_stream._publish("tool", {"tool": "rag_search", "status": "started"})
+        chat_stream._publish("token", {"text": "Hello"})
+        chat_stream._publish("token", {"text": " world"})
+        return "Hello world"
+
+    async def collect() -> list[str]:
+        stream = chat_stream.CrewEventStream()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(stream.run, fake_kickoff)
+            return [event async for event in stream.events(future, heartbeat=5)]
+
+    events = asyncio.run(collect())
+
+    assert events[0].startswith("event: tool\n")
+    assert events[1:3] == ["data: Hello\n\n", "data:  world\n\n"]
+    assert events[3] == "event: answer\ndata: Hello world\n\n"
+    assert events[-1] == chat_stream.DONE_EVENT
+
+
+def test_stream_reports_agent_errors() -> None:
+    def failing_kickoff() -> str:
+        raise RuntimeError("llm down")
+
+    async def collect() -> list[str]:
+        stream = chat_stream.CrewEventStream()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(stream.run, failing_kickoff)
+            return [event async for event in stream.events(future, heartbeat=5)]
+
+    events = asyncio.run(collect())
+    assert events[0].startswith("event: error\n")
+    assert "llm down" in events[0]
+    assert events[-1] == chat_stream.DONE_EVENT
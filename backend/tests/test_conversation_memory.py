@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from backend.conversation_memory import ConversationStore, estimate_tokens
+
+PARENT = {"user_id": 7, "role": "parent", "school_id": 1}
+OTHER_PARENT = {"user_id": 8, "role": "parent", "school_id": 1}
+LATEST = (
+    "pg_safe_query",
+    '{"payload": {"name": "latest_results", "params": {"student_id": 3, "_auth": {"user_id": 7}}}}',
+    [{"subject": "Mathematics", "total": 71, "grade": "B"}],
+)
+
+
+def test_context_keeps_turns_and_fetched_data_per_scope() -> None:
+    store = ConversationStore(max_chats=10, token_budget=1000)
+    assert store.context("c1", PARENT) == ""
+
+    store.append("c1", PARENT, "How is Ada doing in maths?", "Ada scored 71 (B) in Mathematics.", [LATEST])
+    context = store.context("c1", PARENT)
+
+    assert "User: How is Ada doing in maths?\nAssistant: Ada scored 71 (B) in Mathematics." in context
+    assert (
+        '- pg_safe_query {"payload": {"name": "latest_results", "params": {"student_id": 3}}}'
+        ' -> [{"subject": "Mathematics", "total": 71, "grade": "B"}]'
+    ) in context
+    assert "_auth" not in context
+    assert store.context("c1", OTHER_PARENT) == ""  # another user cannot read the chat
+    assert store.context(None, PARENT) == ""  # no chat_id, no memory
+
+
+def test_older_turns_are_summarized_to_stay_within_budget() -> None:
+    store = ConversationStore(max_chats=10, token_budget=200)
+    store.append("c1", PARENT, "Latest maths result?", "Ada scored 71 (B).", [LATEST])
+    for n in range(8):
+        store.append("c1", PARENT, f"Question {n}?", f"Answer {n}. " + "More detail. " * 20)
+
+    context = store.context("c1", PARENT)
+    assert estimate_tokens(context) <= 200
+    assert context.startswith("Earlier in this conversation:\n")
+    assert "- Asked: Question 6? Answered: Answer 6." in context
+    assert "User: Question 7?" in context and "User: Question 6?" not in context
+    assert "latest_results" in context  # fetched data outlives the turn that fetched it
+    assert store.stats()["folded_turns"] == 8
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import Any
+
+from backend.lighthouse_mcp import db
+
+
+class RecordingCursor:
+    def __init__(self) -> None:
+        self.executed: list[tuple[str, Any]] = []
+
+    def execute(self, sql: str, args: Any = None) -> None:
+        self.executed.append((sql, args))
+
+
+def test_apply_auth_sets_all_gucs_in_one_statement() -> None:
+    cur = RecordingCursor()
+    db.apply_auth(cur, {"user_id": 7, "role": "parent", "school_id": 3})
+
+    assert len(cur.executed) == 1
+    sql, args = cur.executed[0]
+    assert sql.count("set_config(%s, %s, true)") == 3
+    assert args == ["app.user_id", "7", "app.role", "parent", "app.school_id", "3"]
+
+
+def test_apply_auth_skips_missing_or_empty_auth() -> None:
+    cur = RecordingCursor()
+    db.apply_auth(cur, None)
+    db.apply_auth(cur, {"role": None})
+    assert cur.executed == []
+
+    db.apply_auth(cur, {"role": "teacher"})
+    assert cur.executed == [("SELECT set_config(%s, %s, true)", ["app.role", "teacher"])]
+
+
+def test_extra_settings_share_the_auth_round_trip() -> None:
+    cur = RecordingCursor()
+    db.apply_auth(cur, {"user_id": 1}, {"hnsw.ef_search": 100})
+
+    assert cur.executed == [(
+        "SELECT set_config(%s, %s, true), set_config(%s, %s, true)",
+        ["app.user_id", "1", "hnsw.ef_search", "100"],
+    )]
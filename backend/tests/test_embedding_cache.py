@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from backend.lighthouse_mcp.embedding_cache import EmbeddingCache, cache_key, normalize_text
+
+
+def cache_hit(vector: np.ndarray | None, expected: list[float]) -> bool:
+    return vector is not None and vector.dtype == np.float32 and vector.tolist() == expected
+
+
+def test_key_depends_on_model_dimension_and_normalized_text() -> None:
+    assert normalize_text("  Topic: Algebra  \r\nWeek 4 \n") == "Topic: Algebra\nWeek 4"
+    base = cache_key("m", 3, "hello")
+    assert base == cache_key("m", 3, normalize_text(" hello "))
+    assert base != cache_key("m", 4, "hello")
+    assert base != cache_key("other", 3, "hello")
+
+
+def test_memory_tier_is_bounded_lru() -> None:
+    cache = EmbeddingCache(max_entries=2, path=None)
+    cache.put("m", 2, "a", [1.0, 0.0])
+    cache.put("m", 2, "b", [0.0, 1.0])
+    assert cache_hit(cache.get("m", 2, "a"), [1.0, 0.0])  # refreshes "a"
+    cache.put("m", 2, "c", [0.5, 0.5])
+
+    assert cache.get("m", 2, "b") is None
+    assert cache_hit(cache.get("m", 2, "a"), [1.0, 0.0])
+    stats = cache.stats()
+    assert stats["memory_evictions"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_new_process(tmp_path: Path) -> None:
+    path = str(tmp_path / "emb.sqlite3")
+    first = EmbeddingCache(max_entries=4, path=path)
+    first.put("m", 2, "topic", [0.25, 0.75])
+    first.close()
+
+    second = EmbeddingCache(max_entries=4, path=path)
+    assert cache_hit(second.get("m", 2, "topic"), [0.25, 0.75])
+    assert cache_hit(second.get("m", 2, "topic"), [0.25, 0.75])
+    assert second.stats()["disk_hits"] == 1
+    assert second.stats()["memory_hits"] == 1
+    second.close()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pytest
+
+from backend import intent_router
+
+AUTH = {"user_id": 7, "role": "parent", "school_id": 1}
+
+
+def test_route_maps_structured_requests_to_tool_calls() -> None:
+    intent = intent_router.route("What are the latest results for student 12?", AUTH)
+    assert intent == intent_router.Intent(
+        "latest_results",
+        "pg_safe_query",
+        {"name": "latest_results", "params": {"student_id": 12, "_auth": AUTH}},
+    )
+
+    intent = intent_router.route("Show my child's 2nd term report for 2024-2025", AUTH, {"student_id": "3"})
+    assert intent.tool == "report_compose"
+    assert intent.payload == {"student_id": 3, "session": "2024/2025", "term": "second", "_auth": AUTH}
+
+    assert intent_router.route("student #4 profile", AUTH).name == "student_profile"
+
+
+@pytest.mark.parametrize(
+    "message, hints",
+    [
+        ("Why did student 12's latest results drop?", None),  # open-ended
+        ("How can I help with my child's latest grades?", {"student_id": 3}),
+        ("What are my child's latest results?", None),  # no student to look up
+        ("Show the term report for student 12", None),  # no session/term
+        ("Tell me about fractions in year 5", {"student_id": 3}),
+    ],
+)
+def test_route_falls_back_to_the_agent(message: str, hints: dict | None) -> None:
+    assert intent_router.route(message, AUTH, hints) is None
+
+
+def test_render_templates_tool_results() -> None:
+    latest = intent_router.route("latest results for student 12", AUTH)
+    rows = [
+        {"subject": "Mathematics", "session": "2024/2025", "term": "first", "total": 78.0, "grade": "B",
+         "teacher_remark": "Good effort"},
+        {"subject": "English", "session": "2024/2025", "term": "first", "total": None, "grade": None,
+         "teacher_remark": None},
+    ]
+    assert intent_router.render(latest, rows) == (
+        "Latest results for student 12:\n"
+        "- Mathematics - first term 2024/2025: 78 (B). Good effort\n"
+        "- English - first term 2024/2025: no score"
+    )
+    assert intent_router.render(latest, {"error": "boom"}) is None
+    assert intent_router.render(latest, []) == "No results are visible to you for student 12."
+
+    report = intent_router.route("first term report for student 12, 2024/2025", AUTH)
+    answer = intent_router.render(report, {
+        "student": {"first_name": "Ada", "last_name": "Obi"},
+        "session": "2024/2025",
+        "term": "first",
+        "results": [{"subject": "Mathematics", "total": 91, "grade": "A", "grade_remark": "Excellent"}],
+        "behaviour": {"behaviours": {"punctuality": 5}, "skills": None},
+    })
+    assert answer == (
+        "First term report 2024/2025 for Ada Obi:\n"
+        "- Mathematics: 91 (A). Excellent\n"
+        "Behaviours: punctuality: 5"
+    )
+
+
+def test_render_hands_out_of_scope_students_to_the_agent() -> None:
+    profile = intent_router.route("student 12 profile", AUTH)
+    assert intent_router.render(profile, []) is None
+
+    report = intent_router.route("first term report for student 12, 2024/2025", AUTH)
+    empty = {"student": {}, "session": "2024/2025", "term": "first", "results": [], "behaviour": None}
+    assert intent_router.render(report, empty) is None
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+# The latest_result triggers (sql/02) only exist in Postgres. These tests apply the schema to
+# a scratch database with pgvector and roll every change back; they are skipped without one.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SETUP_FILES = (
+    BACKEND_DIR.parent / "schema" / "lighthouse_erd_schema.sql",
+    BACKEND_DIR / "sql" / "01_rag_schema.sql",
+    BACKEND_DIR / "sql" / "02_agent_views_and_functions.sql",
+    BACKEND_DIR / "sql" / "12_latest_result_table.sql",
+    BACKEND_DIR / "sql" / "16_latest_result_refresh.sql",
+)
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+@pytest.fixture(scope="module")
+def database() -> Iterator[None]:
+    with psycopg.connect(TEST_DATABASE_URL, autocommit=True) as conn:
+        for path in SETUP_FILES:
+            conn.execute(path.read_text())
+    yield
+
+
+@pytest.fixture
+def conn(database: None) -> Iterator["psycopg.Connection"]:
+    with psycopg.connect(TEST_DATABASE_URL) as conn:
+        yield conn
+        conn.rollback()
+
+
+def _seed(conn: "psycopg.Connection") -> tuple[int, int, int, int]:
+    """A school with one class/subject and two students; returns (class, subject, a, b)."""
+    school = conn.execute(
+        "INSERT INTO school (name) VALUES ('latest_result test') RETURNING id"
+    ).fetchone()[0]
+    class_id = conn.execute(
+        "INSERT INTO class (name, academic_year, school_id) VALUES ('JSS1', '2025/2026', %s) RETURNING id",
+        (school,),
+    ).fetchone()[0]
+    subject = conn.execute(
+        "INSERT INTO subject (name, class_id, school_id) VALUES ('Mathematics', %s, %s) RETURNING id",
+        (class_id, school),
+    ).fetchone()[0]
+    a, b = (
+        conn.execute(
+            "INSERT INTO student (first_name, last_name, school_id) VALUES (%s, 'Test', %s) RETURNING id",
+            (name, school),
+        ).fetchone()[0]
+        for name in ("Ada", "Bola")
+    )
+    return class_id, subject, a, b
+
+
+def _result(conn: "psycopg.Connection", student: int, class_id: int, subject: int, created_at: str) -> int:
+    return conn.execute(
+        "INSERT INTO result (student_id, class_id, subject_id, session, term, exam, created_at) "
+        "VALUES (%s, %s, %s, '2025/2026', 'first', 50, %s) RETURNING id",
+        (student, class_id, subject, created_at),
+    ).fetchone()[0]
+
+
+def _latest(conn: "psycopg.Connection", student: int, subject: int) -> int | None:
+    row = conn.execute(
+        "SELECT result_id FROM latest_result WHERE student_id = %s AND subject_id = %s", (student, subject)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def test_update_of_created_at_recomputes_the_latest_result(conn: "psycopg.Connection") -> None:
+    class_id, subject, student, _ = _seed(conn)
+    older = _result(conn, student, class_id, subject, "2025-01-01")
+    newer = _result(conn, student, class_id, subject, "2025-02-01")
+    assert _latest(conn, student, subject) == newer
+
+    conn.execute("UPDATE result SET created_at = '2024-12-01' WHERE id = %s", (newer,))
+    assert _latest(conn, student, subject) == older
+
+    # an undated result never counts as the newest, and never blocks later refreshes
+    conn.execute("UPDATE result SET created_at = NULL WHERE id = %s", (older,))
+    assert _latest(conn, student, subject) == newer
+    conn.execute("UPDATE result SET created_at = '2025-03-01' WHERE id = %s", (older,))
+    assert _latest(conn, student, subject) == older
+
+
+def test_update_of_student_id_moves_the_latest_result(conn: "psycopg.Connection") -> None:
+    class_id, subject, a, b = _seed(conn)
+    older = _result(conn, a, class_id, subject, "2025-01-01")
+    newer = _result(conn, a, class_id, subject, "2025-02-01")
+
+    conn.execute("UPDATE result SET student_id = %s WHERE id = %s", (b, newer))
+    assert (_latest(conn, a, subject), _latest(conn, b, subject)) == (older, newer)
+
+    conn.execute("UPDATE result SET student_id = %s WHERE id = %s", (b, older))
+    assert (_latest(conn, a, subject), _latest(conn, b, subject)) == (None, newer)
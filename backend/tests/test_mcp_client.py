@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from mcp.types import CallToolResult, TextContent
+
+from backend.mcp_client import decode_result
+
+
+def _text(text: str) -> TextContent:
+    return TextContent(type="text", text=text)
+
+
+def test_decode_result_restores_tool_return_values() -> None:
+    assert decode_result(CallToolResult(content=[_text('{"a": 1}')])) == {"a": 1}
+    assert decode_result(CallToolResult(content=[_text("1"), _text("plain")])) == [1, "plain"]
+    assert decode_result(
+        CallToolResult(content=[_text("[]")], structuredContent={"result": [{"id": 1}]})
+    ) == [{"id": 1}]
+
+
+def test_decode_result_reports_tool_errors() -> None:
+    result = CallToolResult(content=[_text("boom")], isError=True)
+    assert decode_result(result) == {"error": "boom"}
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from backend.lighthouse_mcp import embeddings
+from backend.lighthouse_mcp import lighthouse_mcp_server as server
+from backend.lighthouse_mcp.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """Replace the embeddings API with a deterministic fake and record each request."""
+    calls: list[list[str]] = []
+
+    def fake_request(snippets: list[str]) -> list[list[float]]:
+        calls.append(list(snippets))
+        return [[float(len(s))] * embeddings.EMBEDDING_DIM for s in snippets]
+
+    monkeypatch.setattr(embeddings, "_request_embeddings", fake_request)
+    cache = EmbeddingCache(max_entries=100, path=None)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+    return calls
+
+
+def test_get_embeddings_batches_unique_uncached_texts(fake_embeddings: list[list[str]]) -> None:
+    embeddings.get_embedding("cached")
+    fake_embeddings.clear()
+
+    vectors = embeddings.get_embeddings(
+        ["a", "bb", "a", "cached", "ccc", "dddd"], batch_size=2, max_concurrency=2
+    )
+
+    assert [v[0] for v in vectors] == [1.0, 2.0, 1.0, 6.0, 3.0, 4.0]
+    assert sorted(fake_embeddings) == [["a", "bb"], ["ccc", "dddd"]]
+
+
+def test_get_embeddings_rejects_empty_text(fake_embeddings: list[list[str]]) -> None:
+    with pytest.raises(ValueError):
+        embeddings.get_embeddings(["ok", "   "])
+    assert fake_embeddings == []
+
+
+def test_rag_filter_clause_promotes_metadata_keys() -> None:
+    where, params = server._rag_filter_clause(
+        {"type": "curriculum_topic", "subject_id": "12", "class_id": [3, 4]}
+    )
+
+    assert where == (
+        " WHERE e.doc_type IN ('curriculum_topic') AND d.subject_id = %(f_subject_id)s"
+        " AND d.class_id = ANY(%(f_class_id)s)"
+    )
+    assert params == {"f_subject_id": 12, "f_class_id": [3, 4]}
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [{"school_id": 1}, {"type": "'; DROP TABLE rag_document; --"}, {"student_id": "abc"}],
+)
+def test_rag_search_rejects_bad_filters(filters: dict) -> None:
+    result = server.rag_search(server.RagSearch(query="fractions", filters=filters))
+    assert "error" in result
+
+
+def test_rag_index_settings_never_undercut_k(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(server, "RAG_HNSW_EF_SEARCH", None)
+    monkeypatch.setattr(server, "RAG_IVFFLAT_PROBES", 10)
+
+    assert server._rag_index_settings(server.RagSearch(query="q", k=8)) == {"ivfflat.probes": 10}
+    assert server._rag_index_settings(server.RagSearch(query="q", k=50, ef_search=20, probes=3)) == {
+        "hnsw.ef_search": 50,
+        "ivfflat.probes": 3,
+    }
+
+
+def test_rag_search_modes_share_filters(
+    monkeypatch: pytest.MonkeyPatch, fake_embeddings: list[list[str]]
+) -> None:
+    queries: list[tuple[str, dict]] = []
+    monkeypatch.setattr(server, "db_rows", lambda sql, args, **kw: queries.append((sql, args)) or [])
+
+    server.rag_search(server.RagSearch(query="Week 4", mode="lexical", filters={"subject_id": 3}))
+    assert fake_embeddings == []  # lexical search never calls the embeddings API
+    sql, args = queries.pop()
+    assert "d.subject_id = %(f_subject_id)s AND c.chunk_tsv @@ tsq" in sql
+    assert args == {"text": "Week 4", "k": 8, "f_subject_id": 3}
+
+    server.rag_search(server.RagSearch(query="Week 4", k=5, mode="hybrid"))
+    sql, args = queries.pop()
+    assert sql.startswith("WITH vector_hits AS (") and "lexical_hits AS (" in sql
+    assert args["n"] == server.RAG_HYBRID_CANDIDATES and args["k"] == 5
+    assert args["rrf_k"] == server.RAG_RRF_K
+
+
+def test_server_imports_without_database_url_or_heavy_clients() -> None:
+    env = {k: v for k, v in os.environ.items() if k not in ("DATABASE_URL_RO", "DATABASE_URL")}
+    env["PYTHONPATH"] = str(Path(__file__).resolve().parents[2])
+    code = (
+        "import sys, backend.lighthouse_mcp.lighthouse_mcp_server; "
+        "print(sorted(m for m in ('openai', 'crewai') if m in sys.modules))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "[]"
+
+
+def test_metrics_route_serves_prometheus_text(fake_embeddings: list[list[str]]) -> None:
+    from starlette.testclient import TestClient
+
+    server.get_embedding("metrics probe")
+    server.get_embedding("metrics probe")  # served from the embedding cache
+    response = TestClient(server.http_app()).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'lighthouse_embedding_seconds_count{source="cache"}' in response.text
+
+
+def test_http_workers_close_the_pool_on_shutdown(monkeypatch: pytest.MonkeyPatch) -> None:
+    from starlette.testclient import TestClient
+
+    closed: list[bool] = []
+    monkeypatch.setattr(server, "close_pools", lambda: closed.append(True))
+    with TestClient(server.http_app()):
+        assert closed == []
+    assert closed == [True]
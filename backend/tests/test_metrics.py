@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+from backend.lighthouse_mcp import metrics
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    latency = metrics.histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    latency.observe(0.05, route="fast")
+    latency.observe(0.5, route="fast")
+    latency.observe(5.0, route="fast")
+
+    lines = [line for line in metrics.render().splitlines() if line.startswith("test_latency")]
+    assert lines == [
+        'test_latency_seconds_bucket{route="fast",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="fast",le="1"} 2',
+        'test_latency_seconds_bucket{route="fast",le="+Inf"} 3',
+        'test_latency_seconds_sum{route="fast"} 5.55',
+        'test_latency_seconds_count{route="fast"} 3',
+    ]
+    assert metrics.histogram("test_latency_seconds", "Test latency.", ("route",)) is latency
+    with pytest.raises(ValueError):
+        latency.observe(1.0, persona="teacher")
+
+
+def test_slow_traces_are_logged_with_their_stages(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_MS", 0.0001)
+    requests = metrics.histogram("test_request_seconds", "Test requests.", ("route",))
+
+    with caplog.at_level(logging.WARNING, logger="lighthouse.slow"):
+        with metrics.trace("POST /test", requests, route="agent", persona="teacher") as request:
+            with metrics.span("auth"):
+                pass
+            metrics.label(route="cache")
+            with metrics.trace("tool lookup"):  # nested: folded into the request
+                with metrics.span("db_query"):
+                    pass
+
+    assert [stage for stage, _ in request.spans] == ["auth", "db_query", "tool lookup"]
+    assert 'test_request_seconds_count{route="cache"} 1' in metrics.render()
+    assert len(caplog.records) == 1 and "slow POST /test" in caplog.records[0].getMessage()
+    assert metrics.current_trace() is None
+
+
+def test_instrumented_tool_records_status() -> None:
+    @metrics.instrumented_tool
+    def lookup_tool(ok: bool) -> dict:
+        return {"rows": []} if ok else {"error": "denied"}
+
+    lookup_tool(True)
+    lookup_tool(False)
+
+    body = metrics.render()
+    assert lookup_tool.__name__ == "lookup_tool"
+    assert 'lighthouse_tool_seconds_count{tool="lookup_tool",status="ok"} 1' in body
+    assert 'lighthouse_tool_seconds_count{tool="lookup_tool",status="error"} 1' in body
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from backend.lighthouse_mcp.query_cache import QueryCache
+
+PARENT = {"user_id": 7, "role": "parent", "school_id": 1}
+TEACHER = {"user_id": 3, "role": "teacher", "school_id": 1}
+
+
+def _loader(calls: list[str], value: str):
+    def load() -> list[dict]:
+        calls.append(value)
+        return [{"value": value}]
+
+    return load
+
+
+def test_results_are_cached_per_auth_scope() -> None:
+    cache = QueryCache(ttl=60, max_entries=10)
+    calls: list[str] = []
+
+    first = cache.fetch("latest_results", {"student_id": 1}, PARENT, ["result"], _loader(calls, "a"))
+    first[0]["value"] = "mutated"
+    again = cache.fetch("latest_results", {"student_id": 1}, PARENT, ["result"], _loader(calls, "b"))
+    other = cache.fetch("latest_results", {"student_id": 1}, TEACHER, ["result"], _loader(calls, "c"))
+
+    assert again == [{"value": "a"}]
+    assert other == [{"value": "c"}]
+    assert calls == ["a", "c"]
+    assert cache.stats()["hit_rate"] == 1 / 3
+
+
+def test_notifications_invalidate_matching_students_only() -> None:
+    cache = QueryCache(ttl=60, max_entries=10)
+    calls: list[str] = []
+    for student in (1, 2):
+        cache.fetch("latest_results", {"student_id": student}, PARENT, ["result"], _loader(calls, "x"))
+    cache.fetch("student_profile", {"student_id": 1}, PARENT, ["student"], _loader(calls, "x"))
+
+    cache.handle_notification('{"table": "result", "student_id": "1"}')
+    assert cache.stats()["entries"] == 2
+
+    cache.handle_notification('{"table": "student", "student_id": null}')
+    assert cache.stats()["entries"] == 1
+
+
+def test_load_overlapping_an_invalidation_is_not_stored() -> None:
+    cache = QueryCache(ttl=60, max_entries=10)
+
+    def racing_load() -> list[dict]:
+        cache.invalidate("result", "1")
+        return [{"value": "stale"}]
+
+    cache.fetch("latest_results", {"student_id": 1}, None, ["result"], racing_load)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from backend.lighthouse_mcp import reports
+
+
+def test_compose_report_is_one_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[tuple[str, Any, Any]] = []
+
+    def fake_rows(sql: str, args: Any, auth: Any = None) -> list[dict]:
+        calls.append((sql, args, auth))
+        return [{
+            "student_id": 5,
+            "student": {"student_id": 5, "first_name": "Ada"},
+            "results": [{"subject": "Maths", "grade": "A1", "grade_remark": "Excellent"}],
+            "behaviour": None,
+        }]
+
+    monkeypatch.setattr(reports, "db_rows", fake_rows)
+    report = reports.compose_report(5, "2025/2026", "First", auth={"role": "teacher"})
+
+    assert len(calls) == 1
+    sql, args, auth = calls[0]
+    assert "grade_band" in sql and "behaviour_skill" in sql
+    behaviour = sql[sql.index("FROM behaviour_skill"):sql.index("ORDER BY b.student_id")]
+    assert "student_parent" in behaviour and "teacher_assignment" in behaviour
+    profile = sql[sql.index("LEFT JOIN v_student_profile"):sql.index("LEFT JOIN term_results")]
+    assert "student_parent" in profile and "u.role = 'admin'" in profile
+    assert args == {"student_id": 5, "session": "2025/2026", "term": "First"}
+    assert auth == {"role": "teacher"}
+    assert report["student"]["first_name"] == "Ada"
+    assert report["results"][0]["grade_remark"] == "Excellent"
+    assert report["behaviour"] is None
+
+
+def test_bulk_reports_batch_the_roster(monkeypatch: pytest.MonkeyPatch) -> None:
+    queries: list[tuple[str, Any]] = []
+
+    def fake_rows(sql: str, args: Any, auth: Any = None) -> list[dict]:
+        queries.append((sql, args))
+        if sql is reports.CLASS_SCOPE_SQL:
+            return [{"?column?": 1}]
+        if sql is reports.CLASS_ROSTER_SQL:
+            return [{"student_id": i} for i in (3, 1, 2)]
+        # the batch query may return rows in any order
+        return [
+            {"student_id": i, "student": {"student_id": i}, "results": [], "behaviour": None}
+            for i in sorted(args["student_ids"])
+        ]
+
+    monkeypatch.setattr(reports, "db_rows", fake_rows)
+    auth = {"user_id": 7, "role": "teacher", "school_id": 1}
+    out = list(reports.iter_reports("2025/2026", "First", class_id=9, auth=auth, batch_size=2))
+
+    assert [r["student"]["student_id"] for r in out] == [3, 1, 2]
+    assert len(queries) == 4
+    assert queries[0][1] == {"class_id": 9, "school_id": 1, "user_id": 7}
+    assert queries[2][1]["student_ids"] == [3, 1]
+
+
+def test_bulk_reports_need_exactly_one_scope() -> None:
+    with pytest.raises(ValueError):
+        reports.iter_reports("2025/2026", "First")
+    with pytest.raises(ValueError):
+        reports.iter_reports("2025/2026", "First", class_id=1, school_id=1)
+
+
+def test_bulk_reports_check_the_callers_scope(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(reports, "db_rows", lambda sql, args, auth=None: [])
+    teacher = {"user_id": 7, "role": "teacher", "school_id": 1}
+    with pytest.raises(PermissionError):
+        reports.iter_reports("2025/2026", "First", school_id=1, auth={**teacher, "role": "parent"})
+    with pytest.raises(PermissionError):
+        reports.iter_reports("2025/2026", "First", school_id=2, auth=teacher)
+    with pytest.raises(PermissionError):
+        reports.iter_reports("2025/2026", "First", class_id=9, auth=teacher)
+    assert reports.iter_reports("2025/2026", "First", school_id=1, auth=teacher) is not None
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.lighthouse_mcp.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_identical_calls_run_once() -> None:
+    flights = SingleFlight("test")
+    release = threading.Event()
+    calls: list[str] = []
+
+    def load(key: str):
+        def run() -> list[str]:
+            calls.append(key)
+            release.wait(5)
+            return [key]
+        return flights.do(key, run)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(load, key) for key in ("a", "a", "a", "a", "b")]
+        while flights.stats()["calls"] < 5:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert sorted(calls) == ["a", "b"]
+    assert sorted(value[0] for value, _ in results) == ["a"] * 4 + ["b"]
+    assert [shared for _, shared in results].count(True) == 3
+    assert flights.stats() == {"calls": 5, "coalesced": 3, "in_flight": 0}
+
+    def fail() -> None:
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flights.do("a", fail)
+    assert flights.do("a", lambda: 1) == (1, False)  # nothing is kept after a call
+
+
+def test_async_waiters_survive_a_cancelled_caller() -> None:
+    flights = AsyncSingleFlight("test")
+    runs: list[int] = []
+
+    async def work() -> str:
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        first = asyncio.ensure_future(flights.do("q", work))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flights.do("q", work))
+        await asyncio.sleep(0)
+        first.cancel()  # e.g. the first client disconnected
+        return await second
+
+    assert asyncio.run(scenario()) == ("answer", True)
+    assert runs == [1]
+    assert flights.stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
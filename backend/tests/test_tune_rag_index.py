@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from backend.scripts.tune_rag_index import IndexSpec, _build_statements, plan_index
+
+
+def test_plan_scales_with_corpus_size() -> None:
+    assert plan_index(5_000).options == {"m": 16, "ef_construction": 64}
+    assert plan_index(2_000_000).options == {"m": 24, "ef_construction": 200}
+    assert plan_index(2_000_000).query_settings == {"hnsw.ef_search": 120}
+
+    ivf = plan_index(4_000_000, "ivfflat")
+    assert ivf.options == {"lists": 2000}
+    assert ivf.query_settings == {"ivfflat.probes": 44}
+
+
+def test_existing_index_is_rebuilt_concurrently_and_swapped() -> None:
+    spec = IndexSpec("idx_rag_embedding_curriculum", "doc_type = 'curriculum_topic'")
+    statements = [s.as_string(None) for s in _build_statements(spec, plan_index(10), exists=True)]
+
+    assert statements[1] == (
+        'CREATE INDEX CONCURRENTLY "idx_rag_embedding_curriculum_new" ON rag_embedding USING hnsw '
+        "(embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) "
+        "WHERE doc_type = 'curriculum_topic'"
+    )
+    # the live index keeps serving until the new one has taken its name
+    assert statements[2:] == [
+        'DROP INDEX CONCURRENTLY IF EXISTS "idx_rag_embedding_curriculum_old"',
+        'ALTER INDEX "idx_rag_embedding_curriculum" RENAME TO "idx_rag_embedding_curriculum_old"; '
+        'ALTER INDEX "idx_rag_embedding_curriculum_new" RENAME TO "idx_rag_embedding_curriculum"',
+        'DROP INDEX CONCURRENTLY "idx_rag_embedding_curriculum_old"',
+    ]
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from backend.lighthouse_mcp.vector_snapshot import SnapshotIndex, write_snapshot
+
+
+def _row(chunk_id: int, embedding: list[float], subject_id: int | None = None) -> dict:
+    return {
+        "chunk_id": chunk_id,
+        "chunk": f"chunk {chunk_id}",
+        "source": f"topic:{chunk_id}",
+        "metadata": {"topic_id": chunk_id},
+        "doc_type": "curriculum_topic",
+        "subject_id": subject_id,
+        "embedding": np.array(embedding, dtype=np.float32),
+    }
+
+
+def test_snapshot_search_is_exact_and_filtered(tmp_path: Path) -> None:
+    rows = [_row(1, [1, 0], 7), _row(2, [0.8, 0.6], 7), _row(3, [0, 1], 8), _row(4, [1, 0.1])]
+    write_snapshot(tmp_path, rows, ["curriculum_topic"], dtype="float16")
+    snapshot = SnapshotIndex(tmp_path, check_seconds=0).current()
+
+    hits = snapshot.search(np.array([2.0, 0.0]), k=2, filters={"type": ["curriculum_topic"]})
+    assert [h["id"] for h in hits] == [1, 4]
+    assert abs(hits[0]["score"]) < 1e-3
+
+    hits = snapshot.search(np.array([0.0, 1.0]), k=5, filters={"type": ["curriculum_topic"], "subject_id": [7]})
+    assert [h["id"] for h in hits] == [2, 1]
+    assert hits[0]["source"] == "topic:2"
+
+    assert snapshot.covers({"type": ["curriculum_topic"]})
+    assert not snapshot.covers({})
+    assert not snapshot.covers({"type": ["curriculum_topic", "student_result"]})
+
+
+def test_index_hot_reloads_new_snapshot(tmp_path: Path) -> None:
+    index = SnapshotIndex(tmp_path, check_seconds=0)
+    assert index.current() is None
+
+    write_snapshot(tmp_path, [_row(1, [1, 0])], ["curriculum_topic"])
+    first = index.current()
+    assert len(first) == 1
+
+    write_snapshot(tmp_path, [_row(1, [1, 0]), _row(2, [0, 1])], ["curriculum_topic"])
+    assert len(index.current()) == 2
+    assert len(first.search(np.array([1.0, 0.0]), 5, {})) == 1
+
+
+def test_publishing_nothing_withdraws_the_snapshot(tmp_path: Path) -> None:
+    index = SnapshotIndex(tmp_path, check_seconds=0)
+    write_snapshot(tmp_path, [_row(1, [1, 0])], ["curriculum_topic"])
+    assert len(index.current()) == 1
+
+    assert write_snapshot(tmp_path, [], ["curriculum_topic"]) is None
+    assert not (tmp_path / "CURRENT").exists()
+    assert index.current() is None  # rag_search falls back to Postgres
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import base64
+import struct
+
+import numpy as np
+
+from backend.lighthouse_mcp import vectors
+
+
+def test_binary_format_matches_pgvector_wire_layout() -> None:
+    data = vectors.to_binary(np.array([1.0, -0.5, 0.25], dtype=np.float32))
+
+    assert data[:4] == struct.pack(">HH", 3, 0)
+    assert data[4:] == struct.pack(">3f", 1.0, -0.5, 0.25)
+    np.testing.assert_array_equal(vectors.from_binary(data), [1.0, -0.5, 0.25])
+
+
+def test_base64_embeddings_decode_without_float_lists() -> None:
+    raw = np.array([0.1, 0.2], dtype="<f4").tobytes()
+    decoded = vectors.from_base64(base64.b64encode(raw).decode())
+
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, np.array([0.1, 0.2], dtype=np.float32))
+
+
+def test_text_loader_parses_vector_literal() -> None:
+    loaded = vectors.VectorLoader(0).load(b"[1,2.5,-3]")
+    np.testing.assert_array_equal(loaded, np.array([1.0, 2.5, -3.0], dtype=np.float32))
@@ -170,9 +170,21 @@ CREATE TABLE IF NOT EXISTS result (
   teacher_remark TEXT,
   head_teacher_remark TEXT,
   created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now(),
   UNIQUE (student_id, class_id, subject_id, session, term)
 );
 
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := now();
+  RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_result_updated_at ON result;
+CREATE TRIGGER trg_result_updated_at
+  BEFORE UPDATE ON result
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
 -- Optional: store behaviour/skills info as JSONB snapshots per term
 CREATE TABLE IF NOT EXISTS behaviour_skill (
   id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
@@ -191,4 +203,5 @@ CREATE INDEX IF NOT EXISTS idx_theme_subject ON theme(subject_id);
 CREATE INDEX IF NOT EXISTS idx_topic_theme ON topic(theme_id);
 CREATE INDEX IF NOT EXISTS idx_student_school ON student(school_id);
 CREATE INDEX IF NOT EXISTS idx_result_student_term ON result(student_id, session, term);
+CREATE INDEX IF NOT EXISTS idx_result_changed ON result ((COALESCE(updated_at, created_at)), id);
 CREATE INDEX IF NOT EXISTS idx_enrollment_student_term ON enrollment(student_id, session, term);